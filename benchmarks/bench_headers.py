@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+# Compare the per-field header methods of PEPReader with the single pass parse_header.
+#
+# Usage: python benchmarks/bench_headers.py [number of headers]
+
+import sys
+import time
+import random
+
+from pepreader.pepreader import PEPReader
+from pepreader.pep import PEP
+
+GENES = [ 'Agpat3', 'Alb', 'BAIAP2', 'Acadm', 'ADH1B', 'Gapdh', 'Hk2', 'TTN' ]
+
+DESCRIPTIONS = [
+    '1-acylglycerol-3-phosphate O-acyltransferase 3',
+    'albumin',
+    'brain-specific angiogenesis inhibitor 1-associated protein 2',
+    'acyl-CoA dehydrogenase, C-4 to C-12 straight chain',
+    'alcohol dehydrogenase 1B (class I), beta polypeptide',
+    'glyceraldehyde-3-phosphate dehydrogenase',
+]
+
+ORGANISMS = [ 'hsa', 'mmu', 'rno', 'dme', 'eco', 'sce' ]
+
+EC_NUMBERS = [ '2.3.1.51', '1.1.1.1', '2.7.1.1', '1.2.1.12', '1.3.8.7', '2.3.1.-' ]
+
+
+def kegg_header( generator=None ):
+    """
+    Returns a random header in the KEGG pep style.
+    """
+
+    header = '>%s:%d  %s; %s' % ( generator.choice( ORGANISMS ), generator.randint( 1, 999999 ), generator.choice( GENES ), generator.choice( DESCRIPTIONS ) )
+
+    style = generator.randint( 0, 3 )
+
+    if style == 1:
+        header = header + ' (EC:%s)' % generator.choice( EC_NUMBERS )
+    elif style == 2:
+        header = header + '; K%05d %s [EC:%s %s]' % ( generator.randint( 0, 99999 ), generator.choice( DESCRIPTIONS ), generator.choice( EC_NUMBERS ), generator.choice( EC_NUMBERS ) )
+    elif style == 3:
+        header = header + ' (EC:%s); K%05d %s [EC:%s]' % ( generator.choice( EC_NUMBERS ), generator.randint( 0, 99999 ), generator.choice( DESCRIPTIONS ), generator.choice( EC_NUMBERS ) )
+
+    return header
+
+
+def per_field( pepreader=None, header=None ):
+    return ( pepreader.protein_identification( header ),
+             pepreader.organism_code( header ),
+             pepreader.full_fasta_header( header ),
+             pepreader.protein_description( header ),
+             pepreader.ec_from_square_brackets( header ),
+             pepreader.ec_from_brackets( header ) )
+
+
+def main():
+    total = int( sys.argv[1] ) if len( sys.argv ) > 1 else 200000
+
+    generator = random.Random( 0 )
+    headers = [ kegg_header( generator ) for i in range( total ) ]
+
+    pepreader = PEPReader( pep=PEP() )
+
+    started = time.perf_counter()
+    for header in headers:
+        per_field( pepreader, header )
+    per_field_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for header in headers:
+        pepreader.parse_header( header )
+    single_pass_seconds = time.perf_counter() - started
+
+    print( 'headers:      %d' % total )
+    print( 'per field:    %.2f us/header' % ( per_field_seconds / total * 1e6 ) )
+    print( 'parse_header: %.2f us/header' % ( single_pass_seconds / total * 1e6 ) )
+    print( 'speedup:      %.1fx' % ( per_field_seconds / single_pass_seconds ) )
+
+
+if __name__ == "__main__":
+    main()
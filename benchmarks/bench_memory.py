@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+
+# Memory per entry of the result representations: parse_file dictionaries, parsed_entry dictionaries,
+# PEPRecord objects and PEPBatch columnar batches.
+#
+# Usage: python benchmarks/bench_memory.py [number of entries]
+
+import os
+import sys
+import random
+import tempfile
+import tracemalloc
+
+from pepreader.pepreader import PEPReader
+from pepreader.pep import PEP
+
+
+def allocated( function=None ):
+    """
+    Returns the result of function and the memory it keeps allocated, in bytes.
+    """
+
+    tracemalloc.start()
+
+    result = function()
+
+    current, peak = tracemalloc.get_traced_memory()
+
+    tracemalloc.stop()
+
+    return ( result, current )
+
+
+def main():
+    total = int( sys.argv[1] ) if len( sys.argv ) > 1 else 50000
+
+    generator = random.Random( 0 )
+
+    with tempfile.NamedTemporaryFile( mode='w', suffix='.pep', delete=False ) as f:
+        for entry in range( total ):
+            sequence = ''.join( generator.choice( 'ACDEFGHIKLMNPQRSTVWY' ) for i in range( generator.randint( 100, 600 ) ) )
+
+            f.write( '>hsa:%d  GENE%d; some protein (EC:1.1.1.%d)\n' % ( entry, entry, entry % 50 ) )
+            f.write( '\n'.join( sequence[ start:start + 60 ] for start in range( 0, len( sequence ), 60 ) ) + '\n' )
+
+    pep = PEP( f.name )
+    pepreader = PEPReader( pep=pep )
+
+    representations = [
+        ( 'parse_file dicts', pep.parse_file ),
+        ( 'parsed_entry dicts', lambda: list( pepreader.iter_parsed_entries() ) ),
+        ( 'PEPRecord', lambda: list( pepreader.iter_parsed_entries( compact=True ) ) ),
+        ( 'PEPBatch', lambda: list( pep.iter_batches() ) ),
+    ]
+
+    print( 'entries: %d' % total )
+
+    for name, function in representations:
+        result, size = allocated( function )
+
+        print( '%-20s %8.1f bytes/entry' % ( name, size / total ) )
+
+        del result
+
+    os.remove( f.name )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+# Compare the line by line scan of entries position with the block scan and the memory-mapped scan of PEP.
+#
+# Usage: python benchmarks/bench_positions.py [number of entries]
+
+import os
+import sys
+import time
+import random
+import shutil
+import tempfile
+
+from pepreader.pep import PEP
+
+AMINO_ACIDS = 'ACDEFGHIKLMNPQRSTVWY'
+
+
+def write_pep( path=None, total=None ):
+    """
+    Write a pep file with random entries (sequences from 50 to 2000 amino acids, 60 per line).
+    """
+
+    generator = random.Random( 0 )
+
+    with open( path, 'w' ) as f:
+        for number in range( total ):
+            sequence = ''.join( generator.choice( AMINO_ACIDS ) for i in range( generator.randint( 50, 2000 ) ) )
+
+            f.write( '>hsa:%d  GENE%d; protein %d (EC:1.1.1.%d)\n' % ( number, number, number, number % 300 ) )
+            f.write( '\n'.join( sequence[ start:start + 60 ] for start in range( 0, len( sequence ), 60 ) ) + '\n' )
+
+
+def line_scan( path=None ):
+    """
+    The line by line scan (how generate_entries_position used to work).
+    """
+
+    entries_position = []
+    position = 0
+
+    with open( path, 'rb' ) as pep_file:
+        for line in pep_file:
+            if line.startswith( b'>' ):
+                entries_position.append( position )
+
+            position = position + len( line )
+
+    return entries_position
+
+
+def timed( function=None ):
+    started = time.perf_counter()
+    result = function()
+
+    return result, time.perf_counter() - started
+
+
+def main():
+    total = int( sys.argv[1] ) if len( sys.argv ) > 1 else 200000
+
+    directory = tempfile.mkdtemp()
+    path = os.path.join( directory, 'bench.pep' )
+
+    try:
+        write_pep( path, total )
+
+        megabytes = os.path.getsize( path ) / 1048576
+
+        line_positions, line_seconds = timed( lambda: line_scan( path ) )
+
+        pep = PEP( path )
+        block_seconds = timed( pep.generate_entries_position )[1]
+
+        with PEP( path, use_mmap=True ) as mapped_pep:
+            mmap_seconds = timed( mapped_pep.generate_entries_position )[1]
+
+        assert list( pep.entries_position ) == line_positions == list( mapped_pep.entries_position )
+
+        list_bytes = sys.getsizeof( line_positions ) + sum( sys.getsizeof( position ) for position in line_positions )
+
+        print( 'entries:     %d (%.1f MB)' % ( total, megabytes ) )
+        print( 'line scan:   %.3f s (%.0f MB/s)' % ( line_seconds, megabytes / line_seconds ) )
+        print( 'block scan:  %.3f s (%.0f MB/s)' % ( block_seconds, megabytes / block_seconds ) )
+        print( 'mmap scan:   %.3f s (%.0f MB/s)' % ( mmap_seconds, megabytes / mmap_seconds ) )
+        print( 'positions:   list %.1f MB, array %.1f MB' % ( list_bytes / 1048576, sys.getsizeof( pep.entries_position ) / 1048576 ) )
+    finally:
+        shutil.rmtree( directory )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+
+# Sequence assembly of very long proteins (titin has about 35k residues, around 580 lines of 60 residues).
+#
+# Compares the line by line concatenation of append_sequence with the assembly used by PEP
+# (iter_entries joins the lines once, get_entry_record strips every line break of the raw entry at once).
+#
+# Usage: python benchmarks/bench_sequence.py [sequence length]
+
+import os
+import sys
+import time
+import random
+import tempfile
+
+from pepreader.pep import PEP
+
+
+def best_of( function=None, repeat=5 ):
+    """
+    Returns the best time (in seconds) of some runs of function.
+    """
+
+    times = []
+
+    for i in range( repeat ):
+        started = time.perf_counter()
+        function()
+        times.append( time.perf_counter() - started )
+
+    return min( times )
+
+
+def main():
+    length = int( sys.argv[1] ) if len( sys.argv ) > 1 else 35000
+
+    generator = random.Random( 0 )
+    sequence = ''.join( generator.choice( 'ACDEFGHIKLMNPQRSTVWY' ) for i in range( length ) )
+    lines = [ sequence[ start:start + 60 ] for start in range( 0, length, 60 ) ]
+
+    with tempfile.NamedTemporaryFile( mode='w', suffix='.pep', delete=False ) as f:
+        f.write( '>hsa:7273  TTN; titin\n' + '\n'.join( lines ) + '\n' )
+
+    pep = PEP( f.name )
+
+    def concatenation():
+        result = None
+        for line in lines:
+            result = pep.append_sequence( result, line )
+        return result
+
+    def join():
+        return ''.join( lines )
+
+    assert concatenation() == join() == pep.get_entry_record( 0 )['sequence'] == pep.parse_file()[0]['sequence']
+
+    print( 'sequence length:  %d (%d lines)' % ( length, len( lines ) ) )
+    print( 'append_sequence:  %.1f us' % ( best_of( concatenation ) * 1e6 ) )
+    print( 'join:             %.1f us' % ( best_of( join ) * 1e6 ) )
+    print( 'get_entry_record: %.1f us (read included)' % ( best_of( lambda: pep.get_entry_record( 0 ) ) * 1e6 ) )
+    print( 'parse_file:       %.1f us (open and read included)' % ( best_of( pep.parse_file ) * 1e6 ) )
+
+    pep.close()
+    os.remove( f.name )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+
+# Deterministic generator of realistic pep files for the benchmarks.
+#
+# The same arguments always write the same file (byte for byte), so results of different commits are comparable.
+#
+# Usage: python benchmarks/fixtures.py path [number of entries]
+
+import sys
+import random
+
+AMINO_ACIDS = 'ACDEFGHIKLMNPQRSTVWY'
+
+ORGANISMS = [ 'hsa', 'mmu', 'rno', 'dme', 'eco', 'sce', 'ath', 'dre', 'bta', 'gga' ]
+
+GENES = [ 'Agpat3', 'Alb', 'BAIAP2', 'Acadm', 'ADH1B', 'Gapdh', 'Hk2', 'TTN' ]
+
+DESCRIPTIONS = [
+    '1-acylglycerol-3-phosphate O-acyltransferase 3',
+    'albumin',
+    'brain-specific angiogenesis inhibitor 1-associated protein 2',
+    'acyl-CoA dehydrogenase, C-4 to C-12 straight chain',
+    'alcohol dehydrogenase 1B (class I), beta polypeptide',
+    'glyceraldehyde-3-phosphate dehydrogenase',
+]
+
+EC_NUMBERS = [ '2.3.1.51', '1.1.1.1', '2.7.1.1', '1.2.1.12', '1.3.8.7', '2.3.1.-', '3.1.3.16', '1.1.1.27' ]
+
+# Sequence length distributions: ( name, function of the random generator ).
+LENGTHS = {
+    # Close to KEGG: most proteins have a few hundred residues, a few are huge (titin has about 35k).
+    'kegg': lambda generator: min( 35000, max( 20, int( generator.lognormvariate( 5.8, 0.6 ) ) ) ),
+    'short': lambda generator: generator.randint( 20, 120 ),
+    'uniform': lambda generator: generator.randint( 50, 2000 ),
+    'long': lambda generator: generator.randint( 5000, 35000 ),
+}
+
+EC_STYLES = ( 'mixed', 'brackets', 'square', 'none' )
+
+
+def ec_annotation( generator=None, ec_style=None ):
+    """
+    Returns the EC annotation of a header (an empty string for about half of the headers).
+    """
+
+    if ec_style == 'none' or generator.random() < 0.5:
+        return ''
+
+    if ec_style == 'mixed':
+        ec_style = generator.choice( ( 'brackets', 'square', 'both' ) )
+
+    brackets = ' (EC:%s)' % generator.choice( EC_NUMBERS )
+    square = '; K%05d %s [EC:%s %s]' % ( generator.randint( 0, 99999 ), generator.choice( DESCRIPTIONS ), generator.choice( EC_NUMBERS ), generator.choice( EC_NUMBERS ) )
+
+    if ec_style == 'brackets':
+        return brackets
+
+    if ec_style == 'square':
+        return square
+
+    return brackets + square
+
+
+def write_pep( path=None, entries=10000, lengths='kegg', ec_style='mixed', line_ending='\n', line_width=60, seed=0 ):
+    """
+    Write a pep file with random entries in the KEGG style.
+
+    Entries are grouped by organism, in runs of random size, like the merged KEGG genes.pep.
+
+    Args:
+        path(str): Path of the pep file.
+        entries(int): Number of entries.
+        lengths(str): Sequence length distribution ('kegg', 'short', 'uniform' or 'long').
+        ec_style(str): EC annotation style ('mixed', 'brackets', 'square' or 'none').
+        line_ending(str): '\\n' or '\\r\\n'.
+        line_width(int): Residues per sequence line.
+        seed(int): Seed of the random generator.
+
+    Returns:
+        (int): Size of the file, in bytes.
+    """
+
+    generator = random.Random( seed )
+    length = LENGTHS[ lengths ]
+
+    size = 0
+    organism = None
+    run = 0
+
+    with open( path, 'w', newline='' ) as f:
+        for number in range( entries ):
+            if run == 0:
+                organism = generator.choice( ORGANISMS )
+                run = generator.randint( 1, 500 )
+
+            run = run - 1
+
+            sequence = ''.join( generator.choices( AMINO_ACIDS, k=length( generator ) ) )
+
+            header = '>%s:%d  %s; %s%s' % ( organism, number, generator.choice( GENES ), generator.choice( DESCRIPTIONS ), ec_annotation( generator, ec_style ) )
+            lines = [ sequence[ start:start + line_width ] for start in range( 0, len( sequence ), line_width ) ]
+
+            text = header + line_ending + line_ending.join( lines ) + line_ending
+
+            f.write( text )
+            size = size + len( text )
+
+    return size
+
+
+if __name__ == "__main__":
+    print( write_pep( sys.argv[1], int( sys.argv[2] ) if len( sys.argv ) > 2 else 10000 ) )
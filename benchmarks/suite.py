@@ -0,0 +1,326 @@
+# -*- coding: utf-8 -*-
+
+# Benchmark suite of the PEP and PEPReader hot paths over a generated pep file (see fixtures.py).
+#
+# Every case reports its time, throughput (entries/s and MB/s) and peak memory. Lookup cases report the
+# latency of a single lookup (median and 99th percentile). Results can be saved as JSON and compared with the
+# results of another commit.
+#
+# Usage:
+#
+#     python benchmarks/suite.py --entries 200000 --output before.json
+#     python benchmarks/suite.py --entries 200000 --output after.json --compare before.json
+
+import os
+import sys
+import glob
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import subprocess
+
+from pepreader.pepreader import PEPReader
+from pepreader.pep import PEP
+
+from fixtures import write_pep, LENGTHS, EC_STYLES
+
+
+def throughput_cases( pep_file=None ):
+    """
+    Returns the cases that go through the whole file: ( name, function ), the function returns the number of entries.
+    """
+
+    def positions():
+        pep = PEP( pep_file )
+        pep.generate_entries_position()
+
+        return len( pep.entries_position )
+
+    def positions_mmap():
+        with PEP( pep_file, use_mmap=True ) as pep:
+            pep.generate_entries_position()
+
+            return len( pep.entries_position )
+
+    def parse_file():
+        return len( PEP( pep_file ).parse_file() )
+
+    def iter_entries():
+        return sum( 1 for entry in PEP( pep_file ).iter_entries() )
+
+    def iter_batches():
+        return sum( len( batch ) for batch in PEP( pep_file ).iter_batches() )
+
+    def iter_parsed_entries():
+        return sum( 1 for entry in PEPReader( pep=PEP( pep_file ) ).iter_parsed_entries() )
+
+    def iter_parsed_entries_lazy():
+        return sum( 1 for entry in PEPReader( pep=PEP( pep_file ) ).iter_parsed_entries( lazy=True ) )
+
+    def iter_parsed_entries_where():
+        # About a tenth of the entries match (one organism of ten), the rest is only scanned.
+        return sum( 1 for entry in PEPReader( pep=PEP( pep_file ) ).iter_parsed_entries( where={ 'organisms': [ 'hsa' ] } ) )
+
+    def iter_unique_sequences():
+        return sum( len( entry['identifications'] ) for entry in PEPReader( pep=PEP( pep_file ) ).iter_unique_sequences() )
+
+    def load_index():
+        # Built from zero at every run.
+        for index_file in glob.glob( pep_file + '*.idx' ):
+            os.remove( index_file )
+
+        with PEPReader( pep=PEP( pep_file ) ) as pepreader:
+            return pepreader.load_index().count
+
+    return [
+        ( 'generate_entries_position', positions ),
+        ( 'generate_entries_position_mmap', positions_mmap ),
+        ( 'parse_file', parse_file ),
+        ( 'iter_entries', iter_entries ),
+        ( 'iter_batches', iter_batches ),
+        ( 'iter_parsed_entries', iter_parsed_entries ),
+        ( 'iter_parsed_entries_lazy', iter_parsed_entries_lazy ),
+        ( 'iter_parsed_entries_where', iter_parsed_entries_where ),
+        ( 'iter_unique_sequences', iter_unique_sequences ),
+        ( 'load_index', load_index ),
+    ]
+
+
+def lookup_cases( pep_file=None, lookups=None, seed=0 ):
+    """
+    Returns the lookup cases: ( name, setup ), setup returns the function of a single lookup and its arguments.
+    """
+
+    pep = PEP( pep_file )
+    pep.generate_entries_position()
+
+    generator = random.Random( seed )
+
+    positions = [ generator.choice( pep.entries_position ) for lookup in range( lookups ) ]
+    headers = [ pep.read_header( position, pep.entry_end( position ) - position ) for position in positions ]
+
+    pep.close()
+
+    def get_entry_record():
+        pep = PEP( pep_file )
+        pep.generate_entries_position()
+
+        return ( pep.get_entry_record, positions, pep.close )
+
+    def parsed_entry_mmap():
+        pepreader = PEPReader( pep=PEP( pep_file, use_mmap=True ) )
+        pepreader.entries_position()
+
+        return ( pepreader.parsed_entry, positions, pepreader.close )
+
+    def get_by_identification():
+        pepreader = PEPReader( pep=PEP( pep_file ) )
+        pepreader.load_index()
+
+        identifications = [ pepreader.protein_identification( header ) for header in headers ]
+
+        return ( pepreader.get_by_identification, identifications, pepreader.close )
+
+    def header_methods():
+        pepreader = PEPReader( pep=PEP() )
+
+        def per_field( header ):
+            return ( pepreader.protein_identification( header ), pepreader.organism_code( header ), pepreader.full_fasta_header( header ),
+                     pepreader.protein_description( header ), pepreader.ec_from_square_brackets( header ), pepreader.ec_from_brackets( header ) )
+
+        return ( per_field, headers, None )
+
+    def parse_header():
+        return ( PEPReader( pep=PEP() ).parse_header, headers, None )
+
+    return [
+        ( 'get_entry_record', get_entry_record ),
+        ( 'parsed_entry_mmap', parsed_entry_mmap ),
+        ( 'get_by_identification', get_by_identification ),
+        ( 'header_methods', header_methods ),
+        ( 'parse_header', parse_header ),
+    ]
+
+
+def peak_memory( function=None ):
+    """
+    Returns the peak of memory allocated by function, in bytes (it runs function again, with tracemalloc).
+    """
+
+    tracemalloc.start()
+
+    try:
+        function()
+
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_throughput( name=None, function=None, size=None, memory=True ):
+    started = time.perf_counter()
+    entries = function()
+    seconds = time.perf_counter() - started
+
+    result = {
+        'seconds': seconds,
+        'entries': entries,
+        'entries_per_second': entries / seconds,
+        'mb_per_second': size / 1048576 / seconds,
+    }
+
+    if memory:
+        result['peak_memory'] = peak_memory( function )
+
+    return result
+
+
+def run_lookup( name=None, setup=None, memory=True ):
+    function, arguments, teardown = setup()
+
+    latencies = []
+
+    try:
+        for argument in arguments:
+            started = time.perf_counter()
+            function( argument )
+            latencies.append( time.perf_counter() - started )
+
+        if memory:
+            memory_used = peak_memory( lambda: [ function( argument ) for argument in arguments ] )
+    finally:
+        if teardown is not None:
+            teardown()
+
+    latencies.sort()
+
+    result = {
+        'seconds': sum( latencies ),
+        'lookups': len( latencies ),
+        'median_us': latencies[ len( latencies ) // 2 ] * 1e6,
+        'p99_us': latencies[ min( len( latencies ) - 1, int( len( latencies ) * 0.99 ) ) ] * 1e6,
+    }
+
+    if memory:
+        result['peak_memory'] = memory_used
+
+    return result
+
+
+def git_commit():
+    """
+    Returns the current git commit, or None outside a git repository.
+    """
+
+    try:
+        return subprocess.run( [ 'git', 'rev-parse', 'HEAD' ], capture_output=True, text=True, check=True ).stdout.strip()
+    except ( OSError, subprocess.CalledProcessError ):
+        return None
+
+
+def compare( results=None, baseline=None ):
+    """
+    Print every case next to the same case of the baseline results (speedup above 1 means faster than the baseline).
+
+    Throughput cases are compared by entries per second and lookup cases by median latency.
+    """
+
+    print( '\ncompared with %s' % baseline.get( 'commit' ) )
+
+    if baseline['parameters'] != results['parameters']:
+        print( 'warning: different parameters %s' % baseline['parameters'] )
+
+    for name, result in results['cases'].items():
+        old = baseline['cases'].get( name )
+
+        if old is None:
+            continue
+
+        if 'entries_per_second' in result:
+            speedup = result['entries_per_second'] / old['entries_per_second']
+        else:
+            speedup = old['median_us'] / result['median_us']
+
+        line = '%-32s speedup %5.2fx' % ( name, speedup )
+
+        if 'peak_memory' in result and 'peak_memory' in old and result['peak_memory']:
+            line = line + '   memory %5.2fx' % ( old['peak_memory'] / result['peak_memory'] )
+
+        print( line )
+
+
+def main():
+    parser = argparse.ArgumentParser( description='Benchmark suite of pepreader.' )
+    parser.add_argument( '--entries', type=int, default=100000, help='number of entries of the generated pep file' )
+    parser.add_argument( '--lengths', choices=sorted( LENGTHS ), default='kegg', help='sequence length distribution' )
+    parser.add_argument( '--ec-style', choices=EC_STYLES, default='mixed', help='EC annotation style' )
+    parser.add_argument( '--line-ending', choices=( 'lf', 'crlf' ), default='lf' )
+    parser.add_argument( '--lookups', type=int, default=2000, help='number of lookups of the lookup cases' )
+    parser.add_argument( '--seed', type=int, default=0 )
+    parser.add_argument( '--cases', nargs='*', help='only run these cases' )
+    parser.add_argument( '--no-memory', action='store_true', help="don't measure peak memory (each case runs once)" )
+    parser.add_argument( '--output', help='save the results to this JSON file' )
+    parser.add_argument( '--compare', help='JSON results to compare with' )
+
+    arguments = parser.parse_args()
+
+    parameters = {
+        'entries': arguments.entries,
+        'lengths': arguments.lengths,
+        'ec_style': arguments.ec_style,
+        'line_ending': arguments.line_ending,
+        'lookups': arguments.lookups,
+        'seed': arguments.seed,
+    }
+
+    directory = tempfile.mkdtemp()
+    pep_file = os.path.join( directory, 'bench.pep' )
+
+    try:
+        size = write_pep( pep_file, arguments.entries, arguments.lengths, arguments.ec_style, '\r\n' if arguments.line_ending == 'crlf' else '\n', seed=arguments.seed )
+
+        results = {
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'parameters': parameters,
+            'file_size': size,
+            'cases': {},
+        }
+
+        print( 'pep file: %d entries, %.1f MB' % ( arguments.entries, size / 1048576 ) )
+
+        for name, function in throughput_cases( pep_file ):
+            if arguments.cases and name not in arguments.cases:
+                continue
+
+            result = results['cases'][ name ] = run_throughput( name, function, size, not arguments.no_memory )
+
+            print( '%-32s %8.3f s %10.0f entries/s %8.1f MB/s' % ( name, result['seconds'], result['entries_per_second'], result['mb_per_second'] ) )
+
+        for name, setup in lookup_cases( pep_file, arguments.lookups, arguments.seed ):
+            if arguments.cases and name not in arguments.cases:
+                continue
+
+            result = results['cases'][ name ] = run_lookup( name, setup, not arguments.no_memory )
+
+            print( '%-32s %8.1f us median %8.1f us p99' % ( name, result['median_us'], result['p99_us'] ) )
+    finally:
+        shutil.rmtree( directory )
+
+    if arguments.output:
+        with open( arguments.output, 'w' ) as f:
+            json.dump( results, f, indent=2 )
+
+    if arguments.compare:
+        with open( arguments.compare ) as f:
+            compare( results, json.load( f ) )
+
+
+if __name__ == "__main__":
+    main()
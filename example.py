@@ -6,12 +6,14 @@ from pepreader.pep import PEP
 
 # Load the reader and load the dbgetreader
 pep = PEP(pep_file='./tests/fixtures/example.pep')
-pepreader = PEPReader(pep=pep)
 
-# Get the positions from all the entries from the chosen file
-positions = pepreader.entries_position()
+# The reader keeps the pep file open while it's in use.
+with PEPReader(pep=pep) as pepreader:
 
-# Iterate through all the positions and get the entry for that position.
-for position in positions:
-    entry = pepreader.parsed_entry(position)
-    print(entry['identification'])
+    # Get the positions from all the entries from the chosen file
+    positions = pepreader.entries_position()
+
+    # Iterate through all the positions and get the entry for that position.
+    for position in positions:
+        entry = pepreader.parsed_entry(position)
+        print(entry['identification'])
@@ -1,2 +1,13 @@
 from pepreader.pep import *
 from pepreader.pepreader import *
+from pepreader.pepindex import *
+from pepreader.records import *
+from pepreader.columns import *
+from pepreader.compression import *
+from pepreader.asyncreader import *
+from pepreader.cache import *
+from pepreader.keyindex import *
+from pepreader.stats import *
+from pepreader.validation import *
+from pepreader.sequenceindex import *
+from pepreader.filters import *
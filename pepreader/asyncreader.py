@@ -0,0 +1,156 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+
+class AsyncPEPReader:
+    """
+    asyncio facade of PEPReader, for services that can't block the event loop.
+
+    Every file access runs in a bounded thread pool. The threads share the single file handle of the PEP
+    object (plain files are read with pread, so there's no seek to serialize). Concurrent requests for the same
+    entry are merged: the entry is read once and every caller gets the same dictionary.
+
+    Example:
+
+        async with AsyncPEPReader( PEPReader( pep=PEP( 'genes.pep' ) ) ) as reader:
+            entries = await reader.get_many( [ 'hsa:10458', 'rno:24189' ] )
+
+    Attributes:
+        pepreader(PEPReader): The reader that does the work.
+        max_workers(int): Maximum number of threads doing file access at the same time.
+    """
+
+    def __init__( self, pepreader=None, max_workers=8 ):
+        self.pepreader = pepreader
+        self.max_workers = max_workers
+
+        self.executor = ThreadPoolExecutor( max_workers=max_workers )
+
+        # Requests being read right now, by position.
+        self.pending = {}
+
+    async def __aenter__( self ):
+        return self
+
+    async def __aexit__( self, *exc_info ):
+        await self.close()
+
+    async def run( self, function=None, *args ):
+        """
+        Run a blocking function in the thread pool.
+
+        Args:
+            function(function): The blocking function.
+            args: Its arguments.
+
+        Returns:
+            The result of the function.
+        """
+
+        return await asyncio.get_running_loop().run_in_executor( self.executor, function, *args )
+
+    async def parsed_entry( self, offset=None ):
+        """
+        Returns the entry of a pep file in a dictionary format (see PEPReader.parsed_entry).
+
+        Args:
+            offset(int): Position of the entry.
+
+        Returns:
+            (dict): Dictionary containing an pep file entry.
+        """
+
+        future = self.pending.get( offset )
+
+        if future is None:
+            future = asyncio.ensure_future( self.run( self.pepreader.parsed_entry, offset ) )
+
+            self.pending[ offset ] = future
+            future.add_done_callback( lambda done: self.pending.pop( offset, None ) )
+
+        # A caller that gives up doesn't cancel the read for the other callers.
+        return await asyncio.shield( future )
+
+    async def get_by_identification( self, identification=None ):
+        """
+        Returns the entry of a protein identification in a dictionary format (see PEPReader.get_by_identification).
+
+        Args:
+            identification(str): Protein identification (like 'hsa:10458').
+
+        Returns:
+            (dict): Dictionary containing an pep file entry or None if the identification isn't in the pep file.
+        """
+
+        position = await self.run( self.pepreader.identification_position, identification )
+
+        if position is None:
+            return None
+
+        return await self.parsed_entry( position )
+
+    async def get_many( self, identifications=None ):
+        """
+        Returns the entries of many protein identifications in a dictionary format (see PEPReader.get_many).
+
+        Args:
+            identifications(list): Protein identifications.
+
+        Returns:
+            (list): Dictionaries containing pep file entries, in the same order of the identifications. None for identifications that aren't in the pep file.
+        """
+
+        positions = await self.run( lambda: [ self.pepreader.identification_position( identification ) for identification in identifications ] )
+
+        # Sorted positions, so the reads go through the file in order.
+        unique_positions = sorted( set( positions ) - { None } )
+
+        entries = await asyncio.gather( *[ self.parsed_entry( position ) for position in unique_positions ] )
+        entries = dict( zip( unique_positions, entries ) )
+
+        return [ entries.get( position ) for position in positions ]
+
+    async def aiter_entries( self, batch_size=1024, **options ):
+        """
+        Yield every entry of the pep file, in file order (see PEPReader.iter_parsed_entries).
+
+        Entries are read in batches in the thread pool, so the event loop only waits once per batch.
+
+        Args:
+            batch_size(int): Number of entries read at each step.
+            options: Options of PEPReader.iter_parsed_entries (like lazy=True).
+
+        Returns:
+            (async generator): Dictionaries containing pep file entries.
+        """
+
+        entries = self.pepreader.iter_parsed_entries( **options )
+
+        def next_batch():
+            batch = []
+
+            for entry in entries:
+                batch.append( entry )
+
+                if len( batch ) >= batch_size:
+                    break
+
+            return batch
+
+        while True:
+            batch = await self.run( next_batch )
+
+            if not batch:
+                break
+
+            for entry in batch:
+                yield entry
+
+    async def close( self ):
+        """
+        Wait for the running reads, stop the thread pool and close the reader.
+        """
+
+        await asyncio.get_running_loop().run_in_executor( None, self.executor.shutdown )
+
+        self.pepreader.close()
@@ -0,0 +1,177 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+
+class EntryCache:
+    """
+    LRU cache of parsed pep entries with a budget in bytes.
+
+    Entries are keyed by position and can also be found by identification. When the entries take more than
+    the budget, the least recently used ones are evicted. The cache is tied to a pep file: it's cleared as soon
+    as the size or the modification time of the file changes (see check).
+
+    It's safe to use it from many threads.
+
+    Attributes:
+        pep_file(str): Path of the pep file.
+        max_bytes(int): Memory budget, in bytes.
+        size(int): Memory used by the cached entries, in bytes (estimated).
+        hits(int): Number of lookups that found the entry.
+        misses(int): Number of lookups that didn't find the entry.
+        evictions(int): Number of entries evicted to respect the budget.
+        invalidations(int): Number of times the cache was cleared because the pep file changed.
+    """
+
+    def __init__( self, pep_file=None, max_bytes=67108864 ):
+        self.pep_file = pep_file
+        self.max_bytes = max_bytes
+
+        self.entries = OrderedDict()
+        self.identifications = {}
+
+        self.size = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+        self.stamp = self.source_stamp()
+
+        self.lock = threading.Lock()
+
+    def source_stamp( self ):
+        """
+        Returns the size and the modification time of the pep file.
+
+        Returns:
+            (tuple): ( size, mtime in nanoseconds )
+        """
+
+        stat = os.stat( self.pep_file )
+
+        return ( stat.st_size, stat.st_mtime_ns )
+
+    def check( self ):
+        """
+        Clear the cache if the pep file changed since the entries were cached.
+
+        Returns:
+            (boolean): True if the pep file changed.
+        """
+
+        stamp = self.source_stamp()
+
+        if stamp == self.stamp:
+            return False
+
+        with self.lock:
+            self.entries.clear()
+            self.identifications.clear()
+
+            self.size = 0
+            self.stamp = stamp
+            self.invalidations = self.invalidations + 1
+
+        return True
+
+    def entry_size( self, entry=None ):
+        """
+        Returns the estimated memory of a parsed entry, in bytes.
+
+        Args:
+            entry(dict): Dictionary containing an pep file entry.
+
+        Returns:
+            (int): Size in bytes.
+        """
+
+        return sys.getsizeof( entry ) + sum( sys.getsizeof( value ) for value in entry.values() )
+
+    def get( self, offset=None ):
+        """
+        Returns a cached entry by its position.
+
+        Args:
+            offset(int): Position of the entry.
+
+        Returns:
+            (dict): The cached entry or None.
+        """
+
+        with self.lock:
+            cached = self.entries.get( offset )
+
+            if cached is None:
+                self.misses = self.misses + 1
+                return None
+
+            self.entries.move_to_end( offset )
+            self.hits = self.hits + 1
+
+            return cached[0]
+
+    def position( self, identification=None ):
+        """
+        Returns the position of a cached entry by its identification.
+
+        Args:
+            identification(str): Protein identification.
+
+        Returns:
+            (int): Position of the entry or None if it isn't cached.
+        """
+
+        with self.lock:
+            return self.identifications.get( identification )
+
+    def put( self, offset=None, entry=None ):
+        """
+        Cache an entry, evicting the least recently used entries if the budget is exceeded.
+
+        Args:
+            offset(int): Position of the entry.
+            entry(dict): Dictionary containing an pep file entry.
+        """
+
+        size = self.entry_size( entry )
+
+        # An entry larger than the whole budget isn't cached.
+        if size > self.max_bytes:
+            return
+
+        with self.lock:
+            if offset in self.entries:
+                return
+
+            self.entries[ offset ] = ( entry, size )
+            self.identifications[ entry['identification'] ] = offset
+            self.size = self.size + size
+
+            while self.size > self.max_bytes:
+                evicted_offset, ( evicted, evicted_size ) = self.entries.popitem( last=False )
+
+                self.identifications.pop( evicted['identification'], None )
+                self.size = self.size - evicted_size
+                self.evictions = self.evictions + 1
+
+    def info( self ):
+        """
+        Returns the counters of the cache.
+
+        Returns:
+            (dict): 'hits', 'misses', 'evictions', 'invalidations', 'entries', 'size' and 'max_bytes'.
+        """
+
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+                'entries': len( self.entries ),
+                'size': self.size,
+                'max_bytes': self.max_bytes,
+            }
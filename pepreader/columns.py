@@ -0,0 +1,249 @@
+import os
+import json
+import struct
+from array import array
+
+COLUMNS = ( 'identification', 'organism_code', 'description', 'ec_numbers', 'sequence' )
+
+
+class ColumnWriter:
+    """
+    Write parsed pep entries to a columnar file, one row group at a time.
+
+    Each row group keeps every column in a single contiguous utf-8 buffer plus an offset array, so reading a
+    column back is one bulk read, not a parse of the Fasta text. EC numbers are stored space separated.
+
+    File layout:
+
+    * magic.
+    * row groups: for every column, the offsets (number of rows + 1 unsigned 64 bits integers) and then the buffer.
+    * footer: json with the columns and the position, size and number of rows of every row group.
+    * footer size (unsigned 64 bits integer) and magic.
+
+    Example:
+
+        with ColumnWriter( 'genes.pepc' ) as writer:
+            for columns in pepreader.to_columns():
+                writer.write_row_group( columns )
+
+    Attributes:
+        column_file(str): Path of the columnar file.
+        row_groups(list): Position, size and number of rows of every row group written.
+    """
+
+    MAGIC = b'PEPCOL01'
+
+    def __init__( self, column_file=None ):
+        self.column_file = column_file
+        self.row_groups = []
+
+        self.handle = open( column_file, 'wb' )
+        self.handle.write( self.MAGIC )
+
+    def __enter__( self ):
+        return self
+
+    def __exit__( self, exc_type, exc_value, traceback ):
+        # A failed export leaves no file: with the footer, the rows written so far would look like a whole file.
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
+
+    def write_row_group( self, columns=None ):
+        """
+        Write a row group.
+
+        Args:
+            columns(dict): A list of values for every column (see PEPReader.to_columns).
+        """
+
+        rows = len( columns['identification'] )
+        position = self.handle.tell()
+
+        for name in COLUMNS:
+            values = columns[ name ]
+
+            if name == 'ec_numbers':
+                values = [ ' '.join( ec_numbers ) for ec_numbers in values ]
+
+            encoded = [ value.encode() for value in values ]
+
+            offsets = array( 'Q', [ 0 ] )
+            size = 0
+
+            for value in encoded:
+                size = size + len( value )
+                offsets.append( size )
+
+            offsets.tofile( self.handle )
+            self.handle.write( b''.join( encoded ) )
+
+        self.row_groups.append( { 'position': position, 'size': self.handle.tell() - position, 'rows': rows } )
+
+    def close( self ):
+        """
+        Write the footer and close the file.
+        """
+
+        if self.handle is None:
+            return
+
+        footer = json.dumps( { 'columns': COLUMNS, 'row_groups': self.row_groups } ).encode()
+
+        self.handle.write( footer )
+        self.handle.write( struct.pack( '<Q', len( footer ) ) )
+        self.handle.write( self.MAGIC )
+
+        self.handle.close()
+        self.handle = None
+
+    def abort( self ):
+        """
+        Close the file without the footer and remove it.
+        """
+
+        if self.handle is None:
+            return
+
+        self.handle.close()
+        self.handle = None
+
+        os.remove( self.column_file )
+
+
+class ColumnReader:
+    """
+    Read a columnar file written by ColumnWriter.
+
+    Attributes:
+        column_file(str): Path of the columnar file.
+        row_groups(list): Position, size and number of rows of every row group.
+        rows(int): Total number of rows.
+    """
+
+    def __init__( self, column_file=None ):
+        self.column_file = column_file
+
+        with open( column_file, 'rb' ) as handle:
+            if handle.read( 8 ) != ColumnWriter.MAGIC:
+                raise ValueError( 'Not a pep columnar file: ' + column_file )
+
+            handle.seek( -16, 2 )
+            footer_size, magic = struct.unpack( '<Q8s', handle.read( 16 ) )
+
+            if magic != ColumnWriter.MAGIC:
+                raise ValueError( 'Incomplete pep columnar file: ' + column_file )
+
+            handle.seek( -16 - footer_size, 2 )
+            footer = json.loads( handle.read( footer_size ).decode() )
+
+        self.row_groups = footer['row_groups']
+        self.rows = sum( row_group['rows'] for row_group in self.row_groups )
+
+    def iter_row_groups( self, names=None ):
+        """
+        Yield the row groups, one at a time.
+
+        Args:
+            names(list): Columns to decode (default is every column). The other columns are skipped.
+
+        Returns:
+            (generator): Dictionaries with a list of values for every column.
+        """
+
+        if names is None:
+            names = COLUMNS
+
+        with open( self.column_file, 'rb' ) as handle:
+            for row_group in self.row_groups:
+                handle.seek( row_group['position'] )
+
+                data = memoryview( handle.read( row_group['size'] ) )
+
+                rows = row_group['rows']
+                start = 0
+                columns = {}
+
+                for name in COLUMNS:
+                    offsets = data[ start:start + ( rows + 1 ) * 8 ].cast( 'Q' )
+                    start = start + ( rows + 1 ) * 8
+
+                    buffer_size = offsets[ rows ]
+
+                    if name in names:
+                        buffer = bytes( data[ start:start + buffer_size ] )
+
+                        values = [ buffer[ offsets[ row ]:offsets[ row + 1 ] ].decode() for row in range( rows ) ]
+
+                        if name == 'ec_numbers':
+                            values = [ value.split(' ') if value else [] for value in values ]
+
+                        columns[ name ] = values
+
+                    offsets.release()
+
+                    start = start + buffer_size
+
+                yield columns
+
+    def read( self, names=None ):
+        """
+        Returns whole columns.
+
+        Args:
+            names(list): Columns to read (default is every column).
+
+        Returns:
+            (dict): A list of values for every column.
+        """
+
+        if names is None:
+            names = COLUMNS
+
+        columns = { name: [] for name in names }
+
+        for row_group in self.iter_row_groups( names ):
+            for name in names:
+                columns[ name ].extend( row_group[ name ] )
+
+        return columns
+
+
+def write_parquet( columns=None, parquet_file=None ):
+    """
+    Write row groups (see PEPReader.to_columns) to a Parquet file.
+
+    Parquet needs pyarrow, which isn't a dependency of pepreader: it has to be installed to use this function.
+
+    When writing fails the Parquet file is removed.
+
+    Args:
+        columns(iterable): Dictionaries with a list of values for every column, one per row group.
+        parquet_file(str): Path of the Parquet file.
+    """
+
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError( 'write_parquet needs pyarrow (pip install pyarrow)' )
+
+    schema = pyarrow.schema( [
+        ( 'identification', pyarrow.string() ),
+        ( 'organism_code', pyarrow.string() ),
+        ( 'description', pyarrow.string() ),
+        ( 'ec_numbers', pyarrow.list_( pyarrow.string() ) ),
+        ( 'sequence', pyarrow.string() ),
+    ] )
+
+    try:
+        with pyarrow.parquet.ParquetWriter( parquet_file, schema ) as writer:
+            for row_group in columns:
+                writer.write_table( pyarrow.Table.from_pydict( { name: row_group[ name ] for name in COLUMNS }, schema=schema ) )
+    except BaseException:
+        # The writer closes the file (footer included) on errors too: a failed export leaves no file.
+        if os.path.exists( parquet_file ):
+            os.remove( parquet_file )
+
+        raise
@@ -0,0 +1,272 @@
+import io
+import os
+import bz2
+import gzip
+import lzma
+import zlib
+import struct
+from bisect import bisect_right
+
+GZIP_MAGIC = b'\x1f\x8b'
+BZIP2_MAGIC = b'BZh'
+XZ_MAGIC = b'\xfd7zXZ\x00'
+
+# Largest amount of data in a BGZF block (the same of bgzip).
+BGZF_BLOCK_SIZE = 65280
+
+# Empty block that marks the end of a BGZF file.
+BGZF_EOF = bytes.fromhex( '1f8b08040000000000ff0600424302001b0003000000000000000000' )
+
+
+def detect_compression( path=None ):
+    """
+    Returns the compression of a file, from its first bytes.
+
+    Args:
+        path(str): Path of the file.
+
+    Returns:
+        (str): 'bgzf', 'gzip', 'bzip2', 'xz' or None for a plain file.
+    """
+
+    with open( path, 'rb' ) as handle:
+        start = handle.read( 18 )
+
+    if start.startswith( GZIP_MAGIC ):
+        # BGZF is gzip with a 'BC' extra field that has the size of the block.
+        if len( start ) == 18 and start[3] & 4 and start[12:14] == b'BC':
+            return 'bgzf'
+
+        return 'gzip'
+
+    if start.startswith( BZIP2_MAGIC ):
+        return 'bzip2'
+
+    if start.startswith( XZ_MAGIC ):
+        return 'xz'
+
+    return None
+
+
+def open_binary( path=None, buffering=-1 ):
+    """
+    Open a plain or compressed file for binary reading, the compression is detected from the file itself.
+
+    Every file object returned is seekable, but only plain and BGZF files seek fast: gzip, bzip2 and xz
+    files are decompressed again from the beginning to seek backwards.
+
+    Args:
+        path(str): Path of the file.
+        buffering(int): Buffering of plain files (see open).
+
+    Returns:
+        (file): Binary file object with the uncompressed data.
+    """
+
+    compression = detect_compression( path )
+
+    if compression == 'bgzf':
+        return open_bgzf( path )
+
+    if compression == 'gzip':
+        return gzip.open( path, 'rb' )
+
+    if compression == 'bzip2':
+        return bz2.open( path, 'rb' )
+
+    if compression == 'xz':
+        return lzma.open( path, 'rb' )
+
+    return open( path, 'rb', buffering=buffering )
+
+
+def bgzf_compress( source=None, target=None ):
+    """
+    Compress a file in the BGZF format (blocked gzip, the format of bgzip), which allows random access.
+
+    The result is a valid gzip file, so any gzip tool can still read it.
+
+    Args:
+        source(str): Path of the file to compress (plain or compressed in any format detect_compression knows).
+        target(str): Path of the BGZF file.
+    """
+
+    with open_binary( source ) as source_file, open( target, 'wb' ) as target_file:
+        while True:
+            data = source_file.read( BGZF_BLOCK_SIZE )
+
+            if not data:
+                break
+
+            compressor = zlib.compressobj( 6, zlib.DEFLATED, -15 )
+            compressed = compressor.compress( data ) + compressor.flush()
+
+            block_size = 18 + len( compressed ) + 8
+
+            target_file.write( b'\x1f\x8b\x08\x04\x00\x00\x00\x00\x00\xff\x06\x00BC\x02\x00' )
+            target_file.write( struct.pack( '<H', block_size - 1 ) )
+            target_file.write( compressed )
+            target_file.write( struct.pack( '<II', zlib.crc32( data ), len( data ) ) )
+
+        target_file.write( BGZF_EOF )
+
+
+class BGZFRaw( io.RawIOBase ):
+    """
+    Raw reader of BGZF files with random access.
+
+    The block index (compressed and uncompressed position of every block) is built when the file is opened,
+    from the block headers only: nothing is decompressed. Seeking goes straight to the block that has the
+    position and only that block is inflated.
+
+    Attributes:
+        path(str): Path of the BGZF file.
+        blocks_compressed(list): Compressed position of every block.
+        blocks_uncompressed(list): Uncompressed position of every block.
+        size(int): Uncompressed size of the file.
+    """
+
+    def __init__( self, path=None ):
+        self.path = path
+        self.handle = open( path, 'rb' )
+
+        self.blocks_compressed = []
+        self.blocks_uncompressed = []
+        self.size = 0
+
+        self.position = 0
+
+        self._block = None
+        self._block_data = b''
+
+        self.index_blocks()
+
+    def index_blocks( self ):
+        """
+        Build the block index.
+        """
+
+        compressed = 0
+        uncompressed = 0
+
+        while True:
+            self.handle.seek( compressed )
+            header = self.handle.read( 12 )
+
+            if len( header ) < 12:
+                break
+
+            extra_size = struct.unpack( '<H', header[10:12] )[0]
+            extra = self.handle.read( extra_size )
+
+            block_size = None
+            start = 0
+
+            # Extra subfields: identifier (2 bytes), size (2 bytes) and data.
+            while start + 4 <= len( extra ):
+                field_size = struct.unpack( '<H', extra[ start + 2:start + 4 ] )[0]
+
+                if extra[ start:start + 2 ] == b'BC':
+                    block_size = struct.unpack( '<H', extra[ start + 4:start + 6 ] )[0] + 1
+
+                start = start + 4 + field_size
+
+            if block_size is None:
+                raise ValueError( 'Not a BGZF block at %d: %s' % ( compressed, self.path ) )
+
+            self.handle.seek( compressed + block_size - 4 )
+            data_size = struct.unpack( '<I', self.handle.read( 4 ) )[0]
+
+            if data_size > 0:
+                self.blocks_compressed.append( compressed )
+                self.blocks_uncompressed.append( uncompressed )
+
+            compressed = compressed + block_size
+            uncompressed = uncompressed + data_size
+
+        self.size = uncompressed
+
+    def block_data( self, block=None ):
+        """
+        Returns the uncompressed data of a block (the last block read is kept).
+
+        Args:
+            block(int): Block number.
+
+        Returns:
+            (bytes): Uncompressed data.
+        """
+
+        if block != self._block:
+            self.handle.seek( self.blocks_compressed[ block ] )
+
+            header = self.handle.read( 12 )
+            extra_size = struct.unpack( '<H', header[10:12] )[0]
+
+            if block + 1 < len( self.blocks_compressed ):
+                compressed_size = self.blocks_compressed[ block + 1 ] - self.blocks_compressed[ block ]
+            else:
+                compressed_size = os.fstat( self.handle.fileno() ).st_size - self.blocks_compressed[ block ]
+
+            self.handle.seek( self.blocks_compressed[ block ] + 12 + extra_size )
+            compressed = self.handle.read( compressed_size - 12 - extra_size )
+
+            self._block_data = zlib.decompressobj( -15 ).decompress( compressed )
+            self._block = block
+
+        return self._block_data
+
+    def readable( self ):
+        return True
+
+    def seekable( self ):
+        return True
+
+    def tell( self ):
+        return self.position
+
+    def seek( self, offset, whence=0 ):
+        if whence == 1:
+            offset = self.position + offset
+        elif whence == 2:
+            offset = self.size + offset
+
+        self.position = max( 0, offset )
+
+        return self.position
+
+    def readinto( self, buffer ):
+        if self.position >= self.size:
+            return 0
+
+        block = bisect_right( self.blocks_uncompressed, self.position ) - 1
+
+        data = self.block_data( block )
+        start = self.position - self.blocks_uncompressed[ block ]
+
+        chunk = data[ start:start + len( buffer ) ]
+
+        buffer[ :len( chunk ) ] = chunk
+        self.position = self.position + len( chunk )
+
+        return len( chunk )
+
+    def close( self ):
+        if not self.closed:
+            self.handle.close()
+
+        super().close()
+
+
+def open_bgzf( path=None ):
+    """
+    Open a BGZF file for buffered binary reading with random access (see BGZFRaw).
+
+    Args:
+        path(str): Path of the BGZF file.
+
+    Returns:
+        (io.BufferedReader): Binary file object with the uncompressed data.
+    """
+
+    return io.BufferedReader( BGZFRaw( path ), buffer_size=BGZF_BLOCK_SIZE )
@@ -0,0 +1,254 @@
+import re
+
+# EC numbers of both annotation styles, '[EC:1.1.1.1]' and '(EC:1.1.1.1 1.1.1.27)': the same patterns of
+# PEPReader.parse_header, on bytes.
+RE_EC_SQUARE_BRACKETS = re.compile( rb'^>.*\[EC:(.*)\]' )
+RE_EC_BRACKETS = re.compile( rb'^>.*\(EC:(.*)\)' )
+
+
+class EntryFilter:
+    """
+    Filter of pep entries on header fields and sequence length, checked on the raw bytes before an entry is assembled.
+
+    Every check of the header works on the raw header line (bytes): nothing is decoded or parsed for the entries that
+    are left out, so they cost little more than the boundary scan. The sequence length is checked last, when the
+    raw sequence is there but before its lines are joined and decoded (see PEP.iter_entries and
+    PEPReader.iter_parsed_entries).
+
+    Every given criterion must match (None means any):
+
+    * organisms: organism codes (like [ 'hsa', 'mmu' ]).
+    * identifications: protein identifications (like [ 'hsa:10458' ]).
+    * ec: True for entries with any EC number, False for entries without EC numbers, or EC numbers (a string or a
+      list, any of them matches). A '-' stands for any number from there on, like in PEPReader.entries_by_ec.
+      The EC numbers of a header are the ones of PEPReader.ec_numbers (only '[EC:' and '(EC:' annotations count).
+    * min_length, max_length: bounds of the sequence length, in residues (both inclusive).
+    * keywords: words of the header (any of them matches), case insensitive.
+
+    Example:
+
+        where = EntryFilter( organisms=[ 'hsa' ], ec='2.7.1.-', min_length=100 )
+
+        for entry in pepreader.iter_parsed_entries( where=where ):
+            print( entry['identification'] )
+
+    Attributes:
+        organisms(set): Organism codes (lowercase, utf-8 encoded), or None.
+        identifications(set): Protein identifications (lowercase, utf-8 encoded), or None.
+        ec(boolean|list): True, False, or [ ( EC number or prefix, exact ) ] (utf-8 encoded), or None.
+        min_length(int): Minimum sequence length, or None.
+        max_length(int): Maximum sequence length, or None.
+        keywords(list): Header words (lowercase, utf-8 encoded), or None.
+    """
+
+    def __init__( self, organisms=None, identifications=None, ec=None, min_length=None, max_length=None, keywords=None ):
+        self.organisms = None
+        self.identifications = None
+        self.ec = ec
+        self.min_length = min_length
+        self.max_length = max_length
+        self.keywords = None
+
+        if organisms is not None:
+            self.organisms = { self.raw( organism ) for organism in ( [ organisms ] if isinstance( organisms, str ) else organisms ) }
+
+        if identifications is not None:
+            self.identifications = { self.raw( identification ) for identification in ( [ identifications ] if isinstance( identifications, str ) else identifications ) }
+
+        if ec is not None and not isinstance( ec, bool ):
+            self.ec = [ self.ec_pattern( ec_number ) for ec_number in ( [ ec ] if isinstance( ec, str ) else ec ) ]
+
+        if keywords is not None:
+            self.keywords = [ self.raw( keyword ) for keyword in ( [ keywords ] if isinstance( keywords, str ) else keywords ) ]
+
+    @staticmethod
+    def raw( text=None ):
+        """
+        Returns a criterion in the form it's compared with the raw headers (stripped, lowercase, utf-8 encoded).
+
+        Args:
+            text(str): The criterion.
+
+        Returns:
+            (bytes):
+        """
+
+        return text.strip().lower().encode()
+
+    @staticmethod
+    def ec_pattern( ec_number=None ):
+        """
+        Returns the pattern an EC number is compared with.
+
+        Args:
+            ec_number(str): EC number (like '1.1.1.1' or '1.1.1.-').
+
+        Returns:
+            (tuple): ( EC number or prefix, exact ), like ( b'1.1.1.1', True ) or ( b'1.1.1.', False ).
+        """
+
+        numbers = ec_number.strip().split('.')
+
+        while numbers and numbers[-1] == '-':
+            numbers.pop()
+
+        if len( numbers ) == len( ec_number.strip().split('.') ):
+            return ( ec_number.strip().encode(), True )
+
+        return ( ( '.'.join( numbers ) + '.' if numbers else '' ).encode(), False )
+
+    def checks_length( self ):
+        """
+        Return True if there's a sequence length criterion.
+
+        Returns:
+            (boolean):
+        """
+
+        return self.min_length is not None or self.max_length is not None
+
+    def match_header( self, raw_header=None ):
+        """
+        Return True if a header matches every header criterion.
+
+        Args:
+            raw_header(bytes): The header line (starting with '>'), with or without the line break.
+
+        Returns:
+            (boolean):
+        """
+
+        if self.organisms is not None or self.identifications is not None:
+            space = raw_header.find( b' ' )
+
+            identification = raw_header[ 1:space if space != -1 else len( raw_header ) ].rstrip( b'\r\n' ).lower()
+
+            if self.identifications is not None and identification not in self.identifications:
+                return False
+
+            if self.organisms is not None and identification.partition( b':' )[0] not in self.organisms:
+                return False
+
+        if self.ec is not None:
+            if self.ec is True or self.ec is False:
+                if bool( self.ec_numbers( raw_header ) ) is not self.ec:
+                    return False
+
+            elif not self.match_ec( raw_header ):
+                return False
+
+        if self.keywords is not None:
+            lower_header = raw_header.lower()
+
+            if not any( keyword in lower_header for keyword in self.keywords ):
+                return False
+
+        return True
+
+    @staticmethod
+    def ec_numbers( raw_header=None ):
+        """
+        Returns the EC numbers of a raw header, extracted like PEPReader.parse_header does.
+
+        Args:
+            raw_header(bytes): The header line.
+
+        Returns:
+            (list): EC numbers (bytes), square brackets first, without duplicates.
+        """
+
+        ec_numbers = []
+
+        # Most headers have no EC number at all: they're skipped without running the regular expressions.
+        if b'EC:' not in raw_header:
+            return ec_numbers
+
+        header = raw_header.rstrip( b'\r\n' )
+
+        for marker, pattern in ( ( b'[EC:', RE_EC_SQUARE_BRACKETS ), ( b'(EC:', RE_EC_BRACKETS ) ):
+            if marker in header:
+                ec_number_result = pattern.search( header )
+
+                if ec_number_result:
+                    for ec_number in ec_number_result.group(1).split( b' ' ):
+                        if ec_number not in ec_numbers:
+                            ec_numbers.append( ec_number )
+
+        return ec_numbers
+
+    def match_ec( self, raw_header=None ):
+        """
+        Return True if any EC number of a header matches any of the EC numbers of the filter.
+
+        Args:
+            raw_header(bytes): The header line.
+
+        Returns:
+            (boolean):
+        """
+
+        for ec_number in self.ec_numbers( raw_header ):
+            for pattern, exact in self.ec:
+                if ( ec_number == pattern ) if exact else ec_number.startswith( pattern ):
+                    return True
+
+        return False
+
+    def match_span( self, header_length=None, span_length=None ):
+        """
+        Return False when an entry can't match the length criteria, from the size of its header and of its span alone.
+
+        The sequence of an entry has at most span_length - header_length - 1 residues (line breaks take the rest),
+        so with a persistent index (see PEPReader.load_index) short entries are left out before they're read.
+
+        Args:
+            header_length(int): Size of the header line, without the line break.
+            span_length(int): Size of the whole entry, in bytes.
+
+        Returns:
+            (boolean): False when the entry is surely too short, True when it may match.
+        """
+
+        if self.min_length is None:
+            return True
+
+        return span_length - header_length - 1 >= self.min_length
+
+    def match_sequence( self, raw_sequence=None ):
+        """
+        Return True if a raw sequence matches the length criteria.
+
+        Args:
+            raw_sequence(bytes): The sequence, still with its line breaks.
+
+        Returns:
+            (boolean):
+        """
+
+        if not self.checks_length():
+            return True
+
+        # The residues are counted without joining the lines.
+        length = len( raw_sequence ) - raw_sequence.count( b'\n' ) - raw_sequence.count( b'\r' )
+
+        if self.min_length is not None and length < self.min_length:
+            return False
+
+        if self.max_length is not None and length > self.max_length:
+            return False
+
+        return True
+
+    def match( self, raw_header=None, raw_sequence=None ):
+        """
+        Return True if an entry matches every criterion.
+
+        Args:
+            raw_header(bytes): The header line.
+            raw_sequence(bytes): The sequence, still with its line breaks.
+
+        Returns:
+            (boolean):
+        """
+
+        return self.match_header( raw_header ) and self.match_sequence( raw_sequence )
@@ -0,0 +1,342 @@
+import os
+import sys
+import mmap
+import struct
+from array import array
+
+
+def key_index_file( index_file=None, name=None ):
+    """
+    Returns the path of a key index that lives next to a position index (e.g. 'example.pep.ec.idx' next to 'example.pep.idx').
+
+    Args:
+        index_file(str): Path of the position index (see PEPIndex).
+        name(str): Name of the key index (like 'ec').
+
+    Returns:
+        (str): Path of the key index.
+    """
+
+    root, extension = os.path.splitext( index_file )
+
+    return root + '.' + name + extension
+
+
+class KeyIndex:
+    """
+    Persistent sidecar index from keys (like EC numbers) to lists of unsigned integers (like entry offsets) of a pep file.
+
+    Keys are stored sorted, so a key is found with a binary search and every key with a given prefix is a
+    contiguous run of keys. Like PEPIndex, the index is checked against the size and the modification time of
+    the pep file and it's memory-mapped when loaded.
+
+    Binary layout (native byte order, every section aligned to 8 bytes):
+
+    * header: magic, byte order, pep file size, pep file mtime (ns), number of keys, number of values, keys size.
+    * key offsets: number of keys + 1 unsigned 64 bits integers, boundaries inside the keys blob.
+    * value offsets: number of keys + 1 unsigned 64 bits integers, boundaries inside the values.
+    * values: the values of every key, one key after the other, in key order.
+    * keys: every key (utf-8), sorted and concatenated.
+
+    Attributes:
+        pep_file(str): Path of the pep file.
+        index_file(str): Path of the index file.
+        count(int): Number of keys in the index (after load).
+        source_size(int): Size of the pep file the index was built from (after load).
+        source_mtime(int): Modification time (ns) of the pep file the index was built from (after load).
+    """
+
+    MAGIC = b'PEPKEY01'
+
+    HEADER = struct.Struct( '=8s8sQqQQQ' )
+
+    def __init__( self, pep_file=None, index_file=None ):
+        self.pep_file = pep_file
+        self.index_file = index_file
+
+        self.count = 0
+        self.source_size = 0
+        self.source_mtime = None
+
+        self._mmap = None
+        self._view = None
+        self._key_offsets = None
+        self._value_offsets = None
+        self._values = None
+        self._keys_start = 0
+
+    def source_stamp( self ):
+        """
+        Returns the size and the modification time of the pep file.
+
+        Returns:
+            (tuple): ( size, mtime in nanoseconds )
+        """
+
+        stat = os.stat( self.pep_file )
+
+        return ( stat.st_size, stat.st_mtime_ns )
+
+    def byte_order( self ):
+        """
+        Returns the byte order mark stored in the index header.
+
+        Returns:
+            (bytes): 'little' or 'big' padded to 8 bytes.
+        """
+
+        return sys.byteorder.encode().ljust( 8, b'\0' )
+
+    def read_header( self ):
+        """
+        Returns the header of the index file.
+
+        Returns:
+            (tuple): ( pep file size, pep file mtime ) or None when the index file is missing or isn't a key index.
+        """
+
+        if not os.path.exists( self.index_file ):
+            return None
+
+        with open( self.index_file, 'rb' ) as index:
+            raw_header = index.read( self.HEADER.size )
+
+        if len( raw_header ) < self.HEADER.size:
+            return None
+
+        magic, byte_order, size, mtime, count, values_count, keys_size = self.HEADER.unpack( raw_header )
+
+        if magic != self.MAGIC or byte_order != self.byte_order():
+            return None
+
+        return ( size, mtime )
+
+    def is_stale( self ):
+        """
+        Return True if the index file is missing or doesn't match the current pep file.
+
+        Once the index is loaded, that's a single stat of the pep file compared with the stamp read at load time.
+
+        Returns:
+            (boolean):
+        """
+
+        if self._mmap is not None:
+            return ( self.source_size, self.source_mtime ) != self.source_stamp()
+
+        return self.read_header() != self.source_stamp()
+
+    def build( self, mapping=None ):
+        """
+        Write the index file.
+
+        The file is written to a temporary name and then renamed, so readers never see a partial index.
+
+        Args:
+            mapping(dict): Values (a list or an array of unsigned integers) of every key.
+
+        Returns:
+            (void): Writes the index file.
+        """
+
+        size, mtime = self.source_stamp()
+
+        keys = sorted( key.encode() for key in mapping )
+
+        key_offsets = array( 'Q', [ 0 ] )
+        value_offsets = array( 'Q', [ 0 ] )
+        values = array( 'Q' )
+
+        keys_size = 0
+
+        for key in keys:
+            values.extend( mapping[ key.decode() ] )
+            value_offsets.append( len( values ) )
+
+            keys_size = keys_size + len( key )
+            key_offsets.append( keys_size )
+
+        header = self.HEADER.pack( self.MAGIC, self.byte_order(), size, mtime, len( keys ), len( values ), keys_size )
+
+        temporary_file = self.index_file + '.tmp'
+
+        with open( temporary_file, 'wb' ) as index:
+            index.write( header )
+            key_offsets.tofile( index )
+            value_offsets.tofile( index )
+            values.tofile( index )
+            index.write( b''.join( keys ) )
+
+        os.replace( temporary_file, self.index_file )
+
+    def load( self ):
+        """
+        Memory-map the index file.
+
+        Returns:
+            (void): Set the class properties that give access to the index.
+        """
+
+        self.close()
+
+        with open( self.index_file, 'rb' ) as index:
+            self._mmap = mmap.mmap( index.fileno(), 0, access=mmap.ACCESS_READ )
+
+        magic, byte_order, size, mtime, count, values_count, keys_size = self.HEADER.unpack_from( self._mmap, 0 )
+
+        self.count = count
+        self.source_size = size
+        self.source_mtime = mtime
+
+        self._view = memoryview( self._mmap )
+        view = self._view
+
+        start = self.HEADER.size
+        self._key_offsets = view[ start:start + ( count + 1 ) * 8 ].cast( 'Q' )
+
+        start = start + ( count + 1 ) * 8
+        self._value_offsets = view[ start:start + ( count + 1 ) * 8 ].cast( 'Q' )
+
+        start = start + ( count + 1 ) * 8
+        self._values = view[ start:start + values_count * 8 ].cast( 'Q' )
+
+        self._keys_start = start + values_count * 8
+
+    def close( self ):
+        """
+        Release the memory-mapped index file.
+        """
+
+        if self._mmap is None:
+            return
+
+        for view in ( self._key_offsets, self._value_offsets, self._values, self._view ):
+            view.release()
+
+        self._mmap.close()
+
+        self._mmap = None
+        self._view = None
+        self._key_offsets = None
+        self._value_offsets = None
+        self._values = None
+        self.count = 0
+        self.source_size = 0
+        self.source_mtime = None
+
+    def raw_key( self, number=None ):
+        """
+        Returns a key, still utf-8 encoded.
+
+        Args:
+            number(int): Key number (its place in the sorted keys).
+
+        Returns:
+            (bytes): The key.
+        """
+
+        return self._mmap[ self._keys_start + self._key_offsets[ number ]:self._keys_start + self._key_offsets[ number + 1 ] ]
+
+    def key( self, number=None ):
+        """
+        Returns a key.
+
+        Args:
+            number(int): Key number (its place in the sorted keys).
+
+        Returns:
+            (str): The key.
+        """
+
+        return self.raw_key( number ).decode()
+
+    def values( self, number=None ):
+        """
+        Returns the values of a key.
+
+        Args:
+            number(int): Key number (its place in the sorted keys).
+
+        Returns:
+            (memoryview): Read-only view over the memory-mapped file, it behaves like a list of ints.
+        """
+
+        return self._values[ self._value_offsets[ number ]:self._value_offsets[ number + 1 ] ]
+
+    def lower_bound( self, key=None ):
+        """
+        Returns the number of the first key that isn't smaller than key (binary search).
+
+        Args:
+            key(bytes): The utf-8 encoded key.
+
+        Returns:
+            (int): Key number (count when every key is smaller).
+        """
+
+        low = 0
+        high = self.count
+
+        while low < high:
+            middle = ( low + high ) // 2
+
+            if self.raw_key( middle ) < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        return low
+
+    def get( self, key=None ):
+        """
+        Returns the values of a key.
+
+        Args:
+            key(str): The key.
+
+        Returns:
+            (memoryview): The values (empty when the key isn't in the index).
+        """
+
+        number = self.lower_bound( key.encode() )
+
+        if number < self.count and self.key( number ) == key:
+            return self.values( number )
+
+        return self._values[ 0:0 ]
+
+    def iter_prefix( self, prefix=None ):
+        """
+        Yield every key that starts with prefix and its values, in key order.
+
+        Args:
+            prefix(str): Beginning of the keys.
+
+        Returns:
+            (generator): ( key, values ) tuples.
+        """
+
+        raw_prefix = prefix.encode()
+
+        number = self.lower_bound( raw_prefix )
+
+        while number < self.count:
+            raw_key = self.raw_key( number )
+
+            if not raw_key.startswith( raw_prefix ):
+                break
+
+            yield ( raw_key.decode(), self.values( number ) )
+
+            number = number + 1
+
+    def items( self ):
+        """
+        Yield every key and its values, in key order.
+
+        Returns:
+            (generator): ( key, values ) tuples.
+        """
+
+        for number in range( self.count ):
+            yield ( self.key( number ), self.values( number ) )
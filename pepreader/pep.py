@@ -1,5 +1,16 @@
-import re
+import io
+import os
+import time
+import mmap
 import pprint
+import threading
+from itertools import chain
+from array import array
+from bisect import bisect_right
+from pepreader.records import PEPBatch
+from pepreader.compression import detect_compression, open_binary
+from pepreader.pepindex import entry_digest
+from pepreader.stats import CountedReader
 
 class PEP:
     """
@@ -9,13 +20,374 @@ class PEP:
 
     Attributes:
         file_to_parse(file): File handle that represents the 'pep' file to parse.
-        entries_position(list): List of positions (char position in the file) of every entry.
+        entries_position(array): Positions (byte position in the file, in the uncompressed data for compressed files) of every entry, an array of unsigned 64 bits integers.
+        encoding(str): Encoding of the headers and sequences (like 'utf-8' or 'latin-1').
+        handle(file): Binary file handle kept open for random access (see open_handle).
+        compression(str): Compression of the pep file ('bgzf', 'gzip', 'bzip2', 'xz' or None), known once the handle is open.
+        use_mmap(boolean): Read plain files through a memory map (see open_mmap).
+        mmap(mmap): Memory map of the pep file (when use_mmap is True and the file is plain and not empty).
+        instrumentation(Stats): Counters and timers of the reads, scans and sequence assembly (see stats), or None when instrumentation is disabled.
+        header_size(int): Size of the first read of an entry in read_entry_head (follows the longest header read).
     """
 
-    def __init__(self, pep_file=None):
+    def __init__(self, pep_file=None, encoding='utf-8', use_mmap=False, instrumentation=None):
     # This class is supposed to parse a single file per moment.
         self.file_to_parse = pep_file
-        self.entries_position = []
+        self.encoding = encoding
+        self.entries_position = array( 'Q' )
+
+        self.handle = None
+        self.compression = None
+        self.handle_size = None
+
+        self.use_mmap = use_mmap
+        self.mmap = None
+
+        self.instrumentation = instrumentation
+
+        self.header_size = 128
+
+        self.lock = threading.RLock()
+
+    def __enter__( self ):
+        return self
+
+    def __exit__( self, *exc_info ):
+        self.close()
+
+    def stats( self ):
+        """
+        Returns a snapshot of the instrumentation counters and timers (see pepreader.stats.Stats).
+
+        Returns:
+            (dict): { 'counters': { name: value }, 'timers': { name: seconds } } or None when instrumentation is disabled.
+        """
+
+        if self.instrumentation is None:
+            return None
+
+        return self.instrumentation.snapshot()
+
+    def open_handle( self ):
+        """
+        Returns the binary file handle used for random access, opening it at the first call.
+
+        The same handle is reused by every get_entry_record call until close is called.
+
+        Returns:
+            (file): Binary file handle of the pep file.
+        """
+
+        # The lock makes sure many threads open a single handle.
+        with self.lock:
+            if self.handle is None:
+                # Unbuffered: every read_span reads exactly what was asked (a header alone doesn't pull a whole buffer).
+                self.handle = open_binary(self.file_to_parse, buffering=0)
+                self.compression = detect_compression(self.file_to_parse)
+                self.handle_size = None
+
+                if self.use_mmap:
+                    self.open_mmap()
+
+        return self.handle
+
+    def open_mmap( self ):
+        """
+        Memory-map the pep file (read only).
+
+        With the memory map, reads are slices of the map and boundary scans are bytes searches over it, with no
+        file object and no line decoding in the way. Processes that map the same file share a single copy of it
+        in the page cache.
+
+        Compressed and empty files can't be mapped, they're read through the file handle.
+        """
+
+        if self.compression is not None or os.fstat( self.handle.fileno() ).st_size == 0:
+            return
+
+        self.mmap = mmap.mmap( self.handle.fileno(), 0, access=mmap.ACCESS_READ )
+
+    def mapped( self ):
+        """
+        Returns the memory map of the pep file, or None when it isn't memory-mapped.
+
+        Returns:
+            (mmap): Memory map of the pep file.
+        """
+
+        if not self.use_mmap:
+            return None
+
+        self.open_handle()
+
+        return self.mmap
+
+    def open_stream( self, block_size=65536 ):
+        """
+        Opens the pep file for a sequential read, like compression.open_binary.
+
+        With instrumentation the file is read through a CountedReader: reads, bytes_read and the read timer are
+        recorded once per block of block_size bytes, not once per line. Without it, that's the file object of open_binary.
+
+        Args:
+            block_size(int): Size of the blocks read when instrumentation is enabled, in bytes.
+
+        Returns:
+            (file): Binary file object, at the beginning of the file.
+        """
+
+        if self.instrumentation is None:
+            return open_binary( self.file_to_parse )
+
+        return io.BufferedReader( CountedReader( open_binary( self.file_to_parse ), self.instrumentation ), buffer_size=block_size )
+
+    def data_size( self ):
+        """
+        Returns the size of the (uncompressed) data of the pep file.
+
+        Returns:
+            (int): Size in bytes.
+        """
+
+        handle = self.open_handle()
+
+        if self.compression is None:
+            return os.fstat( handle.fileno() ).st_size
+
+        # Compressed files don't change while the handle is open, the size is found only once.
+        with self.lock:
+            if self.handle_size is None:
+                try:
+                    self.handle_size = handle.seek( 0, 2 )
+                except ( OSError, ValueError ):
+                    # gzip, bzip2 and xz can't seek from the end: the data has to be read up to the end.
+                    handle.seek( 0 )
+
+                    while handle.read( 1048576 ):
+                        pass
+
+                    self.handle_size = handle.tell()
+
+        return self.handle_size
+
+    def close( self ):
+        """
+        Close the random access file handle (if it's open).
+        """
+
+        with self.lock:
+            if self.mmap is not None:
+                try:
+                    self.mmap.close()
+                except BufferError:
+                    # Memoryviews of the map are still alive: the map is closed when they're gone.
+                    pass
+
+                self.mmap = None
+
+            if self.handle is not None:
+                self.handle.close()
+                self.handle = None
+
+    def entry_end( self, offset=None ):
+        """
+        Returns the position where the entry that starts at offset ends.
+
+        That's the position of the next entry or, for the last entry, the size of the file.
+
+        Args:
+            offset(int): The position of the entry.
+
+        Returns:
+            (int): Position right after the last byte of the entry.
+        """
+
+        if len( self.entries_position ) == 0:
+            self.generate_entries_position()
+
+        positions = self.entries_position
+
+        next_entry = bisect_right( positions, offset )
+
+        if next_entry < len( positions ):
+            return positions[ next_entry ]
+
+        return self.data_size()
+
+    def read_span( self, offset=None, length=None ):
+        """
+        Returns the raw bytes of the file, from offset up to length bytes.
+
+        It's safe to call it from many threads.
+
+        Args:
+            offset(int): Position of the first byte.
+            length(int): Number of bytes.
+
+        Returns:
+            (bytes): The bytes read.
+        """
+
+        if self.instrumentation is not None:
+            started = time.perf_counter()
+
+        handle = self.open_handle()
+
+        if self.mmap is not None:
+            data = self.mmap[ offset:offset + length ]
+
+        # Plain files are read with pread, that doesn't move a shared file position: many threads can read at the same time.
+        elif self.compression is None and hasattr( os, 'pread' ):
+            data = os.pread( handle.fileno(), length, offset )
+
+        else:
+            with self.lock:
+                handle.seek( offset )
+
+                data = handle.read( length )
+
+        if self.instrumentation is not None:
+            self.instrumentation.add_time( 'read', time.perf_counter() - started )
+            self.instrumentation.count( 'reads' )
+            self.instrumentation.count( 'bytes_read', len( data ) )
+
+        return data
+
+    def read_view( self, offset=None, length=None ):
+        """
+        Returns the raw bytes of the file, from offset up to length bytes, without copying them when it's possible.
+
+        With the memory map that's a memoryview over the map (zero copy), otherwise the same of read_span.
+
+        Args:
+            offset(int): Position of the first byte.
+            length(int): Number of bytes.
+
+        Returns:
+            (memoryview|bytes): The bytes.
+        """
+
+        mapped = self.mapped()
+
+        if mapped is not None:
+            return memoryview( mapped )[ offset:offset + length ]
+
+        return self.read_span( offset, length )
+
+    def read_header( self, offset=None, length=None ):
+        """
+        Returns the header line of the entry that starts at offset, reading only the header (not the sequence).
+
+        Args:
+            offset(int): The position of the entry.
+            length(int): The size of the entry, in bytes.
+
+        Returns:
+            (str): The header, without the line break.
+        """
+
+        return self.read_raw_header( offset, length ).decode( self.encoding )
+
+    def read_raw_header( self, offset=None, length=None ):
+        """
+        Returns the header line of the entry that starts at offset without decoding it (see read_header).
+
+        Args:
+            offset(int): The position of the entry.
+            length(int): The size of the entry, in bytes.
+
+        Returns:
+            (bytes): The header, without the line break.
+        """
+
+        return self.read_entry_head( offset, length )[0]
+
+    def read_entry_head( self, offset=None, length=None ):
+        """
+        Returns the header line of the entry that starts at offset and whether the entry has a sequence (anything
+        but line breaks after its header), reading only the first bytes of the entry.
+
+        The first read is the size of the longest header read so far plus a few bytes (see header_size): that's
+        the header, its line break and the first residues in a single small read for nearly every entry. It only
+        grows when the header, or the blank lines after it, go further.
+
+        Args:
+            offset(int): The position of the entry.
+            length(int): The size of the entry, in bytes.
+
+        Returns:
+            (tuple): ( header without the line break (bytes), has sequence (boolean) ).
+        """
+
+        size = min( length, self.header_size )
+
+        while True:
+            head = self.read_span( offset, size )
+
+            line_break = head.find( b'\n' )
+
+            if line_break != -1 and head[ line_break + 1: ].strip( b'\r\n' ):
+                has_sequence = True
+                break
+
+            # Nothing after the header but line breaks, up to the end of the entry.
+            if size >= length:
+                has_sequence = False
+                break
+
+            size = min( size * 4, length )
+
+        if line_break == -1:
+            line_break = len( head )
+
+        # The longest header so far (up to 1 KB, a single huge header doesn't make every read huge).
+        self.header_size = min( max( self.header_size, line_break + 16 ), 1024 )
+
+        return ( head[ :line_break ].rstrip( b'\r' ), has_sequence )
+
+    def iter_entry_heads( self, spans=None ):
+        """
+        Yield the header of every entry of a sequence of spans that has a sequence (see read_entry_head).
+
+        That's a tight loop over the spans: for a plain file, a single pread per entry, with the file handle
+        taken only once. Memory-mapped and compressed files, instrumentation and the entries that need more than
+        the first read go through read_entry_head.
+
+        Args:
+            spans(iterable): ( offset, length ) pairs, like the positions and the lengths of the index.
+
+        Returns:
+            (generator): ( offset, length, raw header ) tuples, the raw header is bytes, without the line break.
+        """
+
+        handle = self.open_handle()
+
+        if self.mmap is not None or self.compression is not None or self.instrumentation is not None or not hasattr( os, 'pread' ):
+            for offset, length in spans:
+                raw_header, has_sequence = self.read_entry_head( offset, length )
+
+                if has_sequence:
+                    yield ( offset, length, raw_header )
+
+            return
+
+        descriptor = handle.fileno()
+        pread = os.pread
+
+        for offset, length in spans:
+            head = pread( descriptor, min( length, self.header_size ), offset )
+
+            line_break = head.find( b'\n' )
+
+            # The header and the first residue in the first read: that's nearly every entry.
+            if line_break != -1 and head[ line_break + 1:line_break + 2 ] not in ( b'', b'\n', b'\r' ):
+                yield ( offset, length, head[ :line_break ].rstrip( b'\r' ) )
+                continue
+
+            raw_header, has_sequence = self.read_entry_head( offset, length )
+
+            if has_sequence:
+                yield ( offset, length, raw_header )
 
     def is_header( self, string=None ):
         """
@@ -25,13 +397,7 @@ class PEP:
             string(str): String to be tested.
         """
 
-        re_header = re.compile('^>')
-        re_header_result = re_header.search( string )
-
-        if re_header_result:
-            return True
-        else:
-            return False
+        return string.startswith( '>' )
 
 
     def is_sequence_empty( self, sequence=None ):
@@ -70,87 +436,245 @@ class PEP:
         return result 
 
 
-    def parse_file( self ):
+    def iter_entries( self, where=None ):
         """
-        Return a list of dictionaries.
+        Yield the entries of the PEP file one at a time, in file order.
 
-        Each dictionary is a entry from the PEP file.
+        Only the entry being read is kept in memory, so memory use depends on the longest entry
+        and not on the size of the file.
 
-        Each dictionary entry has a 'header' and a 'sequence' key.
+        Each entry is a dictionary with a 'header' and a 'sequence' key.
+
+        With a filter (see filters.EntryFilter) only the matching entries are yielded. The filter is checked on
+        the raw header and the raw sequence: the entries left out are never joined or decoded.
+
+        Args:
+            where(EntryFilter): Filter of the entries, or None for every entry.
 
         Returns:
-            (list): [ {'header': header, 'sequence': sequence } ]
+            (generator): { 'header': header, 'sequence': sequence }
         """
 
-        # Flags
-        found_header = False
-        read_content = True
+        instrumentation = self.instrumentation
 
-        # The sequence
-        sequence = None
+        if self.mapped() is not None:
+            for offset, raw_header, raw_sequence in self.iter_raw_entries():
+                if where is not None:
+                    # The length upper bound comes from the view alone, before the sequence is copied.
+                    if not where.match_span( len( raw_header ), len( raw_header ) + 1 + len( raw_sequence ) ) or not where.match_header( raw_header.tobytes() ):
+                        continue
 
-        # Our result
-        proteins= []
+                    raw_sequence = raw_sequence.tobytes()
+
+                    if not where.match_sequence( raw_sequence ):
+                        continue
+
+                if instrumentation is not None:
+                    started = time.perf_counter()
+
+                sequence = bytes( raw_sequence ).replace( b'\n', b'' ).replace( b'\r', b'' )
+
+                # Same as the line by line reading: entries without sequence are left out.
+                if sequence:
+                    entry = { 'header': raw_header.tobytes().decode( self.encoding ), 'sequence': sequence.decode( self.encoding ) }
+
+                    if instrumentation is not None:
+                        self.record_entry( started, entry['sequence'] )
 
-        with open(self.file_to_parse) as pep:
-            with pep as pep_file:
-                for line in pep_file:
-                    # The line is a header (starts with '>')
-                    # This conditional has a important role: indicate when to insert the entry in the 'proteins' list.
-                    if self.is_header( line ):
+                    yield entry
 
-                        # If we're in a header line and also if there's sequences already read, it means there's a entire 
-                        # entry already read that has to be put in the 'proteins' list.
-                        if not self.is_sequence_empty( sequence ):
-                            proteins.append( { 'header': header, 'sequence': sequence } )
+            return
 
-                            # Reset sequence
-                            sequence = None
+        if where is not None:
+            for entry in self.iter_filtered_entries( where ):
+                yield entry
+
+            return
+
+        # The sequence lines of the entry being read, joined only once when the entry is complete.
+        # An empty list means no sequence was read yet.
+        sequence_lines = []
+
+        with io.TextIOWrapper( self.open_stream(), encoding=self.encoding ) as pep_file:
+            for line in pep_file:
+                # The line is a header (starts with '>')
+                # This conditional has a important role: indicate when to yield the entry.
+                if line.startswith( '>' ):
+
+                    # If we're in a header line and also if there's sequences already read, it means there's a entire 
+                    # entry already read that has to be yielded (blank lines alone aren't a sequence).
+                    if any( sequence_lines ):
+                        if instrumentation is not None:
+                            started = time.perf_counter()
 
-                        # We have to keep the header line for later insertion.
-                        header = line.rstrip('\r\n')
+                        entry = { 'header': header, 'sequence': ''.join( sequence_lines ) }
 
-                    # So, the line is not a header, in other words, that's a ordinary sequence line.
-                    else:
-                        sequence = self.append_sequence( sequence, line.rstrip('\r\n') )
-                        
+                        if instrumentation is not None:
+                            self.record_entry( started, entry['sequence'] )
+
+                        yield entry
+
+                        # Reset sequence
+                        sequence_lines = []
+
+                    # We have to keep the header line for later.
+                    header = line.rstrip('\r\n')
+
+                # So, the line is not a header, in other words, that's a ordinary sequence line.
+                else:
+                    sequence_lines.append( line.rstrip('\r\n') )
 
         # This part of the code deals exclusively with the last entry from the pep file.
-        # It means, when we finished the loop above, still there's the read entry that wasn't mark
-        # to be inserted because there's not a header line (after the end of the file, of course) to indicate the entry has to be inserted.
-        if not self.is_sequence_empty( sequence ):
-            proteins.append( {'header': header, 'sequence': sequence } )
+        # It means, when we finished the loop above, still there's the read entry that wasn't yielded
+        # because there's not a header line (after the end of the file, of course) to indicate the entry is complete.
+        if any( sequence_lines ):
+            if instrumentation is not None:
+                started = time.perf_counter()
+
+            entry = { 'header': header, 'sequence': ''.join( sequence_lines ) }
+
+            if instrumentation is not None:
+                self.record_entry( started, entry['sequence'] )
+
+            yield entry
+
+    def iter_filtered_entries( self, where=None ):
+        """
+        Yield the entries of the PEP file that match a filter, in file order (see iter_entries).
+
+        The file is read in binary mode: the header lines are checked as they're read (see filters.EntryFilter.match_header)
+        and the sequence lines of an entry that doesn't match are skipped without being kept. The sequence length
+        is checked on the joined bytes, before the entry is decoded.
+
+        Args:
+            where(EntryFilter): Filter of the entries.
+
+        Returns:
+            (generator): { 'header': header, 'sequence': sequence }
+        """
+
+        instrumentation = self.instrumentation
+
+        # Header of the entry being read, None when it doesn't match the filter (its lines are skipped).
+        raw_header = None
+        sequence_lines = []
+
+        with self.open_stream() as pep_file:
+            # A last empty header closes the last entry.
+            for line in chain( pep_file, [ b'>' ] ):
+                if line.startswith( b'>' ):
+                    if raw_header is not None and any( sequence_lines ):
+                        sequence = b''.join( sequence_lines )
+
+                        if where.match_sequence( sequence ):
+                            if instrumentation is not None:
+                                started = time.perf_counter()
+
+                            entry = { 'header': raw_header.rstrip( b'\r\n' ).decode( self.encoding ), 'sequence': sequence.decode( self.encoding ) }
+
+                            if instrumentation is not None:
+                                self.record_entry( started, entry['sequence'] )
 
-        if not pep_file.closed:
-            pep_file.close()
+                            yield entry
 
-        return proteins
+                    raw_header = line if where.match_header( line ) else None
+                    sequence_lines = []
+
+                elif raw_header is not None:
+                    sequence_lines.append( line.rstrip( b'\r\n' ) )
+
+    def record_entry( self, started=None, sequence=None ):
+        """
+        Record an assembled entry in the instrumentation (only called when instrumentation is enabled).
+
+        Args:
+            started(float): time.perf_counter() when the assembly started.
+            sequence(str): The assembled sequence (None for entries without sequence).
+        """
+
+        self.instrumentation.add_time( 'sequence_assembly', time.perf_counter() - started )
+        self.instrumentation.count( 'entries_parsed' )
+
+        if sequence:
+            self.instrumentation.count( 'sequence_bytes', len( sequence ) )
+
+
+    def iter_batches( self, size=65536 ):
+        """
+        Yield the entries of the PEP file in columnar batches (see PEPBatch), in file order.
+
+        That's the bulk mode: entries aren't decoded and there's no dictionary per entry, each batch keeps
+        its headers and sequences in two contiguous buffers.
+
+        Args:
+            size(int): Number of entries of each batch (the last one may be smaller).
+
+        Returns:
+            (generator): PEPBatch objects, with the same entries of iter_entries.
+        """
+
+        batch = PEPBatch( self.encoding )
+
+        header = None
+        sequence_lines = []
+
+        with self.open_stream() as pep_file:
+            for line in pep_file:
+
+                if line.startswith( b'>' ):
+                    if any( sequence_lines ):
+                        batch.append( header, b''.join( sequence_lines ) )
+
+                        sequence_lines = []
+
+                        if len( batch ) >= size:
+                            yield batch
+
+                            batch = PEPBatch( self.encoding )
+
+                    header = line.rstrip( b'\r\n' )
+
+                else:
+                    sequence_lines.append( line.rstrip( b'\r\n' ) )
+
+        if any( sequence_lines ):
+            batch.append( header, b''.join( sequence_lines ) )
+
+        if len( batch ) > 0:
+            yield batch
+
+    def parse_file( self ):
+        """
+        Return a list of dictionaries.
+
+        Each dictionary is a entry from the PEP file.
+
+        Each dictionary entry has a 'header' and a 'sequence' key.
+
+        For large files prefer iter_entries, that doesn't keep the whole file in memory.
+
+        Returns:
+            (list): [ {'header': header, 'sequence': sequence } ]
+        """
+
+        return list( self.iter_entries() )
 
     def get_entry_record( self, offset=None ):
         """
         Return entries in a dictionary format.
 
-        This method is supposed to be executed in a assisted way, in other words, immediately returns an Fasta entry as soon as it finished an entry reading.
-
-        This method is supposed to be called after a setup that includes:
-        
-        * open a file handle
-        * set it to the class (self.set_file)
-        * generate all the entries position of the file (self.generate_entries_position)
-        * get the entries position (self.get_entries_position)
-        * and be called inside a loop through those entry positions (which are the 'offset' parameter').
+        The entry is read with a single seek and read through a file handle that stays open (see open_handle),
+        since the entries position tells where every entry ends. The positions are generated at the first call
+        if they weren't generated yet.
 
         Example:
 
-            pep = PEP()
-            f = open( '../tests/fixtures/example.pep' )
+            with PEP( '../tests/fixtures/example.pep' ) as pep:
+                pep.generate_entries_position()
+                positions = pep.get_entries_position()
 
-            pep.set_file( f ) 
-            pep.generate_entries_position()
-            positions = pep.get_entries_position()
-
-            for position in positions:
-                result = pep.get_entry_record( position )
+                for position in positions:
+                    result = pep.get_entry_record( position )
 
 
         Args:
@@ -159,103 +683,353 @@ class PEP:
         Returns:
             (dict): a dictionary with the header and sequence with the entry. 
         """
-        # Flags
-        found_header = False
-        read_content = True
+        # A single seek and read: the entry goes from its position to the position of the next entry.
+        raw_entry = self.read_span( offset, self.entry_end( offset ) - offset )
+
+        return self.entry_record( raw_entry )
+
+    def entry_record( self, raw_entry=None ):
+        """
+        Return a raw entry (the bytes from its header up to the next header) in a dictionary format.
+
+        Args:
+            raw_entry(bytes): The raw entry.
+
+        Returns:
+            (dict): a dictionary with the header and sequence with the entry. 
+        """
 
-        # The sequence
-        sequence = None
+        if self.instrumentation is not None:
+            started = time.perf_counter()
 
         # Our result
         protein = {} 
 
-        with open(self.file_to_parse) as pep:
-            pep.seek( offset )
+        header, line_break, sequence = raw_entry.partition( b'\n' )
 
-            for line in pep:
-                # The line is a header (starts with '>')
-                # This conditional has a important role: indicate when to fill 'protein' dictionary.
-                if self.is_header( line ):
+        # The whole sequence in one operation: every line break removed at once, no line by line concatenation.
+        sequence = sequence.replace( b'\n', b'' ).replace( b'\r', b'' )
 
-                    header_size = len( line )
+        protein['header']   = header.rstrip( b'\r\n' ).decode( self.encoding )
+        protein['sequence'] = sequence.decode( self.encoding ) if sequence else None
 
-                    # If we're in a header line and also if there's sequences already read, it means there's a entire 
-                    # entry already read that has to be put in the 'protein' dictionary.
-                    if not self.is_sequence_empty( sequence ):
-                        protein['header']   = header
-                        protein['sequence'] = sequence
+        if self.instrumentation is not None:
+            self.record_entry( started, protein['sequence'] )
 
-                        # Reset sequence
-                        sequence = None
+        return protein 
 
-                        return protein 
+    def entry_boundary( self, position=None ):
+        """
+        Returns the position of the first entry that starts at or after position.
 
-                    # We have to keep the header line for later insertion.
-                    header = line.rstrip('\r\n')
+        That's a fast boundary scan: it reads forward from position only until it finds a header.
 
-                # So, the line is not a header, in other words, that's a ordinary sequence line.
-                else:
-                    sequence = self.append_sequence( sequence, line.rstrip('\r\n') )
+        Args:
+            position(int): Any position inside the file.
 
-            # Weird, but the line below means the entry that remains at the end of the file.
-            # That happens because the code above consider a header line as a trigger to store the previous entry.
-            # Since the code reach the end of the file, there's no next header to trigger the entry that was right read.
-            # So the line below stores what was read but not triggeded to be stored.
-            protein['header']   = header
-            protein['sequence'] = sequence
+        Returns:
+            (int): Position of the next entry or the size of the file when there's no entry after position.
+        """
 
-        return protein 
+        if position == 0:
+            if self.read_span( 0, 1 ) == b'>':
+                return 0
+
+            position = 1
+
+        # Looking for '\n>' from the previous byte, so a header right at position is found too.
+        start = position - 1
+
+        while True:
+            block = self.read_span( start, 65536 )
+
+            found = block.find( b'\n>' )
+
+            if found != -1:
+                return start + found + 1
+
+            # End of the file.
+            if len( block ) < 65536:
+                return start + len( block )
+
+            # The last byte is read again, a '\n>' may straddle two blocks.
+            start = start + len( block ) - 1
+
+    def entries_ranges( self, chunk_size=None ):
+        """
+        Split the file in byte ranges of about chunk_size bytes, aligned to the entries.
+
+        Args:
+            chunk_size(int): Approximate size of the ranges, in bytes.
+
+        Returns:
+            (list): [ ( start, end ) ], every range starts at a header and ends where the next range starts.
+        """
+
+        size = self.data_size()
+
+        ranges = []
+
+        start = self.entry_boundary( 0 )
+
+        while start < size:
+            end = min( self.entry_boundary( start + max( 1, chunk_size ) ), size )
+
+            ranges.append( ( start, end ) )
+
+            start = end
+
+        return ranges
+
+    def iter_range_entries( self, start=None, end=None, block_size=4194304 ):
+        """
+        Yield the entries in a byte range of the file, in a dictionary format.
+
+        The range is read in blocks, so memory use depends on the block size and on the longest entry, not on the
+        size of the range, and the first entries are yielded before the rest of the range is read.
+
+        Args:
+            start(int): Position of the first entry of the range.
+            end(int): Position right after the last byte of the range (the next entry or the end of the file).
+            block_size(int): Size of each read, in bytes.
+
+        Returns:
+            (generator): { 'header': header, 'sequence': sequence }
+        """
+
+        # Beginning of the entry that's still incomplete at the end of the last block.
+        pending = b''
+
+        position = start
+
+        while position < end:
+            block = self.read_span( position, min( block_size, end - position ) )
+
+            if not block:
+                break
+
+            position = position + len( block )
+
+            data = pending + block
 
+            begin = 0
 
-    def generate_entries_position( self ):
+            # The last byte of the previous block is searched again, a '\n>' may straddle two blocks.
+            found = data.find( b'\n>', max( 0, len( pending ) - 1 ) )
+
+            while found != -1:
+                pep_entry = self.entry_record( data[ begin:found + 1 ] )
+
+                # Same as iter_entries: entries without sequence are left out.
+                if pep_entry['sequence'] is not None:
+                    yield pep_entry
+
+                begin = found + 1
+
+                found = data.find( b'\n>', begin )
+
+            pending = data[ begin: ]
+
+        if pending:
+            pep_entry = self.entry_record( pending )
+
+            if pep_entry['sequence'] is not None:
+                yield pep_entry
+
+
+    def generate_entries_position( self, validate=False ):
         """
-        Generates a list with the start position of every entry of the Fasta pep file.
+        Generates the start position of every entry of the Fasta pep file.
+
+        Positions are byte offsets of the '>' of every header, found with a bytes search for '\\n>' over large
+        blocks of the file (or over the memory map, see use_mmap): sequence lines are never looked at one by one.
+        They're correct for LF and CRLF files and for any encoding of the headers.
+
+        Args:
+            validate(boolean): Check that every position lands on a header (see validate_entries_position).
 
         Returns:
-            (void): Fill the class property entries_position. 
+            (void): Fill the class property entries_position.
+
+        Raises:
+            ValueError: When validate is True and a position doesn't land on a header.
         """
 
-        # Reset any previous value.
-        self.entries_position = []
+        if self.instrumentation is not None:
+            started = time.perf_counter()
 
-        # First header have to be ignored since that's where we start reading an entry.
-        first_header = True
+        mapped = self.mapped()
 
-        # First position, of course, is zero.
+        # Built apart and set at the end, so other threads never see a partial array.
+        if mapped is not None:
+            entries_position = self.mapped_boundaries( mapped )
+            scanned = len( mapped )
+        else:
+            with open_binary(self.file_to_parse) as opened_pep_file:
+                entries_position = self.block_boundaries( opened_pep_file )
+                scanned = opened_pep_file.tell()
+
+        self.entries_position = entries_position
+
+        if self.instrumentation is not None:
+            self.instrumentation.add_time( 'scan', time.perf_counter() - started )
+            self.instrumentation.count( 'scans' )
+            self.instrumentation.count( 'bytes_scanned', scanned )
+            self.instrumentation.count( 'entries_scanned', len( entries_position ) )
+
+        if validate:
+            wrong_positions = self.validate_entries_position()
+
+            if wrong_positions:
+                raise ValueError( 'Entries position not at a header: ' + str( wrong_positions[:10] ) )
+
+    def block_boundaries( self, pep_file=None, block_size=4194304 ):
+        """
+        Returns the position of every header of a pep file, reading it in blocks of block_size bytes.
+
+        Every block is searched for '\\n>'. A line break at the end of a block followed by a '>' at the beginning
+        of the next one is found too.
+
+        Args:
+            pep_file(file): Binary file object, at the beginning of the file.
+            block_size(int): Size of the blocks, in bytes.
+
+        Returns:
+            (array): Entries position (unsigned 64 bits integers).
+        """
+
+        entries_position = array( 'Q' )
+        append = entries_position.append
+
+        # The file starts as if a line break was right before it: a header at position 0 is found too.
+        last_byte = b'\n'
         position = 0
 
-        # We add zero as our first position.
-        self.entries_position.append( 0 )
+        while True:
+            block = pep_file.read( block_size )
+
+            if not block:
+                break
+
+            if last_byte == b'\n' and block[:1] == b'>':
+                append( position )
+
+            find = block.find
+
+            found = find( b'\n>' )
+
+            while found != -1:
+                append( position + found + 1 )
+
+                found = find( b'\n>', found + 2 )
+
+            last_byte = block[ -1: ]
+            position = position + len( block )
+
+        return entries_position
+
+    def mapped_boundaries( self, mapped=None ):
+        """
+        Returns the position of every header of a memory-mapped pep file.
+
+        That's a bytes search for '\\n>' over the whole map: no lines, no decoding.
+
+        Args:
+            mapped(mmap): Memory map of the pep file.
+
+        Returns:
+            (array): Entries position (unsigned 64 bits integers).
+        """
+
+        entries_position = array( 'Q' )
+        append = entries_position.append
+
+        if mapped[:1] == b'>':
+            append( 0 )
+
+        find = mapped.find
+
+        found = find( b'\n>' )
+
+        while found != -1:
+            append( found + 1 )
+
+            found = find( b'\n>', found + 2 )
+
+        return entries_position
 
-        # Walk through the file.
-        with open(self.file_to_parse) as opened_pep_file:
-            for line in opened_pep_file:
+    def iter_raw_entries( self ):
+        """
+        Yield the raw header and the raw sequence of every entry, in file order, without decoding them.
+
+        With the memory map (see use_mmap) headers and sequences are memoryviews over the map: nothing is copied until
+        the caller asks for it (bytes( view ) or view.tobytes().decode(...)). Without the memory map they're bytes.
+
+        The raw sequence still has its line breaks.
+
+        Returns:
+            (generator): ( offset, header, sequence ) tuples, the header is the header line without the line break.
+        """
+
+        mapped = self.mapped()
+
+        if mapped is None:
+            for offset, length, header in self.iter_entries_span():
+                raw_entry = self.read_span( offset, length )
+
+                raw_header, line_break, sequence = raw_entry.partition( b'\n' )
+
+                yield ( offset, raw_header.rstrip( b'\r' ), sequence )
+
+            return
+
+        view = memoryview( mapped )
+
+        try:
+            positions = self.mapped_boundaries( mapped )
+            positions.append( len( mapped ) )
 
-                # New position is the previous position plus the line size, plus 1 (that '1' means the beginning of the next entry).
-                position = position + len(line.rstrip('\r\n')) + 1
+            for entry in range( len( positions ) - 1 ):
+                start = positions[ entry ]
+                end = positions[ entry + 1 ]
 
-                # If the line is a header and it's not the first header.
-                if self.is_header( line ) and first_header == False:
-                    # Get the size of the header.
-                    header_size = len( line )
+                header_end = mapped.find( b'\n', start, end )
 
-                    # New position entry is the current position minus the size of the current header (means back to the beginning of the line).
-                    position = position - header_size 
+                if header_end == -1:
+                    header_end = end
 
-                    # We have to keep the header position. That's for the last entry of the whole file. That's becaus Fasta files doesn't have any END entry mark,
-                    # so, our last entry is marked by the end of the file itself, which means we already finished this loop when we should read the entry position, what
-                    # makes impossible to execute the loop 'append'.
-                    header_position = position
+                sequence_start = min( header_end + 1, end )
 
-                    # Add the new position.
-                    self.entries_position.append( position )
+                if header_end > start and mapped[ header_end - 1 ] == 13:
+                    header_end = header_end - 1
 
-                    # Put back the whole line size (since we have to keep reading the next entries from the last entire line).
-                    position = position + header_size
+                yield ( start, view[ start:header_end ], view[ sequence_start:end ] )
+        finally:
+            view.release()
 
-                # Tell we're not at the first header anymore.
-                if first_header == True:
-                    first_header = False
+    def validate_entries_position( self ):
+        """
+        Returns the entries position that don't land on a header.
+
+        A valid position points to a '>' at the beginning of a line.
+
+        Returns:
+            (list): Wrong positions (empty list when every position is valid).
+        """
+
+        wrong_positions = []
+
+        for position in self.entries_position:
+
+            if position == 0:
+                valid = self.read_span( 0, 1 ) == b'>'
+            else:
+                valid = self.read_span( position - 1, 2 ) == b'\n>'
+
+            if not valid:
+                wrong_positions.append( position )
+
+        return wrong_positions
 
         
     def get_entries_position( self ):
@@ -263,12 +1037,87 @@ class PEP:
         Returns the entry position of all the entries in the Fasta pep file.
 
         Returns:
-            (list): All the entry positions from the Fasta pep file.
+            (array): All the entry positions from the Fasta pep file.
         """
 
         return self.entries_position
 
 
+    def iter_entries_span( self, skip_empty=False ):
+        """
+        Yield the byte span of every entry of the Fasta pep file, in file order.
+
+        The span of an entry goes from the first byte of its header to the first byte of the next header
+        (or the end of the file). The file is read in binary mode, so offsets are real byte offsets.
 
+        Args:
+            skip_empty(boolean): Leave out the entries without sequence (nothing but line breaks after the header), like iter_entries.
+
+        Returns:
+            (generator): ( offset, length, header ) tuples, where header is the header line without the line break.
+        """
+
+        offset = None
+        header = None
+        empty = True
+        position = 0
+
+        with self.open_stream() as pep_file:
+            for line in pep_file:
+
+                if line.startswith( b'>' ):
+                    # A new header closes the entry that was being read.
+                    if offset is not None and not ( skip_empty and empty ):
+                        yield ( offset, position - offset, header )
+
+                    offset = position
+                    header = line.rstrip( b'\r\n' ).decode( self.encoding )
+                    empty = True
+
+                elif empty and line.strip( b'\r\n' ):
+                    empty = False
+
+                position = position + len( line )
+
+        # The last entry ends with the file itself.
+        if offset is not None and not ( skip_empty and empty ):
+            yield ( offset, position - offset, header )
+
+    def iter_entries_digest( self, start=0 ):
+        """
+        Yield the byte span, the header and the content hash of every entry of the Fasta pep file, in file order.
+
+        Args:
+            start(int): Position where reading starts (must be the position of an entry, or zero).
+
+        Returns:
+            (generator): ( offset, length, header, digest ) tuples, the digest is the 64 bits content hash of the entry (see pepindex.entry_digest).
+        """
+
+        offset = None
+        raw_header = None
+        sequence_lines = []
+        position = start
+
+        with self.open_stream() as pep_file:
+            pep_file.seek( start )
+
+            for line in pep_file:
+
+                if line.startswith( b'>' ):
+                    # A new header closes the entry that was being read.
+                    if offset is not None:
+                        yield ( offset, position - offset, raw_header.decode( self.encoding ), entry_digest( raw_header, b''.join( sequence_lines ) ) )
+
+                    offset = position
+                    raw_header = line.rstrip( b'\r\n' )
+                    sequence_lines = []
+
+                else:
+                    sequence_lines.append( line.rstrip( b'\r\n' ) )
 
+                position = position + len( line )
 
+        # The last entry ends with the file itself.
+        if offset is not None:
+            yield ( offset, position - offset, raw_header.decode( self.encoding ), entry_digest( raw_header, b''.join( sequence_lines ) ) )
@@ -0,0 +1,547 @@
+import os
+import sys
+import mmap
+import heapq
+import marshal
+import shutil
+import struct
+import hashlib
+import tempfile
+from array import array
+from pepreader.compression import open_binary
+
+
+def entry_digest( header=None, sequence=None ):
+    """
+    Returns the content hash of an entry.
+
+    Line breaks aren't part of the content: the same entry wrapped in a different line width has the same hash.
+
+    Args:
+        header(bytes): The raw header, without the line break.
+        sequence(bytes): The raw sequence, without line breaks.
+
+    Returns:
+        (int): 64 bits hash.
+    """
+
+    return int.from_bytes( hashlib.blake2b( header + b'\n' + sequence, digest_size=8 ).digest(), 'little' )
+
+
+def raw_entry_digest( raw_entry=None ):
+    """
+    Returns the content hash of a raw entry (the bytes from its header up to the next header), see entry_digest.
+
+    Args:
+        raw_entry(bytes): The raw entry.
+
+    Returns:
+        (int): 64 bits hash.
+    """
+
+    header, line_break, sequence = raw_entry.partition( b'\n' )
+
+    return entry_digest( header.rstrip( b'\r\n' ), sequence.replace( b'\n', b'' ).replace( b'\r', b'' ) )
+
+
+class PEPIndex:
+    """
+    Persistent sidecar index with the byte offset, length and content hash of every entry of a pep file, keyed by identification.
+
+    The index lives next to the pep file (e.g. 'example.pep.idx') and is checked against the size and the
+    modification time of the pep file, so it's only rebuilt when the pep file changes.
+
+    Once built, the index is loaded by memory-mapping it: nothing is parsed at load time, so loading
+    takes the same time for a tiny file and for a full KEGG release.
+
+    Binary layout (native byte order, every section aligned to 8 bytes):
+
+    * header: magic, byte order, pep file size, pep file mtime (ns), number of entries, identifications size.
+    * offsets: one unsigned 64 bits integer per entry, in file order.
+    * lengths: one unsigned 64 bits integer per entry, in file order.
+    * digests: content hash of every entry (see entry_digest), in file order.
+    * identification offsets: number of entries + 1 unsigned 64 bits integers, boundaries inside the identifications blob.
+    * order: one unsigned 64 bits integer per entry, entry numbers sorted by identification.
+    * identifications: every identification (utf-8), concatenated.
+
+    Attributes:
+        pep_file(str): Path of the pep file.
+        index_file(str): Path of the index file.
+        count(int): Number of entries in the index (after load).
+        source_size(int): Size of the pep file the index was built from (after load).
+        source_mtime(int): Modification time (ns) of the pep file the index was built from (after load).
+    """
+
+    MAGIC = b'PEPIDX02'
+
+    HEADER = struct.Struct( '=8s8sQqQQ' )
+
+    # Identifications sorted at once while building, the rest is merged from disk.
+    RUN_SIZE = 1048576
+
+    # ( identification, entry number ) tuples written to a sorted run at once.
+    RUN_BLOCK_SIZE = 16384
+
+    def __init__( self, pep_file=None, index_file=None ):
+        self.pep_file = pep_file
+
+        # An index file alone (with no pep file) can be loaded, but not checked or built.
+        if index_file is None:
+            index_file = pep_file + '.idx'
+
+        self.index_file = index_file
+
+        self.count = 0
+        self.source_size = 0
+        self.source_mtime = None
+
+        self._mmap = None
+        self._view = None
+        self._offsets = None
+        self._lengths = None
+        self._digests = None
+        self._id_offsets = None
+        self._order = None
+        self._ids_start = 0
+
+    def source_stamp( self ):
+        """
+        Returns the size and the modification time of the pep file.
+
+        Returns:
+            (tuple): ( size, mtime in nanoseconds )
+        """
+
+        stat = os.stat( self.pep_file )
+
+        return ( stat.st_size, stat.st_mtime_ns )
+
+    def byte_order( self ):
+        """
+        Returns the byte order mark stored in the index header.
+
+        Returns:
+            (bytes): 'little' or 'big' padded to 8 bytes.
+        """
+
+        return sys.byteorder.encode().ljust( 8, b'\0' )
+
+    def is_stale( self ):
+        """
+        Return True if the index file is missing or doesn't match the current pep file.
+
+        Once the index is loaded, that's a single stat of the pep file compared with the stamp read at load time,
+        so it's cheap enough to run before every lookup.
+
+        Returns:
+            (boolean):
+        """
+
+        if self._mmap is not None:
+            return ( self.source_size, self.source_mtime ) != self.source_stamp()
+
+        if not os.path.exists( self.index_file ):
+            return True
+
+        with open( self.index_file, 'rb' ) as index:
+            raw_header = index.read( self.HEADER.size )
+
+        if len( raw_header ) < self.HEADER.size:
+            return True
+
+        magic, byte_order, size, mtime, count, ids_size = self.HEADER.unpack( raw_header )
+
+        if magic != self.MAGIC or byte_order != self.byte_order():
+            return True
+
+        if ( size, mtime ) != self.source_stamp():
+            return True
+
+        return False
+
+    def build( self, entries=None ):
+        """
+        Write the index file.
+
+        Only fixed-width arrays grow with the number of entries: the identifications go to a temporary file as
+        they come, and they're sorted in runs of RUN_SIZE entries that are merged from disk (see write_run).
+
+        The file is written to a temporary name and then renamed, so readers never see a partial index.
+
+        Args:
+            entries(iterable): ( identification, offset, length, digest ) tuples, in file order.
+
+        Returns:
+            (void): Writes the index file.
+        """
+
+        # Stamp taken before reading, so a pep file changed while building makes the index stale.
+        size, mtime = self.source_stamp()
+
+        offsets = array( 'Q' )
+        lengths = array( 'Q' )
+        digests = array( 'Q' )
+        id_offsets = array( 'Q', [ 0 ] )
+
+        ids_size = 0
+
+        directory = os.path.dirname( os.path.abspath( self.index_file ) )
+
+        run = []
+        run_files = []
+
+        try:
+            with tempfile.TemporaryFile( dir=directory ) as ids_file:
+                for identification, offset, length, digest in entries:
+                    identification = identification.encode()
+
+                    offsets.append( offset )
+                    lengths.append( length )
+                    digests.append( digest )
+
+                    ids_size = ids_size + len( identification )
+                    id_offsets.append( ids_size )
+
+                    run.append( identification )
+
+                    if len( run ) == self.RUN_SIZE:
+                        ids_file.write( b''.join( run ) )
+                        run_files.append( self.write_run( run, len( offsets ) - len( run ), directory ) )
+                        run = []
+
+                ids_file.write( b''.join( run ) )
+
+                count = len( offsets )
+
+                if run_files:
+                    # The last run doesn't go to disk, it's merged from memory.
+                    runs = [ self.iter_run( run_file ) for run_file in run_files ]
+                    runs.append( self.sorted_run( run, count - len( run ) ) )
+
+                    order = array( 'Q', ( entry for identification, entry in heapq.merge( *runs ) ) )
+                else:
+                    # A pep file of a single run is sorted in memory only.
+                    order = array( 'Q', sorted( range( count ), key=run.__getitem__ ) )
+
+                header = self.HEADER.pack( self.MAGIC, self.byte_order(), size, mtime, count, ids_size )
+
+                temporary_file = self.index_file + '.tmp'
+
+                with open( temporary_file, 'wb' ) as index:
+                    index.write( header )
+                    offsets.tofile( index )
+                    lengths.tofile( index )
+                    digests.tofile( index )
+                    id_offsets.tofile( index )
+                    order.tofile( index )
+
+                    ids_file.seek( 0 )
+                    shutil.copyfileobj( ids_file, index )
+        finally:
+            for run_file in run_files:
+                run_file.close()
+
+        os.replace( temporary_file, self.index_file )
+
+    @staticmethod
+    def sorted_run( run=None, first=0 ):
+        """
+        Returns a run of identifications sorted, with their entry numbers.
+
+        Args:
+            run(list): Identifications (bytes), in file order.
+            first(int): Entry number of the first identification of the run.
+
+        Returns:
+            (list): ( identification, entry number ) tuples, sorted (entries with the same identification in file order).
+        """
+
+        # A stable sort: entries with the same identification keep their order.
+        return [ ( run[ entry ], first + entry ) for entry in sorted( range( len( run ) ), key=run.__getitem__ ) ]
+
+    def write_run( self, run=None, first=0, directory=None ):
+        """
+        Sort a run of identifications and write it to a temporary file.
+
+        Args:
+            run(list): Identifications (bytes), in file order.
+            first(int): Entry number of the first identification of the run.
+            directory(str): Directory of the temporary file.
+
+        Returns:
+            (file): The temporary file, at its beginning (it's removed when it's closed).
+        """
+
+        run_file = tempfile.TemporaryFile( dir=directory )
+
+        records = self.sorted_run( run, first )
+
+        # Blocks of tuples in the marshal format: a scratch file read back by the same process.
+        for start in range( 0, len( records ), self.RUN_BLOCK_SIZE ):
+            marshal.dump( records[ start:start + self.RUN_BLOCK_SIZE ], run_file )
+
+        run_file.seek( 0 )
+
+        return run_file
+
+    @staticmethod
+    def iter_run( run_file=None ):
+        """
+        Yield the identifications of a run written by write_run.
+
+        Args:
+            run_file(file): The temporary file of the run.
+
+        Returns:
+            (generator): ( identification, entry number ) tuples, sorted.
+        """
+
+        while True:
+            try:
+                records = marshal.load( run_file )
+            except EOFError:
+                return
+
+            yield from records
+
+    def load( self ):
+        """
+        Memory-map the index file.
+
+        Returns:
+            (void): Set the class properties that give access to the index.
+        """
+
+        self.close()
+
+        with open( self.index_file, 'rb' ) as index:
+            self._mmap = mmap.mmap( index.fileno(), 0, access=mmap.ACCESS_READ )
+
+        magic, byte_order, size, mtime, count, ids_size = self.HEADER.unpack_from( self._mmap, 0 )
+
+        self.count = count
+        self.source_size = size
+        self.source_mtime = mtime
+
+        self._view = memoryview( self._mmap )
+        view = self._view
+
+        start = self.HEADER.size
+        self._offsets = view[ start:start + count * 8 ].cast( 'Q' )
+
+        start = start + count * 8
+        self._lengths = view[ start:start + count * 8 ].cast( 'Q' )
+
+        start = start + count * 8
+        self._digests = view[ start:start + count * 8 ].cast( 'Q' )
+
+        start = start + count * 8
+        self._id_offsets = view[ start:start + ( count + 1 ) * 8 ].cast( 'Q' )
+
+        start = start + ( count + 1 ) * 8
+        self._order = view[ start:start + count * 8 ].cast( 'Q' )
+
+        self._ids_start = start + count * 8
+
+    def close( self ):
+        """
+        Release the memory-mapped index file.
+        """
+
+        if self._mmap is None:
+            return
+
+        for view in ( self._offsets, self._lengths, self._digests, self._id_offsets, self._order, self._view ):
+            view.release()
+
+        self._mmap.close()
+
+        self._mmap = None
+        self._view = None
+        self._offsets = None
+        self._lengths = None
+        self._digests = None
+        self._id_offsets = None
+        self._order = None
+        self.count = 0
+        self.source_size = 0
+        self.source_mtime = None
+
+    def entries_position( self ):
+        """
+        Returns the byte offset of every entry, in file order.
+
+        The result is a read-only view over the memory-mapped file, it behaves like a list of ints.
+
+        Returns:
+            (memoryview): Entry offsets.
+        """
+
+        return self._offsets
+
+    def entries_length( self ):
+        """
+        Returns the byte length of every entry, in file order.
+
+        Returns:
+            (memoryview): Entry lengths.
+        """
+
+        return self._lengths
+
+    def entries_digest( self ):
+        """
+        Returns the content hash of every entry, in file order.
+
+        Returns:
+            (memoryview): Entry hashes.
+        """
+
+        return self._digests
+
+    def iter_entries( self ):
+        """
+        Yield every entry of the index, in file order.
+
+        Returns:
+            (generator): ( identification, offset, length, digest ) tuples (the same that build takes).
+        """
+
+        for entry in range( self.count ):
+            yield ( self.identification( entry ), self._offsets[ entry ], self._lengths[ entry ], self._digests[ entry ] )
+
+    def appended_from( self ):
+        """
+        Returns where the pep data grew from, when the pep file changed only by new entries appended at its end.
+
+        The index file is loaded to compare it with the pep file: the pep file must be larger, the new data
+        must start right at a header and the last indexed entry must have the same content hash.
+
+        The position is the end of the last indexed entry in the uncompressed data, not the size stored in the
+        header: that's the size on disk, which for a compressed pep file (see compression.open_binary) isn't a
+        position in the data at all.
+
+        Returns:
+            (int): Position where the new entries start (the end of the old data) or None when the pep file didn't just grow.
+        """
+
+        if not os.path.exists( self.index_file ):
+            return None
+
+        with open( self.index_file, 'rb' ) as index:
+            raw_header = index.read( self.HEADER.size )
+
+        if len( raw_header ) < self.HEADER.size:
+            return None
+
+        magic, byte_order, size, mtime, count, ids_size = self.HEADER.unpack( raw_header )
+
+        if magic != self.MAGIC or byte_order != self.byte_order() or count == 0:
+            return None
+
+        if self.source_stamp()[0] <= size:
+            return None
+
+        self.load()
+
+        offset = self._offsets[ count - 1 ]
+        length = self._lengths[ count - 1 ]
+
+        with open_binary( self.pep_file ) as pep_file:
+            pep_file.seek( offset )
+            raw_entry = pep_file.read( length + 1 )
+
+        if raw_entry[ length - 1:] != b'\n>':
+            return None
+
+        if raw_entry_digest( raw_entry[ :length ] ) != self._digests[ count - 1 ]:
+            return None
+
+        return offset + length
+
+    def identification( self, entry=None ):
+        """
+        Returns the identification of an entry.
+
+        Args:
+            entry(int): Entry number (its place in the file).
+
+        Returns:
+            (str): Protein identification.
+        """
+
+        start = self._ids_start + self._id_offsets[ entry ]
+        end = self._ids_start + self._id_offsets[ entry + 1 ]
+
+        return self._mmap[ start:end ].decode()
+
+    def identifications( self ):
+        """
+        Returns the identification of every entry, in file order.
+
+        The identifications are sliced out of a single read of the identifications blob, much faster than
+        calling identification once per entry.
+
+        Returns:
+            (list): Protein identifications.
+        """
+
+        blob = self._mmap[ self._ids_start:self._ids_start + self._id_offsets[ self.count ] ] if self.count else b''
+
+        id_offsets = self._id_offsets.tolist()
+
+        return [ blob[ start:end ].decode() for start, end in zip( id_offsets, id_offsets[ 1: ] ) ]
+
+    def find( self, identification=None ):
+        """
+        Returns the entry number of an identification, using a binary search over the sorted identifications.
+
+        Args:
+            identification(str): Protein identification (like 'hsa:10458').
+
+        Returns:
+            (int): Entry number or None if the identification isn't in the index.
+        """
+
+        key = identification.encode()
+
+        low = 0
+        high = self.count
+
+        while low < high:
+            middle = ( low + high ) // 2
+            entry = self._order[ middle ]
+
+            start = self._ids_start + self._id_offsets[ entry ]
+            end = self._ids_start + self._id_offsets[ entry + 1 ]
+
+            if self._mmap[ start:end ] < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        if low < self.count:
+            entry = self._order[ low ]
+
+            if self.identification( entry ) == identification:
+                return entry
+
+        return None
+
+    def span( self, identification=None ):
+        """
+        Returns the byte offset and length of an entry, by its identification.
+
+        Args:
+            identification(str): Protein identification (like 'hsa:10458').
+
+        Returns:
+            (tuple): ( offset, length ) or None if the identification isn't in the index.
+        """
+
+        entry = self.find( identification )
+
+        if entry is None:
+            return None
+
+        return ( self._offsets[ entry ], self._lengths[ entry ] )
@@ -1,67 +1,1226 @@
+import os
 import re
+import glob
+import time
+import queue
 import pprint
+from array import array
+from bisect import bisect_left
+from collections import deque
+from itertools import chain
+from multiprocessing import Manager
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from pepreader.pep import PEP
+from pepreader.pepindex import PEPIndex
+from pepreader.keyindex import KeyIndex, key_index_file
+from pepreader.records import LazyRecord, PEPRecord
+from pepreader.columns import COLUMNS, ColumnWriter
+from pepreader.cache import EntryCache
+from pepreader.validation import Validator, PROTEIN_ALPHABET
+from pepreader.sequenceindex import SequenceIndex, sequence_digest
+from pepreader.filters import EntryFilter
+
+# Header patterns, compiled once for every header parsed.
+RE_SPACES = re.compile(r"\ {1,}")
+RE_LEADING_SPACE = re.compile(r"^\ ")
+RE_TRAILING_SPACE = re.compile(r"\ $")
+RE_HAS_EC_SQUARE_BRACKETS = re.compile(r'\[EC:')
+RE_HAS_EC_BRACKETS = re.compile(r'\(EC:')
+RE_EC_SQUARE_BRACKETS = re.compile(r'^>.*\[EC:(.*)\]')
+RE_EC_BRACKETS = re.compile(r'^>.*\(EC:(.*)\)')
+
+
+def _parse_range( pep_file=None, encoding=None, start=None, end=None ):
+    """
+    Parse the entries in a byte range of a pep file (that's what each process of parse_parallel runs).
+
+    Args:
+        pep_file(str): Path of the pep file.
+        encoding(str): Encoding of the pep file.
+        start(int): Position of the first entry of the range.
+        end(int): Position right after the last byte of the range.
+
+    Returns:
+        (list): Dictionaries containing pep file entries (same as parsed_entry).
+    """
+
+    with PEPReader( pep=PEP( pep_file, encoding=encoding ) ) as pepreader:
+        return [ pepreader.parsed_record( pep_entry ) for pep_entry in pepreader.pep.iter_range_entries( start, end ) ]
+
+
+def _read_file( pep_file=None, encoding=None, batches=None, stop=None, batch_size=1024 ):
+    """
+    Parse a whole pep file and send its entries in batches (that's what each process of read_many runs).
+
+    The batches queue is bounded: the process waits while the consumer is behind, so only a few batches are in
+    memory at once, whatever the size of the file. The report of the file goes with the last batch. Once stop is
+    set (the consumer of read_many is gone), nothing else is sent.
+
+    Errors don't propagate: they're reported, so a corrupt file doesn't abort the batch.
+
+    Args:
+        pep_file(str): Path of the pep file.
+        encoding(str): Encoding of the pep file.
+        batches(Queue): Queue read by read_many, it gets ( pep_file, proteins, report ) tuples where report is None but in the last one.
+        stop(Event): Set by read_many when it stops reading the batches.
+        batch_size(int): Number of entries sent at once.
+
+    Returns:
+        (dict): The report, a dictionary with 'pep_file', 'entries', 'bytes', 'seconds' and 'error' keys.
+    """
+
+    report = { 'pep_file': pep_file, 'entries': 0, 'bytes': 0, 'seconds': 0.0, 'error': None }
+
+    proteins = []
+
+    started = time.perf_counter()
+
+    try:
+        report['bytes'] = os.path.getsize( pep_file )
+
+        with PEPReader( pep=PEP( pep_file, encoding=encoding ) ) as pepreader:
+            for protein in pepreader.iter_parsed_entries():
+                proteins.append( protein )
+
+                if len( proteins ) == batch_size:
+                    if stop.is_set():
+                        return report
+
+                    batches.put( ( pep_file, proteins, None ) )
+
+                    report['entries'] = report['entries'] + len( proteins )
+                    proteins = []
+
+    except Exception as error:
+        report['error'] = repr( error )
+        proteins = []
+
+    report['entries'] = report['entries'] + len( proteins )
+    report['seconds'] = time.perf_counter() - started
+
+    if not stop.is_set():
+        batches.put( ( pep_file, proteins, report ) )
+
+    return report
+
+
+class PEPReader:
+    """
+    Read 'pep' files and return entries in a dict format.
+
+    Attributes:
+        pep(class): PEP class.
+        file_to_parse(file): File handle that represents the 'pep' file to read.
+        entries_position(array): Entries position (byte position in the file) of every entry.
+        index(PEPIndex): Persistent offset index of the pep file (only when load_index was called).
+        identifications(dict): Identification to entry position index (built on the first lookup).
+        ec_index(KeyIndex): Persistent EC number to entries position index (only when load_index was called).
+        ec_positions(dict): EC number to entries position index, when there's no persistent index (built on the first lookup).
+        organism_index(KeyIndex): Persistent organism code to byte ranges index (only when load_index was called).
+        organism_runs(dict): Organism code to byte ranges index, when there's no persistent index (built on the first lookup).
+        cache(EntryCache): Cache of parsed entries (only when cache_size is given).
+    """
+
+    def __init__( self, pep, cache_size=None ):
+        self.pep = pep 
+
+        self.file_to_parse = None
+        self.pep.entries_position = array( 'Q' )
+
+        self.index = None
+        self.identifications = None
+
+        self.ec_index = None
+        self.ec_positions = None
+
+        self.organism_index = None
+        self.organism_runs = None
+
+        self.cache = None
+
+        if cache_size:
+            self.cache = EntryCache( pep.file_to_parse, cache_size )
+
+    def check_cache( self ):
+        """
+        Drop the cached entries and positions if the pep file changed.
+
+        The file handle (and the memory map) are closed too: a file replaced by another one (like os.replace does)
+        is a new file, the old handle would still read the old one. They're opened again at the next read.
+        """
+
+        if self.cache is not None and self.cache.check():
+            self.identifications = None
+            self.ec_positions = None
+            self.organism_runs = None
+
+            self.pep.close()
+
+            # The positions generated from the old file (or taken from the index, now stale) are gone. The
+            # persistent index checks itself: lookups don't use it until it's loaded again.
+            self.pep.entries_position = array( 'Q' )
+
+    def check_index( self ):
+        """
+        Return True if the persistent index is loaded and still matches the pep file.
+
+        When the pep file changed, the persistent indexes are released and, like in check_cache, the file handle
+        (and the memory map) are closed and the positions taken from the index are dropped, with or without a
+        cache: the next reads go to the new file. Lookups scan the pep file until the index is loaded again
+        (see load_index).
+
+        Returns:
+            (boolean):
+        """
+
+        if self.index is None:
+            return False
+
+        if not self.index.is_stale():
+            return True
+
+        self.identifications = None
+        self.ec_positions = None
+        self.organism_runs = None
+
+        self.pep.close()
+        self.pep.entries_position = array( 'Q' )
+
+        self.close_indexes()
+
+        return False
+
+    def cache_info( self ):
+        """
+        Returns the counters of the cache of parsed entries.
+
+        Returns:
+            (dict): 'hits', 'misses', 'evictions', 'invalidations', 'entries', 'size' and 'max_bytes' (None when there's no cache).
+        """
+
+        if self.cache is None:
+            return None
+
+        return self.cache.info()
+
+    def stats( self ):
+        """
+        Returns a snapshot of the instrumentation counters and timers of the pep file reads and of the header parsing.
+
+        Instrumentation is enabled by giving the PEP object a Stats object (see pepreader.stats.Stats).
+
+        Returns:
+            (dict): { 'counters': { name: value }, 'timers': { name: seconds } } or None when instrumentation is disabled.
+        """
+
+        return self.pep.stats()
+
+    def __enter__( self ):
+        return self
+
+    def __exit__( self, *exc_info ):
+        self.close()
+
+    def close( self ):
+        """
+        Release the file handle of the pep file and the persistent indexes (if they're loaded).
+        """
+
+        self.pep.close()
+
+        if self.index is not None:
+            self.pep.entries_position = array( 'Q' )
+
+        self.close_indexes()
+
+    def load_index( self, index_file=None ):
+        """
+        Load the persistent offset index of the pep file, building it first if it's missing or stale.
+
+        When the pep file only grew by entries appended at its end, the index is extended from where the
+        old file ended instead of scanning the whole file again.
+
+        The EC number index (see entries_by_ec) and the organism index (see iter_organism) are built in the
+        same scan and stored next to the position index (e.g. 'example.pep.ec.idx' and 'example.pep.organism.idx'
+        next to 'example.pep.idx').
+
+        After that, entries_position comes from the index and doesn't scan the pep file anymore.
+
+        Args:
+            index_file(str): Path of the index file (default is the pep file path plus '.idx').
+
+        Returns:
+            (PEPIndex): The loaded index.
+        """
+
+        index = PEPIndex( self.pep.file_to_parse, index_file )
+
+        key_indexes = { name: KeyIndex( self.pep.file_to_parse, key_index_file( index.index_file, name ) ) for name in ( 'ec', 'organism' ) }
+
+        if index.is_stale() or any( key_index.is_stale() for key_index in key_indexes.values() ):
+            appended_from = index.appended_from()
+
+            # The key indexes can only be extended when they were built from the same old file (appended_from
+            # loaded the index, so its stamp is the one of the old file).
+            if appended_from is not None and all( key_index.read_header() == ( index.source_size, index.source_mtime ) for key_index in key_indexes.values() ):
+                keys = {}
+
+                for name, key_index in key_indexes.items():
+                    key_index.load()
+                    keys[ name ] = { key: array( 'Q', values ) for key, values in key_index.items() }
+                    key_index.close()
+
+                # Only new entries were appended: the index is extended from the old end, not rebuilt from zero.
+                index.build( chain( index.iter_entries(), self.iter_index_entries( appended_from, keys ) ) )
+            else:
+                keys = { name: {} for name in key_indexes }
+
+                index.build( self.iter_index_entries( 0, keys ) )
+
+            for name, key_index in key_indexes.items():
+                key_index.build( keys[ name ] )
+
+        index.load()
+
+        for key_index in key_indexes.values():
+            key_index.load()
+
+        self.close_indexes()
+
+        self.index = index
+        self.ec_index = key_indexes['ec']
+        self.organism_index = key_indexes['organism']
+        self.pep.entries_position = index.entries_position()
+
+        return index
+
+    def close_indexes( self ):
+        """
+        Release the persistent indexes (if they're loaded).
+        """
+
+        if self.index is not None:
+            self.index.close()
+            self.index = None
+
+        if self.ec_index is not None:
+            self.ec_index.close()
+            self.ec_index = None
+
+        if self.organism_index is not None:
+            self.organism_index.close()
+            self.organism_index = None
+
+    def iter_index_entries( self, start=0, keys=None ):
+        """
+        Yield the entries of the pep file in the format PEPIndex.build takes.
+
+        Args:
+            start(int): Position where reading starts (must be the position of an entry, or zero).
+            keys(dict): When given, the keys of every entry are collected in keys['ec'] (see add_ec_positions) and keys['organism'] (see add_organism_run).
+
+        Returns:
+            (generator): ( identification, offset, length, digest ) tuples.
+        """
+
+        for offset, length, header, digest in self.pep.iter_entries_digest( start ):
+            if keys is not None:
+                self.add_ec_positions( keys['ec'], offset, header )
+                self.add_organism_run( keys['organism'], offset, length, header )
+
+            yield ( self.protein_identification( header ), offset, length, digest )
+
+    def add_ec_positions( self, ec_positions=None, offset=None, header=None ):
+        """
+        Add the position of an entry to the positions of each of its EC numbers (from both annotation styles).
+
+        Args:
+            ec_positions(dict): { EC number: array of entries position }
+            offset(int): Position of the entry.
+            header(str): Header of the entry.
+        """
+
+        # Most headers have no EC number at all: they're skipped without running the regular expressions.
+        if 'EC:' not in header:
+            return
+
+        for ec_number in self.ec_numbers( header ):
+            positions = ec_positions.get( ec_number )
+
+            if positions is None:
+                positions = ec_positions[ ec_number ] = array( 'Q' )
+
+            positions.append( offset )
+
+    @staticmethod
+    def diff( old_index=None, new_file=None, encoding='utf-8' ):
+        """
+        Compare a new release of a pep file with the index of the old one and yield only what changed.
+
+        Entries are matched by identification and compared by content hash (see pepindex.entry_digest), so
+        moved entries or a different line width don't count as changes. Only the old index is needed, not the old file.
+
+        Example:
+
+            for status, identification, position in PEPReader.diff( 'old/genes.pep.idx', 'new/genes.pep' ):
+                if status == 'removed':
+                    delete( identification )
+                else:
+                    store( new_reader.parsed_entry( position ) )
+
+        Args:
+            old_index(PEPIndex|str): Index of the old release (a loaded PEPIndex or the path of its index file).
+            new_file(str): Path of the new pep file.
+            encoding(str): Encoding of the new pep file.
+
+        Returns:
+            (generator): ( status, identification, position ) tuples, status is 'added', 'changed' or 'removed' and position is the position of the entry in the new file (None for removed entries).
+        """
+
+        if isinstance( old_index, str ):
+            index = PEPIndex( index_file=old_index )
+            index.load()
+        else:
+            index = old_index
+
+        # Identification to content hash of every old entry, built once: a dictionary lookup per new entry instead
+        # of a binary search over the index. The entries left at the end are the removed ones.
+        old_digests = dict( zip( index.identifications(), index.entries_digest().tolist() ) )
+
+        pepreader = PEPReader( pep=PEP( new_file, encoding=encoding ) )
+
+        for identification, offset, length, digest in pepreader.iter_index_entries():
+            old_digest = old_digests.pop( identification, None )
+
+            if old_digest is None:
+                yield ( 'added', identification, offset )
+
+            elif old_digest != digest:
+                yield ( 'changed', identification, offset )
+
+        for identification in old_digests:
+            yield ( 'removed', identification, None )
+
+        if index is not old_index:
+            index.close()
+
+    def parsed_file( self ):
+        """
+        Returns list of pep (Fasta) headers and its sequences.
+        """
+
+        pep_data = self.pep.parse_file()
+
+        return pep_data
+
+    def entries_position( self ):
+        """
+        Returns the entries position of the pep file.
+
+        Returns:
+            (array): Entries position (numbers) of the entries in the *pep file.
+        """
+
+        # The index is only trusted while the pep file is the one it was built from.
+        if self.check_index():
+            return self.pep.entries_position
+
+        self.pep.generate_entries_position()
+        positions = self.pep.entries_position
+
+        return positions
+
+
+    def parsed_entry( self, offset=None ):
+        """
+        Returns the entry of a pep file in a dictionary format.
+
+        With a cache (see cache_size), entries come from the cache when they're there. Cached entries are shared,
+        they shouldn't be changed.
+
+        Args:
+            offset(int): Position inside the file handle.
+
+        Returns:
+            (dict): Dictionary containing an pep file entry.
+        """
+
+        if self.cache is None:
+            return self.parsed_record( self.pep.get_entry_record( offset ) )
+
+        self.check_cache()
+
+        protein = self.cache.get( offset )
+
+        if protein is None:
+            protein = self.parsed_record( self.pep.get_entry_record( offset ) )
+
+            self.cache.put( offset, protein )
+
+        return protein
+
+    def iter_parsed_entries( self, lazy=False, compact=False, where=None ):
+        """
+        Yield every entry of the pep file in a dictionary format, one at a time and in file order.
+
+        That's the streaming counterpart of parsed_entry: the file is read only once and just a
+        single entry is kept in memory.
+
+        In lazy mode, entries are LazyRecord objects: headers are parsed but sequences are only read when
+        they're used. When the persistent index is loaded (see load_index) only the headers are read from the file.
+
+        In compact mode, entries are PEPRecord objects (same fields, __slots__ instead of a dictionary), which
+        take much less memory when many entries are kept.
+
+        Entries without sequence (nothing but blank lines after the header) are left out.
+
+        With a filter (see filters.EntryFilter) only the matching entries are yielded, and the filter is checked
+        before anything is parsed: on the raw header and the raw sequence of a single pass through the file or,
+        with the persistent index loaded, on the header and the span of every entry before its sequence is read
+        (see iter_matching_spans).
+
+        Example:
+
+            for entry in pepreader.iter_parsed_entries( where={ 'organisms': [ 'hsa' ], 'ec': True } ):
+                store( entry )
+
+        Args:
+            lazy(boolean): Yield LazyRecord objects instead of dictionaries.
+            compact(boolean): Yield PEPRecord objects instead of dictionaries.
+            where(EntryFilter|dict): Filter of the entries (a dictionary is taken as the EntryFilter arguments), or None for every entry.
+
+        Returns:
+            (generator): Dictionaries (or LazyRecord or PEPRecord objects) containing pep file entries.
+        """
+
+        if isinstance( where, dict ):
+            where = EntryFilter( **where )
+
+        if lazy:
+            for offset, length, header in self.iter_entries_header( where ):
+                yield LazyRecord( self.pep, offset, length, self.parse_header( header ) )
+
+            return
+
+        if where is not None and self.check_index():
+            pep_entries = self.iter_indexed_entries( where )
+        else:
+            pep_entries = self.pep.iter_entries( where )
+
+        if compact:
+            for pep_entry in pep_entries:
+                yield PEPRecord( **self.parsed_record( pep_entry ) )
+
+            return
+
+        for pep_entry in pep_entries:
+            yield self.parsed_record( pep_entry )
+
+    def iter_entries_header( self, where=None ):
+        """
+        Yield the position, the size and the header of every entry with a sequence, in file order.
+
+        With the persistent index loaded, positions and sizes come from it and only the first bytes of every
+        entry are read, a single small read for the header and the start of the sequence (see PEP.iter_entry_heads).
+        Otherwise that's a single pass through the file (see PEP.iter_entries_span).
+
+        With a filter, only the entries that match it (see iter_matching_spans). A sequence length criterion
+        needs the sequence of the entries that get that far, they're read to be counted.
+
+        Args:
+            where(EntryFilter): Filter of the entries, or None for every entry.
+
+        Returns:
+            (generator): ( offset, length, header ) tuples.
+        """
+
+        if where is not None:
+            for offset, length, raw_header in self.iter_matching_spans( where ):
+                if where.checks_length() and not where.match_sequence( self.pep.read_span( offset, length ).partition( b'\n' )[2] ):
+                    continue
+
+                yield ( offset, length, raw_header.decode( self.pep.encoding ) )
+
+            return
+
+        if self.check_index():
+            encoding = self.pep.encoding
+
+            for offset, length, raw_header in self.pep.iter_entry_heads( zip( self.index.entries_position(), self.index.entries_length() ) ):
+                yield ( offset, length, raw_header.decode( encoding ) )
+        else:
+            for span in self.pep.iter_entries_span( skip_empty=True ):
+                yield span
+
+    def iter_matching_spans( self, where=None ):
+        """
+        Yield the position, the size and the raw header of the entries whose header and span match a filter.
+
+        Entries without sequence are left out, the same as in iter_parsed_entries.
+
+        With the persistent index loaded, only the header lines are read and entries that are too short (see
+        filters.EntryFilter.match_span) are left out at once, and an organism criterion only goes through the
+        byte ranges of those organisms (see organism_ranges). Otherwise that's a single pass through the file
+        (see PEP.iter_entries_span).
+
+        Args:
+            where(EntryFilter): Filter of the entries.
+
+        Returns:
+            (generator): ( offset, length, raw header ) tuples, the raw header is bytes, without the line break.
+        """
+
+        if not self.check_index():
+            for offset, length, header in self.pep.iter_entries_span( skip_empty=True ):
+                raw_header = header.encode( self.pep.encoding )
+
+                if where.match_span( len( raw_header ), length ) and where.match_header( raw_header ):
+                    yield ( offset, length, raw_header )
+
+            return
+
+        positions = self.index.entries_position()
+        lengths = self.index.entries_length()
+
+        if where.organisms is not None:
+            ranges = sorted( chain.from_iterable( self.organism_ranges( organism_code.decode() ) for organism_code in where.organisms ) )
+
+            entries = chain.from_iterable( range( bisect_left( positions, start ), bisect_left( positions, end ) ) for start, end in ranges )
+        else:
+            entries = range( len( positions ) )
+
+        for offset, length, raw_header in self.pep.iter_entry_heads( ( positions[ entry ], lengths[ entry ] ) for entry in entries ):
+            if where.match_span( len( raw_header ), length ) and where.match_header( raw_header ):
+                yield ( offset, length, raw_header )
+
+    def iter_indexed_entries( self, where=None ):
+        """
+        Yield the entries that match a filter, with the persistent index loaded (see iter_matching_spans).
+
+        Only the entries whose header and span match are read, the sequence length is checked on the raw
+        sequence before it's assembled.
+
+        Args:
+            where(EntryFilter): Filter of the entries.
+
+        Returns:
+            (generator): { 'header': header, 'sequence': sequence }
+        """
+
+        for offset, length, raw_header in self.iter_matching_spans( where ):
+            raw_entry = self.pep.read_span( offset, length )
+
+            if not where.match_sequence( raw_entry.partition( b'\n' )[2] ):
+                continue
+
+            yield self.pep.entry_record( raw_entry )
+
+    def to_columns( self, row_group_size=65536 ):
+        """
+        Yield the parsed entries of the pep file in columns, one row group at a time.
+
+        Entries come from the streaming parser, so only a row group is kept in memory.
+
+        Args:
+            row_group_size(int): Number of entries of each row group (the last one may be smaller).
+
+        Returns:
+            (generator): Dictionaries with a list of values for the 'identification', 'organism_code', 'description', 'ec_numbers' and 'sequence' columns.
+        """
+
+        columns = { name: [] for name in COLUMNS }
+
+        for protein in self.iter_parsed_entries():
+            for name in COLUMNS:
+                columns[ name ].append( protein[ name ] )
+
+            if len( columns['identification'] ) >= row_group_size:
+                yield columns
+
+                columns = { name: [] for name in COLUMNS }
+
+        if len( columns['identification'] ) > 0:
+            yield columns
+
+    def export_columns( self, column_file=None, row_group_size=65536 ):
+        """
+        Write the parsed entries of the pep file to a columnar file (see ColumnWriter and ColumnReader).
+
+        Args:
+            column_file(str): Path of the columnar file.
+            row_group_size(int): Number of entries of each row group.
+
+        Returns:
+            (int): Number of entries written.
+        """
+
+        rows = 0
+
+        with ColumnWriter( column_file ) as writer:
+            for columns in self.to_columns( row_group_size ):
+                writer.write_row_group( columns )
+
+                rows = rows + len( columns['identification'] )
+
+        return rows
+
+    def identification_index( self ):
+        """
+        Returns the identification to entry position index of the pep file.
+
+        The index is built once, in a single pass through the file, and kept for the next lookups.
+
+        Returns:
+            (dict): { identification: position }
+        """
+
+        if self.identifications is None:
+            identifications = {}
+
+            for offset, length, header in self.pep.iter_entries_span():
+                identifications[ self.protein_identification( header ) ] = offset
+
+            self.identifications = identifications
+
+        return self.identifications
+
+    def identification_position( self, identification=None ):
+        """
+        Returns the entry position of a protein identification.
+
+        The persistent index is used when it's loaded (see load_index), otherwise the in memory identification index.
+
+        Args:
+            identification(str): Protein identification (like 'hsa:10458').
+
+        Returns:
+            (int): Entry position or None if the identification isn't in the pep file.
+        """
+
+        identification = identification.lower()
+
+        if self.check_index():
+            span = self.index.span( identification )
+
+            if span is None:
+                return None
+
+            return span[0]
+
+        return self.identification_index().get( identification )
+
+    def add_organism_run( self, organism_runs=None, offset=None, length=None, header=None ):
+        """
+        Add an entry to the byte ranges of its organism.
+
+        Entries of the same organism that follow each other make a single range, so a file sorted by organism
+        has a single range per organism.
+
+        Args:
+            organism_runs(dict): { organism code: array of ( start, end ) pairs, flattened }
+            offset(int): Position of the entry.
+            length(int): Size of the entry, in bytes.
+            header(str): Header of the entry.
+        """
+
+        organism_code = self.organism_code( header ).lower()
+
+        runs = organism_runs.get( organism_code )
+
+        if runs is None:
+            runs = organism_runs[ organism_code ] = array( 'Q' )
 
-class PEPReader:
-    """
-    Read 'pep' files and return entries in a dict format.
+        if runs and runs[-1] == offset:
+            runs[-1] = offset + length
+        else:
+            runs.append( offset )
+            runs.append( offset + length )
 
-    Attributes:
-        pep(class): PEP class.
-        file_to_parse(file): File handle that represents the 'pep' file to read.
-        entries_position(list): List of entries position (char position in the file) of every entry.
-    """
+    def organism_runs_index( self ):
+        """
+        Returns the organism code to byte ranges index of the pep file, when there's no persistent index.
 
-    def __init__( self, pep ):
-        self.pep = pep 
+        The index is built once, in a single pass through the file, and kept for the next lookups.
 
-        self.file_to_parse = None
-        self.pep_entries_position = []
+        Returns:
+            (dict): { organism code: array of ( start, end ) pairs, flattened }
+        """
 
-    def parsed_file( self ):
+        if self.organism_runs is None:
+            organism_runs = {}
+
+            for offset, length, header in self.pep.iter_entries_span():
+                self.add_organism_run( organism_runs, offset, length, header )
+
+            self.organism_runs = organism_runs
+
+        return self.organism_runs
+
+    def organism_ranges( self, organism_code=None ):
         """
-        Returns list of pep (Fasta) headers and its sequences.
+        Returns the byte ranges of the pep file that have the entries of an organism.
+
+        The persistent organism index is used when it's loaded (see load_index), otherwise the in memory
+        organism index (see organism_runs_index).
+
+        Args:
+            organism_code(str): Organism code (like 'hsa').
+
+        Returns:
+            (list): [ ( start, end ) ], in file order (empty when the organism isn't in the pep file).
         """
 
-        pep_data = self.pep.parse_file()
+        organism_code = organism_code.lower()
 
-        return pep_data
+        if self.check_index():
+            runs = self.organism_index.get( organism_code )
+        else:
+            runs = self.organism_runs_index().get( organism_code, () )
 
-    def entries_position( self ):
+        return [ ( runs[ run ], runs[ run + 1 ] ) for run in range( 0, len( runs ), 2 ) ]
+
+    def organisms( self ):
         """
-        Returns the entries position of the pep file.
+        Returns the organism code of every organism of the pep file.
 
         Returns:
-            (list): Entries position (numbers) of the entries in the *pep file.
+            (list): Organism codes, sorted.
         """
 
-        self.pep.generate_entries_position()
-        positions = self.pep.entries_position
+        if self.check_index():
+            return [ organism_code for organism_code, runs in self.organism_index.items() ]
 
-        return positions
+        return sorted( self.organism_runs_index() )
+
+    def iter_organism( self, organism_code=None ):
+        """
+        Yield the entries of an organism in a dictionary format, in file order.
 
+        Only the byte ranges of the organism are read (see organism_ranges), not the whole file, so jobs for
+        different organisms can run in parallel over the same merged pep file. Like iter_parsed_entries, entries
+        without sequence are left out.
 
-    def parsed_entry( self, offset=None ):
+        Example:
+
+            pepreader.load_index()
+
+            for entry in pepreader.iter_organism( 'hsa' ):
+                store( entry )
+
+        Args:
+            organism_code(str): Organism code (like 'hsa').
+
+        Returns:
+            (generator): Dictionaries containing pep file entries.
         """
-        Returns the entry of a pep file in a dictionary format.
+
+        for start, end in self.organism_ranges( organism_code ):
+            for pep_entry in self.pep.iter_range_entries( start, end ):
+                yield self.parsed_record( pep_entry )
+
+    def ec_positions_index( self ):
+        """
+        Returns the EC number to entries position index of the pep file, when there's no persistent index.
+
+        The index is built once, in a single pass through the file, and kept for the next lookups.
+
+        Returns:
+            (dict): { EC number: array of entries position }
+        """
+
+        if self.ec_positions is None:
+            ec_positions = {}
+
+            for offset, length, header in self.pep.iter_entries_span():
+                self.add_ec_positions( ec_positions, offset, header )
+
+            self.ec_positions = ec_positions
+
+        return self.ec_positions
+
+    def entries_by_ec( self, ec_number=None ):
+        """
+        Returns the position of every entry annotated with an EC number.
+
+        A '-' stands for any number from there on: '1.1.1.-' finds '1.1.1.1', '1.1.1.27' and '1.1.1.-' itself,
+        '1.-.-.-' finds every oxidoreductase.
+
+        The persistent EC index is used when it's loaded (see load_index): a binary search over the sorted
+        EC numbers, nothing is read from the pep file. Otherwise the in memory EC index (see ec_positions_index).
+
+        Example:
+
+            for position in pepreader.entries_by_ec( '1.1.1.-' ):
+                entry = pepreader.parsed_entry( position )
 
         Args:
-            offset(int): Position inside the file handle.
+            ec_number(str): EC number (like '1.1.1.1' or '1.1.1.-').
+
+        Returns:
+            (list): Entries position, in file order.
+        """
+
+        numbers = ec_number.strip().split('.')
+
+        while numbers and numbers[-1] == '-':
+            numbers.pop()
+
+        # Without a '-' that's an exact match, otherwise every EC number that starts with the given numbers.
+        exact = len( numbers ) == len( ec_number.strip().split('.') )
+        prefix = '.'.join( numbers ) + '.' if numbers else ''
+
+        if self.check_index():
+            if exact:
+                return list( self.ec_index.get( ec_number.strip() ) )
+
+            found = set()
+
+            for key, positions in self.ec_index.iter_prefix( prefix ):
+                found.update( positions )
+
+            return sorted( found )
+
+        ec_positions = self.ec_positions_index()
+
+        if exact:
+            return list( ec_positions.get( ec_number.strip(), [] ) )
+
+        found = set()
+
+        for key, positions in ec_positions.items():
+            if key.startswith( prefix ):
+                found.update( positions )
+
+        return sorted( found )
+
+    def validate( self, alphabet=PROTEIN_ALPHABET, max_issues=10000 ):
+        """
+        Check every entry of the pep file and returns the validation report (see validation.Validator).
+
+        The checks are empty identifications, backslashes and quotes in headers, duplicate identifications, entries
+        without sequence and sequence characters out of the alphabet. Every issue has the byte offset of its entry.
+
+        Args:
+            alphabet(bytes): Valid sequence characters.
+            max_issues(int): Maximum number of issues kept in the report (None keeps every issue).
+
+        Returns:
+            (dict): 'pep_file', 'entries', 'bytes', 'valid', 'counts' and 'issues' keys.
+        """
+
+        return Validator( self.pep, alphabet ).report( max_issues )
+
+    def repair( self, target_file=None, alphabet=PROTEIN_ALPHABET, max_issues=10000 ):
+        """
+        Write a repaired copy of the pep file and returns the validation report of the original (see validation.Validator.repair).
+
+        Args:
+            target_file(str): Path of the repaired pep file.
+            alphabet(bytes): Valid sequence characters.
+            max_issues(int): Maximum number of issues kept in the report (None keeps every issue).
+
+        Returns:
+            (dict): 'pep_file', 'entries', 'bytes', 'valid', 'counts' and 'issues' keys.
+        """
+
+        return Validator( self.pep, alphabet ).repair( target_file, max_issues )
+
+    def sequence_index( self, max_entries=1000000, directory=None ):
+        """
+        Build the sequence hash to identifications index of the pep file, in a single pass (see sequenceindex.SequenceIndex).
+
+        Entries without sequence are left out, like in iter_entries.
+
+        Args:
+            max_entries(int): Number of entries kept in memory, the index moves to a temporary database on disk after that.
+            directory(str): Directory of the temporary database (default is the system temporary directory).
+
+        Returns:
+            (SequenceIndex): The index, close it when it's not needed anymore.
+        """
+
+        index = SequenceIndex( max_entries, directory )
+
+        try:
+            for offset, raw_header, raw_sequence in self.pep.iter_raw_entries():
+                sequence = bytes( raw_sequence ).replace( b'\n', b'' ).replace( b'\r', b'' )
+
+                if not sequence:
+                    continue
+
+                header = bytes( raw_header ).decode( self.pep.encoding )
+
+                index.add( sequence_digest( sequence ), offset, self.protein_identification( header ) )
+        except BaseException:
+            index.close()
+            raise
+
+        return index
+
+    def iter_unique_sequences( self, max_entries=1000000, directory=None ):
+        """
+        Yield every different sequence of the pep file once, with the identifications of every entry that has it.
+
+        Many entries share the same sequence (e.g. the same protein in many strains): that's the deduplicated set
+        for sequence database builds (BLAST, DIAMOND). Sequences are compared by content hash (see
+        sequenceindex.sequence_digest), line breaks don't count.
+
+        The file is read twice, both times sequentially: the first pass builds the sequence index (see
+        sequence_index), the second one reads the first entry of every sequence. Memory stays bounded: past
+        max_entries entries the index is kept in a temporary database on disk.
+
+        Example:
+
+            with open( 'unique.fasta', 'w' ) as f:
+                for entry in pepreader.iter_unique_sequences():
+                    f.write( '>' + entry['identification'] + '\n' + entry['sequence'] + '\n' )
+
+        Args:
+            max_entries(int): Number of entries kept in memory, the index moves to a temporary database on disk after that.
+            directory(str): Directory of the temporary database (default is the system temporary directory).
+
+        Returns:
+            (generator): Dictionaries with 'identification' and 'header' (of the first entry with the sequence), 'sequence', 'identifications' (every entry with the sequence, in file order) and 'digest' (hexadecimal hash) keys.
+        """
+
+        index = self.sequence_index( max_entries, directory )
+
+        try:
+            groups = index.iter_groups()
+            group = next( groups, None )
+
+            for offset, raw_header, raw_sequence in self.pep.iter_raw_entries():
+                if group is None:
+                    break
+
+                digest, entries = group
+
+                # Only the first entry of every sequence, groups are in the order of their first entry.
+                if offset != entries[0][0]:
+                    continue
+
+                sequence = bytes( raw_sequence ).replace( b'\n', b'' ).replace( b'\r', b'' )
+
+                yield {
+                    'identification': entries[0][1],
+                    'header': bytes( raw_header ).decode( self.pep.encoding ),
+                    'sequence': sequence.decode( self.pep.encoding ),
+                    'identifications': [ identification for position, identification in entries ],
+                    'digest': digest.hex(),
+                }
+
+                group = next( groups, None )
+        finally:
+            index.close()
+
+    def get_by_identification( self, identification=None ):
+        """
+        Returns the entry of a protein identification in a dictionary format.
+
+        Args:
+            identification(str): Protein identification (like 'hsa:10458').
+
+        Returns:
+            (dict): Dictionary containing an pep file entry (same as parsed_entry) or None if the identification isn't in the pep file.
+        """
+
+        position = None
+
+        if self.cache is not None:
+            self.check_cache()
+
+            position = self.cache.position( identification.lower() )
+
+        if position is None:
+            position = self.identification_position( identification )
+
+        if position is None:
+            return None
+
+        return self.parsed_entry( position )
+
+    def get_many( self, identifications=None ):
+        """
+        Returns the entries of many protein identifications in a dictionary format.
+
+        Entries are read in file order (sorted positions), so the pep file is read sequentially no matter the
+        order of the identifications.
+
+        Args:
+            identifications(list): Protein identifications (like [ 'hsa:10458', 'rno:24189' ]).
+
+        Returns:
+            (list): Dictionaries containing pep file entries, in the same order of the identifications. None for identifications that aren't in the pep file.
+        """
+
+        positions = [ self.identification_position( identification ) for identification in identifications ]
+
+        entries = {}
+
+        for position in sorted( set( positions ) - { None } ):
+            entries[ position ] = self.parsed_entry( position )
+
+        return [ entries.get( position ) for position in positions ]
+
+    def parsed_record( self, pep_entry=None ):
+        """
+        Returns a raw pep entry (header and sequence) in the parsed dictionary format.
+
+        Args:
+            pep_entry(dict): Dictionary with the 'header' and 'sequence' keys.
 
         Returns:
             (dict): Dictionary containing an pep file entry.
         """
 
-        pep_entry = self.pep.get_entry_record( offset )
+        header = self.parse_header( pep_entry['header'] )
 
         protein = {}
 
-        protein['identification'] = self.protein_identification( pep_entry['header'] )
-        protein['full_fasta_header'] = self.full_fasta_header( pep_entry['header'] )
-        protein['description'] = self.protein_description( pep_entry['header'] )
+        protein['identification'] = header['identification']
+        protein['full_fasta_header'] = header['full_fasta_header']
+        protein['description'] = header['description']
         protein['sequence'] = pep_entry['sequence']
+        protein['organism_code'] = header['organism_code']
+        protein['ec_numbers'] = header['ec_numbers']
 
         return protein 
 
+    def parse_header( self, header=None ):
+        """
+        Return every field of a Fasta header, extracted in a single pass.
+
+        That's the fast path of protein_identification, organism_code, full_fasta_header, protein_description,
+        ec_from_square_brackets, ec_from_brackets and ec_numbers: the header is split only once and the patterns are
+        compiled only once (at module level). The results are the same of those methods.
+
+        Args:
+            header(str): A Fasta header.
+
+        Returns:
+            (dict): Dictionary with 'identification', 'organism_code', 'full_fasta_header', 'description', 'ec_from_square_brackets', 'ec_from_brackets' and 'ec_numbers' keys.
+        """
+
+        instrumentation = self.pep.instrumentation
+
+        if instrumentation is not None:
+            started = time.perf_counter()
+
+        first_field, separator, description = header.partition(' ')
+
+        # Description: single spaces, no spaces at the beginning and at the end, no backslashes and no quotes.
+        if '  ' in description:
+            description = RE_SPACES.sub(' ', description)
+
+        if description[:1] == ' ':
+            description = description[1:]
+
+        if description[-1:] == ' ':
+            description = description[:-1]
+        elif description[-2:] == ' \n':
+            description = description[:-2] + '\n'
+
+        if '\\' in header or '"' in header:
+            description = description.replace('\\','').replace('"','')
+            full_fasta_header = header.replace('\\','').replace('"','')
+        else:
+            full_fasta_header = header
+
+        # EC numbers, surrounded by square brackets and brackets.
+        ec_square_brackets = []
+        ec_brackets = []
+
+        if '[EC:' in header:
+            ec_number_result = RE_EC_SQUARE_BRACKETS.search( header )
+
+            if ec_number_result:
+                ec_square_brackets = ec_number_result.group(1).split(' ')
+
+        if '(EC:' in header:
+            ec_number_result = RE_EC_BRACKETS.search( header )
+
+            if ec_number_result:
+                ec_brackets = ec_number_result.group(1).split(' ')
+
+        ec_numbers = []
+
+        for ec_number in ec_square_brackets + ec_brackets:
+            if ec_number not in ec_numbers:
+                ec_numbers.append( ec_number )
+
+        fields = {}
+
+        fields['identification'] = first_field.replace('>','').rstrip('\r\n').lower()
+        fields['organism_code'] = first_field.partition(':')[0].replace('>','')
+        fields['full_fasta_header'] = full_fasta_header
+        fields['description'] = description
+        fields['ec_from_square_brackets'] = ec_square_brackets
+        fields['ec_from_brackets'] = ec_brackets
+        fields['ec_numbers'] = ec_numbers
+
+        if instrumentation is not None:
+            instrumentation.add_time( 'header_parse', time.perf_counter() - started )
+            instrumentation.count( 'headers_parsed' )
+
+        return fields
+
+    def parse_parallel( self, workers=None, ordered=True, chunk_size=16777216 ):
+        """
+        Parse the whole pep file with many processes and yield every entry in a dictionary format.
+
+        The file is split in byte ranges aligned to the entries (see PEP.entries_ranges) and every range
+        is parsed by a process of the pool, with the same parsing of parsed_entry. Only a few ranges per process
+        are in flight at once, so memory use doesn't depend on the size of the file.
+
+        Like iter_parsed_entries, entries without sequence are left out.
+
+        Args:
+            workers(int): Number of processes (default is the number of CPUs).
+            ordered(boolean): Yield the entries in file order. Otherwise entries are yielded as soon as each range is parsed.
+            chunk_size(int): Approximate size of each range, in bytes.
+
+        Returns:
+            (generator): Dictionaries containing pep file entries.
+        """
+
+        workers = workers or os.cpu_count() or 1
+
+        ranges = iter( self.pep.entries_ranges( chunk_size ) )
+
+        pep_file = self.pep.file_to_parse
+        encoding = self.pep.encoding
+
+        with ProcessPoolExecutor( max_workers=workers ) as executor:
+
+            # Ranges submitted but not yielded yet, in file order. There are never more than two per process, so
+            # a consumer slower than the pool doesn't make the parsed ranges pile up in memory.
+            pending = deque()
+
+            def submit():
+                span = next( ranges, None )
+
+                if span is not None:
+                    pending.append( executor.submit( _parse_range, pep_file, encoding, span[0], span[1] ) )
+
+            for number in range( workers * 2 ):
+                submit()
+
+            while pending:
+                if ordered:
+                    future = pending.popleft()
+                else:
+                    done, not_done = wait( pending, return_when=FIRST_COMPLETED )
+
+                    future = done.pop()
+                    pending.remove( future )
+
+                proteins = future.result()
+
+                submit()
+
+                for protein in proteins:
+                    yield protein
+
     def protein_identification( self, header=None ):
         """
         Return the protein identification from a Fasta header.
@@ -104,11 +1263,11 @@ class PEPReader:
         protein_description = ' '.join( protein_description )
 
         # Change double white spaces by a single space.
-        protein_description = re.sub(r"\ {1,}", " ", protein_description)
+        protein_description = RE_SPACES.sub(" ", protein_description)
 
         # Remove white spaces at the beggining and at the end of the string.
-        protein_description = re.sub(r"^\ ", "", protein_description)
-        protein_description = re.sub(r"\ $", "", protein_description)
+        protein_description = RE_LEADING_SPACE.sub("", protein_description)
+        protein_description = RE_TRAILING_SPACE.sub("", protein_description)
 
         # Remove this fucker that ruined hours of data importing.
         protein_description = protein_description.replace('\\','')
@@ -133,9 +1292,7 @@ class PEPReader:
             (boolean):
         """
 
-        find_eC = re.compile('\[EC:')
-
-        if find_eC.search( header ):
+        if RE_HAS_EC_SQUARE_BRACKETS.search( header ):
             return True
         else:
             return False
@@ -156,9 +1313,7 @@ class PEPReader:
             (boolean):
         """
 
-        find_eC = re.compile('\(EC:')
-
-        if find_eC.search( header ):
+        if RE_HAS_EC_BRACKETS.search( header ):
             return True
         else:
             return False
@@ -179,10 +1334,8 @@ class PEPReader:
             (list): List of EC numbers identified in the Fasta header.
         """
 
-        re_ec_number = re.compile('^>.*\[EC:(.*)\]')
-
         if self.has_ec_from_square_brackets( header ):
-            ec_number_result = re_ec_number.search( header )
+            ec_number_result = RE_EC_SQUARE_BRACKETS.search( header )
             
             ec_number = ec_number_result.group(1)
             ec_number = ec_number.split(' ')
@@ -208,10 +1361,8 @@ class PEPReader:
             (list): List of EC numbers identified in the Fasta header.
         """
 
-        re_ec_number = re.compile('^>.*\(EC:(.*)\)')
-
         if self.has_ec_from_brackets( header ):
-            ec_number_result = re_ec_number.search( header )
+            ec_number_result = RE_EC_BRACKETS.search( header )
             
             ec_number = ec_number_result.group(1)
             ec_number = ec_number.split(' ')
@@ -223,6 +1374,131 @@ class PEPReader:
             return [] 
 
 
+    @staticmethod
+    def pep_files( paths=None ):
+        """
+        Returns the pep files of a directory, a glob pattern or a list of them.
+
+        Args:
+            paths(str|list): A directory (every '*.pep' file inside it), a glob pattern (like '/kegg/*.pep') or a list of paths, directories and patterns.
+
+        Returns:
+            (list): Paths of the pep files.
+        """
+
+        if isinstance( paths, str ):
+            paths = [ paths ]
+
+        pep_files = []
+
+        for path in paths:
+            if os.path.isdir( path ):
+                pep_files.extend( sorted( glob.glob( os.path.join( path, '*.pep' ) ) ) )
+            elif os.path.exists( path ):
+                pep_files.append( path )
+            else:
+                pep_files.extend( sorted( glob.glob( path ) ) )
+
+        return pep_files
+
+    @staticmethod
+    def read_many( paths=None, workers=None, progress=None, encoding='utf-8', batch_size=1024 ):
+        """
+        Parse many pep files (like the one file per organism of KEGG) with a process pool.
+
+        Larger files are scheduled first so the pool stays balanced, and entries are yielded in batches as each
+        file is parsed (see _read_file): only a couple of batches per process are in memory at once, not whole files.
+
+        A file that can't be parsed doesn't abort the batch: its error goes to the report and no more entries are
+        yielded for it (the ones of the batches already sent before the error are).
+
+        Example:
+
+            def show( report ):
+                print( report['pep_file'], report['entries'], report['error'] )
+
+            for pep_file, protein in PEPReader.read_many( '/kegg/organisms', workers=8, progress=show ):
+                pass
+
+        Args:
+            paths(str|list): A directory, a glob pattern or a list of them (see pep_files).
+            workers(int): Number of processes (default is the number of CPUs).
+            progress(function): Called with the report of every file as soon as it's finished. The report is a dictionary with 'pep_file', 'entries', 'bytes', 'seconds' (and so the throughput) and 'error' (None when the file was parsed).
+            encoding(str): Encoding of the pep files.
+            batch_size(int): Number of entries a process sends at once.
+
+        Returns:
+            (generator): ( pep_file, protein ) tuples, protein is a dictionary containing a pep file entry (same as parsed_entry).
+        """
+
+        pep_files = PEPReader.pep_files( paths )
+
+        # Largest first.
+        pep_files.sort( key=lambda pep_file: os.path.getsize( pep_file ) if os.path.exists( pep_file ) else 0, reverse=True )
+
+        workers = workers or os.cpu_count() or 1
+
+        with Manager() as manager, ProcessPoolExecutor( max_workers=workers ) as executor:
+            batches = manager.Queue( workers * 2 )
+            stop = manager.Event()
+
+            futures = [ executor.submit( _read_file, pep_file, encoding, batches, stop, batch_size ) for pep_file in pep_files ]
+
+            remaining = len( futures )
+
+            try:
+                while remaining:
+                    try:
+                        pep_file, proteins, report = batches.get( timeout=1 )
+                    except queue.Empty:
+                        # A process that died (errors of the files are reported, not raised) never sends its report.
+                        for future in futures:
+                            if future.done() and future.exception() is not None:
+                                raise future.exception()
+
+                        continue
+
+                    for protein in proteins:
+                        yield ( pep_file, protein )
+
+                    if report is not None:
+                        remaining = remaining - 1
+
+                        if progress is not None:
+                            progress( report )
+            finally:
+                # When the consumer stops early, the files not started are cancelled, the others stop at their next
+                # batch and the batches already waiting are dropped, so every process gets done.
+                stop.set()
+
+                for future in futures:
+                    future.cancel()
+
+                while not all( future.done() for future in futures ):
+                    try:
+                        batches.get( timeout=0.1 )
+                    except queue.Empty:
+                        pass
+
+    def ec_numbers( self, header=None ):
+        """
+        Return the list of EC numbers from a Fasta header, from both square brackets and brackets annotations.
+
+        Args:
+            header(str): A Fasta header.
+
+        Returns:
+            (list): List of EC numbers identified in the Fasta header, without repetitions.
+        """
+
+        ec_numbers = []
+
+        for ec_number in self.ec_from_square_brackets( header ) + self.ec_from_brackets( header ):
+            if ec_number not in ec_numbers:
+                ec_numbers.append( ec_number )
+
+        return ec_numbers 
+
     def organism_code( self, header=None ):
         """
         Returns the 3 (or more) letters organism code from a Fasta header.
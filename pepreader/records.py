@@ -0,0 +1,234 @@
+from array import array
+
+
+class RecordMapping:
+    """
+    Dictionary-like access to the attributes of a record (record['description'], record.get('sequence'), ...).
+
+    Subclasses list their keys in KEYS.
+    """
+
+    __slots__ = ()
+
+    KEYS = ()
+
+    def keys( self ):
+        return list( self.KEYS )
+
+    def __contains__( self, key ):
+        return key in self.KEYS
+
+    def __getitem__( self, key ):
+        if key not in self.KEYS:
+            raise KeyError( key )
+
+        return getattr( self, key )
+
+    def get( self, key, default=None ):
+        if key not in self.KEYS:
+            return default
+
+        return getattr( self, key )
+
+    def to_dict( self ):
+        """
+        Returns the record as a dictionary.
+
+        Returns:
+            (dict): Dictionary with every key of the record.
+        """
+
+        return { key: getattr( self, key ) for key in self.KEYS }
+
+    def __eq__( self, other ):
+        if isinstance( other, RecordMapping ):
+            other = other.to_dict()
+
+        return self.to_dict() == other
+
+
+class PEPRecord( RecordMapping ):
+    """
+    Compact pep entry: the fields of PEPReader.parsed_entry in __slots__ instead of a dictionary.
+
+    Attributes:
+        identification(str): Protein identification.
+        full_fasta_header(str): The full header.
+        description(str): Protein description.
+        sequence(str): Protein sequence.
+        organism_code(str): Organism code.
+        ec_numbers(list): EC numbers.
+    """
+
+    __slots__ = ( 'identification', 'full_fasta_header', 'description', 'sequence', 'organism_code', 'ec_numbers' )
+
+    KEYS = ( 'identification', 'full_fasta_header', 'description', 'sequence', 'organism_code', 'ec_numbers' )
+
+    def __init__( self, identification=None, full_fasta_header=None, description=None, sequence=None, organism_code=None, ec_numbers=None ):
+        self.identification = identification
+        self.full_fasta_header = full_fasta_header
+        self.description = description
+        self.sequence = sequence
+        self.organism_code = organism_code
+        self.ec_numbers = ec_numbers
+
+    def __repr__( self ):
+        return 'PEPRecord(%r)' % self.identification
+
+
+class PEPBatch:
+    """
+    Columnar container of many raw pep entries (header and sequence), for bulk mode.
+
+    Instead of one dictionary and two strings per entry, every header goes to one contiguous bytes buffer and every
+    sequence to another one, with an offset array for each. An entry costs its bytes plus 16 bytes of offsets.
+
+    Entries are decoded only when they're accessed: batch[i] returns the same dictionary of PEP.parse_file.
+
+    Attributes:
+        encoding(str): Encoding of the headers and sequences.
+        headers(bytearray): Every header, concatenated.
+        sequences(bytearray): Every sequence, concatenated.
+        header_offsets(array): Boundaries of the headers inside headers (number of entries + 1).
+        sequence_offsets(array): Boundaries of the sequences inside sequences (number of entries + 1).
+    """
+
+    def __init__( self, encoding='utf-8' ):
+        self.encoding = encoding
+
+        self.headers = bytearray()
+        self.sequences = bytearray()
+
+        self.header_offsets = array( 'Q', [ 0 ] )
+        self.sequence_offsets = array( 'Q', [ 0 ] )
+
+    def append( self, header=None, sequence=None ):
+        """
+        Add an entry to the batch.
+
+        Args:
+            header(bytes): The raw header, without the line break.
+            sequence(bytes): The raw sequence, without line breaks.
+        """
+
+        self.headers += header
+        self.sequences += sequence
+
+        self.header_offsets.append( len( self.headers ) )
+        self.sequence_offsets.append( len( self.sequences ) )
+
+    def __len__( self ):
+        return len( self.header_offsets ) - 1
+
+    def header( self, entry=None ):
+        """
+        Returns the header of an entry.
+
+        Args:
+            entry(int): Entry number inside the batch.
+
+        Returns:
+            (str): The header.
+        """
+
+        return self.headers[ self.header_offsets[ entry ]:self.header_offsets[ entry + 1 ] ].decode( self.encoding )
+
+    def sequence( self, entry=None ):
+        """
+        Returns the sequence of an entry.
+
+        Args:
+            entry(int): Entry number inside the batch.
+
+        Returns:
+            (str): The sequence.
+        """
+
+        return self.sequences[ self.sequence_offsets[ entry ]:self.sequence_offsets[ entry + 1 ] ].decode( self.encoding )
+
+    def __getitem__( self, entry ):
+        if entry < 0:
+            entry = entry + len( self )
+
+        if entry < 0 or entry >= len( self ):
+            raise IndexError( entry )
+
+        return { 'header': self.header( entry ), 'sequence': self.sequence( entry ) }
+
+    def __iter__( self ):
+        for entry in range( len( self ) ):
+            yield self[ entry ]
+
+    def nbytes( self ):
+        """
+        Returns the memory used by the buffers and offsets of the batch, in bytes.
+
+        Returns:
+            (int): Size in bytes.
+        """
+
+        offsets = ( len( self.header_offsets ) + len( self.sequence_offsets ) ) * self.header_offsets.itemsize
+
+        return len( self.headers ) + len( self.sequences ) + offsets
+
+
+class LazyRecord( RecordMapping ):
+    """
+    Pep entry with the header already parsed but the sequence read only when it's used.
+
+    Only the position and the size of the entry are kept: the sequence is read (and assembled) from the pep
+    file at the first time the 'sequence' attribute is touched. So passes that only need the headers
+    (like building EC to gene maps) don't read, decode or keep any sequence.
+
+    The record also works like the dictionary returned by PEPReader.parsed_entry (record['description'], record.get('sequence'), ...).
+
+    Attributes:
+        identification(str): Protein identification.
+        full_fasta_header(str): The full header.
+        description(str): Protein description.
+        organism_code(str): Organism code.
+        ec_numbers(list): EC numbers.
+        offset(int): Position of the entry in the pep file.
+        length(int): Size of the entry, in bytes.
+    """
+
+    __slots__ = ( 'identification', 'full_fasta_header', 'description', 'organism_code', 'ec_numbers', 'offset', 'length', '_pep', '_sequence' )
+
+    KEYS = ( 'identification', 'full_fasta_header', 'description', 'sequence', 'organism_code', 'ec_numbers' )
+
+    def __init__( self, pep=None, offset=None, length=None, header=None ):
+        self.identification = header['identification']
+        self.full_fasta_header = header['full_fasta_header']
+        self.description = header['description']
+        self.organism_code = header['organism_code']
+        self.ec_numbers = header['ec_numbers']
+
+        self.offset = offset
+        self.length = length
+
+        self._pep = pep
+        self._sequence = None
+
+    @property
+    def sequence( self ):
+        """
+        The sequence, read from the pep file at the first access.
+        """
+
+        if self._sequence is None:
+            self._sequence = self._pep.entry_record( self._pep.read_span( self.offset, self.length ) )['sequence']
+
+        return self._sequence
+
+    def is_sequence_loaded( self ):
+        """
+        Return True if the sequence was already read from the pep file.
+
+        Returns:
+            (boolean):
+        """
+
+        return self._sequence is not None
+
+    def __repr__( self ):
+        return 'LazyRecord(%r, offset=%d, length=%d)' % ( self.identification, self.offset, self.length )
@@ -0,0 +1,232 @@
+import os
+import sqlite3
+import hashlib
+import tempfile
+from itertools import groupby
+
+
+def sequence_digest( sequence=None ):
+    """
+    Returns the content hash of a sequence.
+
+    Only the residues count: the header, the line breaks and the line width aren't part of the hash, so the same
+    protein of two strains (or wrapped in a different line width) has the same hash.
+
+    Args:
+        sequence(bytes): The raw sequence, line breaks are removed here.
+
+    Returns:
+        (bytes): 128 bits hash.
+    """
+
+    return hashlib.blake2b( sequence.replace( b'\n', b'' ).replace( b'\r', b'' ), digest_size=16 ).digest()
+
+
+class SequenceIndex:
+    """
+    Sequence hash to identifications index of a pep file, in bounded memory.
+
+    Entries are kept in memory (a dictionary from the hash to the entries with that sequence) until there are
+    max_entries of them. From there on everything is moved to a temporary sqlite database, which sorts and groups
+    on disk, so memory use doesn't grow with the size of the pep file.
+
+    Groups come out in the order of their first entry, the same order of a pass through the pep file, so the
+    sequences can be read in a second sequential pass (see PEPReader.iter_unique_sequences).
+
+    Example:
+
+        with SequenceIndex() as index:
+            for offset, identification, sequence in entries:
+                index.add( sequence_digest( sequence ), offset, identification )
+
+            for digest, entries in index.iter_groups():
+                print( digest.hex(), [ identification for offset, identification in entries ] )
+
+    Attributes:
+        max_entries(int): Number of entries kept in memory before moving to disk.
+        directory(str): Directory of the temporary database (default is the system temporary directory).
+        entries(int): Number of entries added.
+        database_file(str): Path of the temporary database, None while everything is in memory.
+    """
+
+    # Rows inserted at once into the database.
+    BATCH_SIZE = 65536
+
+    def __init__( self, max_entries=1000000, directory=None ):
+        self.max_entries = max_entries
+        self.directory = directory
+
+        self.entries = 0
+        self.database_file = None
+
+        self.groups = {}
+        self.pending = []
+        self.indexed = False
+
+        self._connection = None
+
+    def __enter__( self ):
+        return self
+
+    def __exit__( self, *exc_info ):
+        self.close()
+
+    def add( self, digest=None, offset=None, identification=None ):
+        """
+        Add an entry to the index.
+
+        Entries must be added in file order.
+
+        Args:
+            digest(bytes): Hash of the sequence of the entry (see sequence_digest).
+            offset(int): Position of the entry.
+            identification(str): Identification of the entry.
+        """
+
+        self.entries = self.entries + 1
+
+        if self._connection is None:
+            entries = self.groups.get( digest )
+
+            if entries is None:
+                self.groups[ digest ] = [ ( offset, identification ) ]
+            else:
+                entries.append( ( offset, identification ) )
+
+            if self.entries > self.max_entries:
+                self.spill()
+
+            return
+
+        self.pending.append( ( digest, offset, identification ) )
+
+        if len( self.pending ) >= self.BATCH_SIZE:
+            self.flush()
+
+    def spill( self ):
+        """
+        Move the entries kept in memory to the temporary database, the next entries go straight to it.
+        """
+
+        handle, self.database_file = tempfile.mkstemp( suffix='.sqlite', dir=self.directory )
+        os.close( handle )
+
+        self._connection = sqlite3.connect( self.database_file )
+
+        # A scratch database: nothing has to survive a crash.
+        self._connection.execute( 'PRAGMA journal_mode = OFF' )
+        self._connection.execute( 'PRAGMA synchronous = OFF' )
+        self._connection.execute( 'PRAGMA temp_store = FILE' )
+        self._connection.execute( 'CREATE TABLE entries ( digest BLOB, offset INTEGER, identification TEXT )' )
+
+        for digest, entries in self.groups.items():
+            self.pending.extend( ( digest, offset, identification ) for offset, identification in entries )
+
+            if len( self.pending ) >= self.BATCH_SIZE:
+                self.flush()
+
+        self.groups = {}
+
+        self.flush()
+
+    def flush( self ):
+        """
+        Write the pending entries to the temporary database.
+        """
+
+        if self.pending:
+            self._connection.executemany( 'INSERT INTO entries VALUES ( ?, ?, ? )', self.pending )
+            self._connection.commit()
+
+            self.pending = []
+
+    def finish( self ):
+        """
+        Write the pending entries and index them by hash (only once, after the last entry is added).
+        """
+
+        if self._connection is None or self.indexed:
+            return
+
+        self.flush()
+
+        self._connection.execute( 'CREATE INDEX entries_digest ON entries ( digest, offset )' )
+        self._connection.commit()
+
+        self.indexed = True
+
+    def count( self ):
+        """
+        Returns the number of different sequences.
+
+        Returns:
+            (int):
+        """
+
+        if self._connection is None:
+            return len( self.groups )
+
+        self.finish()
+
+        return self._connection.execute( 'SELECT COUNT( DISTINCT digest ) FROM entries' ).fetchone()[0]
+
+    def get( self, digest=None ):
+        """
+        Returns the entries with a sequence.
+
+        Args:
+            digest(bytes): Hash of the sequence (see sequence_digest).
+
+        Returns:
+            (list): [ ( offset, identification ) ] in file order (empty when there's no entry with that sequence).
+        """
+
+        if self._connection is None:
+            return list( self.groups.get( digest, [] ) )
+
+        self.finish()
+
+        return self._connection.execute( 'SELECT offset, identification FROM entries WHERE digest = ? ORDER BY offset', ( digest, ) ).fetchall()
+
+    def iter_groups( self ):
+        """
+        Yield every sequence hash and the entries with that sequence, in the order of the first entry of each group.
+
+        Returns:
+            (generator): ( digest, [ ( offset, identification ) ] ) tuples, the entries of a group are in file order.
+        """
+
+        if self._connection is None:
+            for digest, entries in self.groups.items():
+                yield ( digest, entries )
+
+            return
+
+        self.finish()
+
+        rows = self._connection.execute(
+            'SELECT entries.digest, entries.offset, entries.identification FROM entries '
+            'JOIN ( SELECT digest, MIN( offset ) AS first FROM entries GROUP BY digest ) AS firsts USING ( digest ) '
+            'ORDER BY firsts.first, entries.offset'
+        )
+
+        for digest, group in groupby( rows, key=lambda row: row[0] ):
+            yield ( digest, [ ( row[1], row[2] ) for row in group ] )
+
+    def close( self ):
+        """
+        Drop the index and remove the temporary database (if there's one).
+        """
+
+        self.groups = {}
+        self.pending = []
+
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+        if self.database_file is not None:
+            os.remove( self.database_file )
+            self.database_file = None
+
+        self.indexed = False
@@ -0,0 +1,187 @@
+import io
+import time
+import cProfile
+import threading
+from contextlib import contextmanager
+
+
+class Stats:
+    """
+    Counters and cumulative timers of the parse pipeline (file reads, boundary scans, sequence assembly and header parsing).
+
+    Instrumentation is opt-in: PEP and PEPReader only record anything when they're given a Stats object, otherwise
+    every instrumented spot costs a single 'is not None' test.
+
+    Counters:
+
+    * reads, bytes_read: random access reads (see PEP.read_span) and blocks of the sequential reads (see CountedReader), and the bytes they read.
+    * scans, bytes_scanned, entries_scanned: boundary scans (see PEP.generate_entries_position).
+    * entries_parsed, sequence_bytes: entries assembled (header and whole sequence) and the size of their sequences.
+    * headers_parsed: headers parsed by PEPReader.
+
+    Timers (seconds): read, scan, sequence_assembly, header_parse.
+
+    Example:
+
+        stats = Stats()
+        pepreader = PEPReader( pep=PEP( 'genes.pep', instrumentation=stats ) )
+
+        entries = list( pepreader.iter_parsed_entries() )
+
+        print( pepreader.stats() )
+
+    It's safe to use it from many threads.
+
+    Attributes:
+        counters(dict): Value of every counter.
+        timers(dict): Cumulative time of every timer, in seconds.
+        callback(function): Called with ( name, value ) at every update (value is the increment or the time spent), or None.
+    """
+
+    def __init__( self, callback=None ):
+        self.counters = {}
+        self.timers = {}
+        self.callback = callback
+
+        self.lock = threading.Lock()
+
+    def count( self, name=None, value=1 ):
+        """
+        Add value to a counter.
+
+        Args:
+            name(str): Name of the counter.
+            value(int): Increment.
+        """
+
+        with self.lock:
+            self.counters[ name ] = self.counters.get( name, 0 ) + value
+
+        if self.callback is not None:
+            self.callback( name, value )
+
+    def add_time( self, name=None, seconds=None ):
+        """
+        Add time to a timer.
+
+        Args:
+            name(str): Name of the timer.
+            seconds(float): Time spent.
+        """
+
+        with self.lock:
+            self.timers[ name ] = self.timers.get( name, 0.0 ) + seconds
+
+        if self.callback is not None:
+            self.callback( name, seconds )
+
+    @contextmanager
+    def timer( self, name=None ):
+        """
+        Time a block of code (context manager).
+
+        Args:
+            name(str): Name of the timer.
+        """
+
+        started = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            self.add_time( name, time.perf_counter() - started )
+
+    def snapshot( self ):
+        """
+        Returns a copy of the counters and the timers.
+
+        Returns:
+            (dict): { 'counters': { name: value }, 'timers': { name: seconds } }
+        """
+
+        with self.lock:
+            return { 'counters': dict( self.counters ), 'timers': dict( self.timers ) }
+
+    def reset( self ):
+        """
+        Set every counter and timer back to zero.
+        """
+
+        with self.lock:
+            self.counters.clear()
+            self.timers.clear()
+
+
+class CountedReader( io.RawIOBase ):
+    """
+    Raw file object that records the reads of another binary file object in a Stats object.
+
+    Wrapped in an io.BufferedReader (see PEP.open_stream), the reads are recorded once per block of the buffer, not once
+    per line: the counters are reads and bytes_read and the timer is read (decompression is part of the read).
+
+    Attributes:
+        stream(file): Binary file object being read.
+        stats(Stats): Where the reads are recorded.
+    """
+
+    def __init__( self, stream=None, stats=None ):
+        self.stream = stream
+        self.stats = stats
+
+    def readable( self ):
+        return True
+
+    def seekable( self ):
+        return self.stream.seekable()
+
+    def tell( self ):
+        return self.stream.tell()
+
+    def seek( self, offset, whence=0 ):
+        return self.stream.seek( offset, whence )
+
+    def readinto( self, buffer ):
+        started = time.perf_counter()
+
+        size = self.stream.readinto( buffer )
+
+        self.stats.add_time( 'read', time.perf_counter() - started )
+        self.stats.count( 'reads' )
+        self.stats.count( 'bytes_read', size )
+
+        return size
+
+    def close( self ):
+        if not self.closed:
+            self.stream.close()
+
+        super().close()
+
+
+@contextmanager
+def profile( profile_file=None ):
+    """
+    Run a block of code under cProfile and write the pstats dump when it ends (context manager).
+
+    The dump can be read with pstats (pstats.Stats( profile_file ).sort_stats( 'cumulative' ).print_stats( 20 )) or tools like snakeviz.
+
+    Example:
+
+        with profile( 'import.prof' ):
+            pepreader.export_columns( 'genes.pepc' )
+
+    Args:
+        profile_file(str): Path of the pstats dump.
+
+    Returns:
+        (cProfile.Profile): The profiler.
+    """
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        profiler.dump_stats( profile_file )
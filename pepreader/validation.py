@@ -0,0 +1,427 @@
+import os
+import re
+
+# IUPAC amino acid codes (the 20 standard ones, B, J, O, U, X and Z) and '*' (stop).
+PROTEIN_ALPHABET = b'ABCDEFGHIJKLMNOPQRSTUVWXYZ*'
+
+ISSUE_TYPES = ( 'no_header', 'empty_identification', 'header_characters', 'duplicate_identification', 'empty_sequence', 'invalid_characters' )
+
+# Every pattern starts with the '\\n>' literal, which the regular expression engine searches for fast: the header
+# at the beginning of a range is checked apart.
+
+# Header lines (but the first one).
+RE_HEADER = re.compile( rb'\n(>[^\n]*)' )
+
+# Identification of every header but the first one (the first field, without the '>').
+RE_IDENTIFICATION = re.compile( rb'\n>([^ \r\n]*)' )
+
+# A header followed by another header (blank lines between them don't count).
+RE_EMPTY_ENTRY = re.compile( rb'\n>[^\n]*\n[\r\n]*(?=>)' )
+
+
+class Validator:
+    """
+    Validation pass over a pep file, at about the speed of a plain read of the file.
+
+    The file is read in large ranges aligned to the entries (see PEP.entries_ranges) and every check is a bulk
+    bytes operation over a whole entry: the alphabet check is a single bytes.translate that deletes every valid
+    byte, whatever is left is invalid. Nothing is decoded unless there's an issue to report.
+
+    Issues (every issue is a dictionary with its 'type', the 'offset' of the entry and its 'identification'):
+
+    * no_header: data before the first header (offset 0, no identification).
+    * empty_identification: a header without identification ('>' alone or followed by a space).
+    * header_characters: backslashes or quotes in the header ('characters').
+    * duplicate_identification: an identification already seen ('first_offset' is the offset of the first entry with it).
+    * empty_sequence: an entry without sequence.
+    * invalid_characters: sequence characters out of the alphabet ('characters' and 'position', the offset of the first one).
+
+    Example:
+
+        report = Validator( PEP( 'genes.pep' ) ).report()
+
+        for issue in report['issues']:
+            print( issue['type'], issue['offset'], issue['identification'] )
+
+    Attributes:
+        pep(PEP): The pep file.
+        alphabet(bytes): Valid sequence characters.
+        chunk_size(int): Approximate size of the ranges read at once, in bytes.
+        entries(int): Number of entries checked (after a pass).
+        size(int): Number of bytes checked (after a pass).
+        clean_ranges(dict): { position: end } of the clean ranges whose identifications still have the position of the range (see locate).
+    """
+
+    def __init__( self, pep=None, alphabet=PROTEIN_ALPHABET, chunk_size=16777216 ):
+        self.pep = pep
+        self.alphabet = alphabet
+        self.chunk_size = chunk_size
+
+        self.entries = 0
+        self.size = 0
+
+        # { position: end } of the clean ranges whose identifications have the position of the range (see locate).
+        self.clean_ranges = {}
+
+        # Bytes deleted by translate: whatever is left of a sequence is out of the alphabet.
+        self.valid_bytes = alphabet + b'\r\n'
+
+        # Bytes deleted by translate to repair a sequence: every byte out of the alphabet (line breaks are kept).
+        self.invalid_bytes = bytes( byte for byte in range( 256 ) if byte not in self.valid_bytes )
+
+    def iter_ranges( self ):
+        """
+        Yield the pep file in large ranges aligned to the entries, in file order.
+
+        Returns:
+            (generator): ( start, data ) tuples, data before the first header has its own range (at 0, not starting with '>').
+        """
+
+        pep = self.pep
+
+        ranges = pep.entries_ranges( self.chunk_size )
+
+        first = ranges[0][0] if ranges else pep.data_size()
+
+        if first > 0:
+            yield ( 0, pep.read_span( 0, first ) )
+
+        for start, end in ranges:
+            yield ( start, pep.read_span( start, end - start ) )
+
+    def split_entries( self, start=None, data=None ):
+        """
+        Yield the raw entries of a range.
+
+        Args:
+            start(int): Position of the range.
+            data(bytes): The range.
+
+        Returns:
+            (generator): ( offset, raw entry ) tuples.
+        """
+
+        find = data.find
+        begin = 0
+
+        while begin < len( data ):
+            found = find( b'\n>', begin )
+
+            if found == -1:
+                found = len( data )
+            else:
+                found = found + 1
+
+            yield ( start + begin, data[ begin:found ] )
+
+            begin = found
+
+    def clean_range( self, data=None, identifications=None, start=None ):
+        """
+        Check a whole range at once, with bulk operations only (no loop over its entries).
+
+        When the range is clean its identifications are added to identifications with the position of the range
+        (see locate), and the range to clean_ranges.
+
+        Args:
+            data(bytes): The range, starting at a header.
+            identifications(dict): { raw identification: position } of the entries already checked.
+            start(int): Position of the range.
+
+        Returns:
+            (boolean): True when no entry of the range has an issue, False when the range has to be checked entry by entry.
+        """
+
+        # Backslashes and quotes can't be in a clean range: they aren't valid sequence characters either.
+        if b'\\' in data or b'"' in data:
+            return False
+
+        first_line_end = data.find( b'\n' )
+
+        # The first entry: a header alone or a header right before another header.
+        if first_line_end == -1 or data[ first_line_end + 1:first_line_end + 2 ] in ( b'', b'>', b'\r', b'\n' ):
+            return False
+
+        if RE_EMPTY_ENTRY.search( data ):
+            return False
+
+        # The last entry: a header at the end of the range.
+        last_header = data.rfind( b'\n>' )
+
+        if last_header != -1:
+            last_line_end = data.find( b'\n', last_header + 1 )
+
+            if last_line_end == -1 or not data[ last_line_end + 1: ].strip( b'\r\n' ):
+                return False
+
+        first_header = data[ :first_line_end ]
+
+        # Every byte left by translate is either in a header or an invalid sequence character.
+        headers = first_header + b''.join( RE_HEADER.findall( data ) )
+
+        if len( data.translate( None, self.valid_bytes ) ) != len( headers.translate( None, self.valid_bytes ) ):
+            return False
+
+        raw_identifications = ( first_header[ 1: ].split( b' ', 1 )[0].rstrip( b'\r' ) + b'\n' + b'\n'.join( RE_IDENTIFICATION.findall( data ) ) ).lower().split( b'\n' )
+
+        # A single entry: no identification found by the pattern.
+        if last_header == -1:
+            raw_identifications.pop()
+
+        if b'' in raw_identifications:
+            return False
+
+        unique = set( raw_identifications )
+
+        if len( unique ) != len( raw_identifications ) or not identifications.keys().isdisjoint( unique ):
+            return False
+
+        identifications.update( dict.fromkeys( raw_identifications, start ) )
+
+        self.clean_ranges[ start ] = start + len( data )
+
+        self.entries = self.entries + len( raw_identifications )
+
+        return True
+
+    def locate( self, identifications=None, raw_identification=None ):
+        """
+        Returns the position of the first entry with an identification.
+
+        Clean ranges keep the position of the range for their identifications, not the position of every entry
+        (see clean_range). The first time an entry of a clean range has to be reported, the whole range is read
+        again and every identification of it gets the position of its entry, so a range is read again once at
+        most, no matter how many duplicates point to it.
+
+        Args:
+            identifications(dict): { raw identification: position } of the entries already checked.
+            raw_identification(bytes): Identification (lower case).
+
+        Returns:
+            (int): Position of the entry.
+        """
+
+        position = identifications[ raw_identification ]
+
+        end = self.clean_ranges.pop( position, None )
+
+        if end is not None:
+            data = self.pep.read_span( position, end - position )
+
+            identifications[ data[ 1: ].split( b'\n', 1 )[0].split( b' ', 1 )[0].rstrip( b'\r' ).lower() ] = position
+
+            for match in RE_IDENTIFICATION.finditer( data ):
+                identifications[ match.group( 1 ).lower() ] = position + match.start() + 1
+
+        return identifications[ raw_identification ]
+
+    def iter_checked_entries( self ):
+        """
+        Yield every raw entry with its issues, in file order.
+
+        Ranges without any issue (see clean_range) are yielded whole, as a single raw entry without header.
+
+        Returns:
+            (generator): ( offset, raw entry, raw header, raw sequence, issues ) tuples, issues is a list (empty for a valid entry).
+        """
+
+        identifications = {}
+        first_offset = identifications.setdefault
+
+        encoding = self.pep.encoding
+        valid_bytes = self.valid_bytes
+
+        self.entries = 0
+        self.size = 0
+        self.clean_ranges = {}
+
+        for start, data in self.iter_ranges():
+            self.size = self.size + len( data )
+
+            if not data.startswith( b'>' ):
+                if data.strip():
+                    yield ( start, data, None, data, [ { 'type': 'no_header', 'offset': start, 'identification': None } ] )
+
+                continue
+
+            if self.clean_range( data, identifications, start ):
+                yield ( start, data, None, None, [] )
+                continue
+
+            for offset, raw_entry in self.split_entries( start, data ):
+                self.entries = self.entries + 1
+
+                issues = []
+
+                raw_header, line_break, raw_sequence = raw_entry.partition( b'\n' )
+                raw_header = raw_header.rstrip( b'\r' )
+
+                raw_identification = raw_header[ 1: ].split( b' ', 1 )[0].lower()
+
+                # Decoded only for the issues.
+                identification = None
+
+                if not raw_identification:
+                    identification = ''
+
+                    issues.append( { 'type': 'empty_identification', 'offset': offset, 'identification': identification } )
+
+                elif first_offset( raw_identification, offset ) != offset:
+                    identification = raw_identification.decode( encoding, 'replace' )
+
+                    issues.append( { 'type': 'duplicate_identification', 'offset': offset, 'identification': identification, 'first_offset': self.locate( identifications, raw_identification ) } )
+
+                if b'\\' in raw_header or b'"' in raw_header:
+                    if identification is None:
+                        identification = raw_identification.decode( encoding, 'replace' )
+
+                    characters = ''.join( character for character in '\\"' if character.encode() in raw_header )
+
+                    issues.insert( 0, { 'type': 'header_characters', 'offset': offset, 'identification': identification, 'characters': characters } )
+
+                if not raw_sequence.strip( b'\r\n' ):
+                    if identification is None:
+                        identification = raw_identification.decode( encoding, 'replace' )
+
+                    issues.append( { 'type': 'empty_sequence', 'offset': offset, 'identification': identification } )
+                else:
+                    invalid = raw_sequence.translate( None, valid_bytes )
+
+                    if invalid:
+                        if identification is None:
+                            identification = raw_identification.decode( encoding, 'replace' )
+
+                        characters = set( invalid )
+
+                        # Only the characters found are searched for, to point to the first one.
+                        position = min( raw_sequence.find( bytes( [ character ] ) ) for character in characters )
+
+                        issues.append( {
+                            'type': 'invalid_characters',
+                            'offset': offset,
+                            'identification': identification,
+                            'characters': bytes( sorted( characters ) ).decode( encoding, 'replace' ),
+                            'position': offset + len( raw_entry ) - len( raw_sequence ) + position,
+                        } )
+
+                yield ( offset, raw_entry, raw_header, raw_sequence, issues )
+
+    def iter_issues( self ):
+        """
+        Yield every issue of the pep file, in file order.
+
+        Returns:
+            (generator): Issue dictionaries.
+        """
+
+        for offset, raw_entry, raw_header, raw_sequence, issues in self.iter_checked_entries():
+            for issue in issues:
+                yield issue
+
+    def summary( self, issues=None, max_issues=10000 ):
+        """
+        Returns a validation report from the issues of a pass.
+
+        Args:
+            issues(iterable): Issue dictionaries, in file order.
+            max_issues(int): Maximum number of issues kept in the report (None keeps every issue). The counts include every issue.
+
+        Returns:
+            (dict): 'pep_file', 'entries', 'bytes', 'valid' (True when there's no issue), 'counts' (number of issues of every type) and 'issues' (issue dictionaries, in file order).
+        """
+
+        counts = { issue_type: 0 for issue_type in ISSUE_TYPES }
+        kept = []
+
+        for issue in issues:
+            counts[ issue['type'] ] = counts[ issue['type'] ] + 1
+
+            if max_issues is None or len( kept ) < max_issues:
+                kept.append( issue )
+
+        return {
+            'pep_file': self.pep.file_to_parse,
+            'entries': self.entries,
+            'bytes': self.size,
+            'valid': not any( counts.values() ),
+            'counts': counts,
+            'issues': kept,
+        }
+
+    def report( self, max_issues=10000 ):
+        """
+        Returns the validation report of the pep file (see summary).
+
+        Args:
+            max_issues(int): Maximum number of issues kept in the report (None keeps every issue).
+
+        Returns:
+            (dict): The validation report.
+        """
+
+        return self.summary( self.iter_issues(), max_issues )
+
+    def repair( self, target_file=None, max_issues=10000 ):
+        """
+        Write a repaired copy of the pep file.
+
+        Data before the first header, entries without identification, entries without sequence (or with invalid
+        characters only) and repeated identifications (the first entry is kept) are left out. Backslashes and quotes are removed from the
+        headers and characters out of the alphabet from the sequences. Valid entries are copied byte for byte.
+
+        Args:
+            target_file(str): Path of the repaired pep file (it can't be the pep file itself).
+            max_issues(int): Maximum number of issues kept in the report (None keeps every issue).
+
+        Returns:
+            (dict): The validation report of the original pep file, every issue in it was repaired (see summary).
+        """
+
+        if os.path.abspath( target_file ) == os.path.abspath( self.pep.file_to_parse ):
+            raise ValueError( "The repaired file can't be the pep file itself: " + target_file )
+
+        with open( target_file, 'wb' ) as target:
+            return self.summary( self.iter_repaired_issues( target ), max_issues )
+
+    def iter_repaired_issues( self, target=None ):
+        """
+        Write the repaired entries to target and yield the issues repaired, in file order (see repair).
+
+        Args:
+            target(file): Binary file object of the repaired pep file.
+
+        Returns:
+            (generator): Issue dictionaries.
+        """
+
+        # Entries with these issues can't be repaired, they're left out.
+        dropped = ( 'no_header', 'empty_identification', 'duplicate_identification', 'empty_sequence' )
+
+        for offset, raw_entry, raw_header, raw_sequence, issues in self.iter_checked_entries():
+            if not issues:
+                target.write( raw_entry )
+
+                # The last entry of the file may have no line break.
+                if not raw_entry.endswith( b'\n' ):
+                    target.write( b'\n' )
+
+                continue
+
+            for issue in issues:
+                yield issue
+
+            issue_types = set( issue['type'] for issue in issues )
+
+            if issue_types.intersection( dropped ):
+                continue
+
+            if 'header_characters' in issue_types:
+                raw_header = raw_header.replace( b'\\', b'' ).replace( b'"', b'' )
+
+            lines = [ line for line in raw_sequence.translate( None, self.invalid_bytes ).splitlines() if line ]
+
+            # Nothing left of the sequence: the entry is left out.
+            if not lines:
+                continue
+
+            target.write( raw_header + b'\n' + b'\n'.join( lines ) + b'\n' )
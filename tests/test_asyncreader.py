@@ -0,0 +1,67 @@
+import sys
+import os
+import unittest
+from pepreader.asyncreader import *
+from pepreader.pepreader import *
+from pepreader.pep import *
+import asyncio
+import tempfile
+
+
+class TestAsyncPEPReader( unittest.TestCase ):
+
+    def setUp( self ):
+
+        with tempfile.NamedTemporaryFile( mode='w', suffix='.pep', delete=False ) as f:
+            for entry in range( 50 ):
+                f.write( '>hsa:%d  GENE%d; protein\nMKWVTFLL%s\nLLFISGSAFS\n' % ( entry, entry, 'A' * entry ) )
+
+        self.pep_file = f.name
+        self.pepreader = PEPReader( pep=PEP( self.pep_file ) )
+
+    def tearDown( self ):
+
+        self.pepreader.close()
+        os.remove( self.pep_file )
+
+    def test_parsed_entry( self ):
+
+        async def lookup():
+            async with AsyncPEPReader( self.pepreader, max_workers=4 ) as reader:
+                positions = await reader.run( self.pepreader.entries_position )
+
+                entries = await asyncio.gather( *[ reader.parsed_entry( positions[ entry % 50 ] ) for entry in range( 1000 ) ] )
+
+                self.assertEqual( reader.pending, {} )
+
+                return entries
+
+        entries = asyncio.run( lookup() )
+
+        self.assertEqual( entries[7]['identification'], 'hsa:7' )
+        self.assertEqual( entries[57]['sequence'], 'MKWVTFLL' + 'A' * 7 + 'LLFISGSAFS' )
+        # Concurrent requests for the same entry are merged.
+        self.assertTrue( entries[7] is entries[57] )
+
+    def test_get_many( self ):
+
+        async def lookup():
+            async with AsyncPEPReader( self.pepreader ) as reader:
+                return ( await reader.get_many( [ 'hsa:30', 'hsa:100', 'hsa:2' ] ), await reader.get_by_identification( 'hsa:4' ) )
+
+        entries, entry = asyncio.run( lookup() )
+
+        self.assertEqual( [ entry and entry['identification'] for entry in entries ], [ 'hsa:30', None, 'hsa:2' ] )
+        self.assertEqual( entry['identification'], 'hsa:4' )
+
+    def test_aiter_entries( self ):
+
+        async def read_all():
+            async with AsyncPEPReader( self.pepreader ) as reader:
+                return [ entry async for entry in reader.aiter_entries( batch_size=7 ) ]
+
+        self.assertEqual( asyncio.run( read_all() ), list( PEPReader( pep=PEP( self.pep_file ) ).iter_parsed_entries() ) )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import sys
+import os
+import time
+import unittest
+from pepreader.cache import *
+import tempfile
+
+
+class TestEntryCache( unittest.TestCase ):
+
+    def setUp( self ):
+
+        with tempfile.NamedTemporaryFile( mode='w', suffix='.pep', delete=False ) as f:
+            f.write( '>hsa:1  A\nMKV\n' )
+
+        self.pep_file = f.name
+
+        self.entries = [ { 'identification': 'hsa:%d' % entry, 'sequence': 'M' * 100 } for entry in range( 4 ) ]
+
+        entry_size = EntryCache( self.pep_file ).entry_size( self.entries[0] )
+
+        self.cache = EntryCache( self.pep_file, max_bytes=entry_size * 2 )
+
+    def tearDown( self ):
+
+        os.remove( self.pep_file )
+
+    def test_lru_eviction( self ):
+
+        self.cache.put( 0, self.entries[0] )
+        self.cache.put( 10, self.entries[1] )
+
+        self.assertTrue( self.cache.get( 0 ) is self.entries[0] )
+
+        self.cache.put( 20, self.entries[2] )
+
+        self.assertEqual( self.cache.get( 10 ), None )
+        self.assertEqual( self.cache.get( 0 ), self.entries[0] )
+        self.assertEqual( self.cache.position( 'hsa:2' ), 20 )
+        self.assertEqual( self.cache.position( 'hsa:1' ), None )
+        self.assertEqual( self.cache.info()['hits'], 2 )
+        self.assertEqual( self.cache.info()['misses'], 1 )
+        self.assertEqual( self.cache.info()['evictions'], 1 )
+        self.assertEqual( self.cache.info()['entries'], 2 )
+
+    def test_too_large( self ):
+
+        self.cache.put( 0, { 'identification': 'hsa:1', 'sequence': 'M' * 10000 } )
+
+        self.assertEqual( self.cache.info()['entries'], 0 )
+
+    def test_check( self ):
+
+        self.cache.put( 0, self.entries[0] )
+
+        self.assertFalse( self.cache.check() )
+
+        with open( self.pep_file, 'a' ) as f:
+            f.write( '>hsa:2  B\nMKV\n' )
+
+        self.assertTrue( self.cache.check() )
+        self.assertEqual( self.cache.get( 0 ), None )
+        self.assertEqual( self.cache.info()['invalidations'], 1 )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import sys
+import os
+import unittest
+from pepreader.columns import *
+import tempfile
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+class TestColumns( unittest.TestCase ):
+
+    def setUp( self ):
+
+        with tempfile.NamedTemporaryFile( suffix='.pepc', delete=False ) as f:
+            self.column_file = f.name
+
+        self.row_groups = [
+            { 'identification': [ 'rno:24189', 'hsa:10458' ], 'organism_code': [ 'rno', 'hsa' ], 'description': [ 'Alb; albumin', 'BAIAP2; protéine' ], 'ec_numbers': [ [], [ '3.1.3.16', '2.3.1.-' ] ], 'sequence': [ 'MKWV', 'MSLSRS' ] },
+            { 'identification': [ 'mmu:11364' ], 'organism_code': [ 'mmu' ], 'description': [ '' ], 'ec_numbers': [ [ '1.3.8.7' ] ], 'sequence': [ 'MAAGFG' ] },
+        ]
+
+    def tearDown( self ):
+
+        if os.path.exists( self.column_file ):
+            os.remove( self.column_file )
+
+    def test_write_and_read( self ):
+
+        with ColumnWriter( self.column_file ) as writer:
+            for row_group in self.row_groups:
+                writer.write_row_group( row_group )
+
+        reader = ColumnReader( self.column_file )
+
+        self.assertEqual( reader.rows, 3 )
+        self.assertEqual( list( reader.iter_row_groups() ), self.row_groups )
+        self.assertEqual( reader.read( [ 'identification', 'ec_numbers' ] ), { 'identification': [ 'rno:24189', 'hsa:10458', 'mmu:11364' ], 'ec_numbers': [ [], [ '3.1.3.16', '2.3.1.-' ], [ '1.3.8.7' ] ] } )
+
+    def test_write_failure( self ):
+
+        with self.assertRaises( UnicodeDecodeError ):
+            with ColumnWriter( self.column_file ) as writer:
+                writer.write_row_group( self.row_groups[0] )
+
+                raise UnicodeDecodeError( 'utf-8', b'\xff', 0, 1, 'invalid start byte' )
+
+        self.assertFalse( os.path.exists( self.column_file ) )
+
+    @unittest.skipUnless( pyarrow, 'pyarrow is not installed' )
+    def test_write_parquet( self ):
+
+        parquet_file = self.column_file + '.parquet'
+
+        try:
+            write_parquet( self.row_groups, parquet_file )
+
+            table = pyarrow.parquet.read_table( parquet_file )
+
+            self.assertEqual( table.num_rows, 3 )
+            self.assertEqual( table.column( 'identification' ).to_pylist(), [ 'rno:24189', 'hsa:10458', 'mmu:11364' ] )
+            self.assertEqual( table.column( 'ec_numbers' ).to_pylist(), [ [], [ '3.1.3.16', '2.3.1.-' ], [ '1.3.8.7' ] ] )
+
+            def failing_row_groups():
+                yield self.row_groups[0]
+
+                raise ValueError( 'broken pep file' )
+
+            with self.assertRaises( ValueError ):
+                write_parquet( failing_row_groups(), parquet_file )
+
+            self.assertFalse( os.path.exists( parquet_file ) )
+        finally:
+            if os.path.exists( parquet_file ):
+                os.remove( parquet_file )
+
+    def test_not_a_columnar_file( self ):
+
+        with open( self.column_file, 'wb' ) as f:
+            f.write( b'>rno:24189  Alb\nMKWV\n' )
+
+        self.assertRaises( ValueError, ColumnReader, self.column_file )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,125 @@
+import sys
+import os
+import unittest
+from pepreader.compression import *
+from pepreader.pep import *
+from pepreader.pepreader import *
+import bz2
+import gzip
+import lzma
+import random
+import shutil
+import tempfile
+
+
+class TestCompression( unittest.TestCase ):
+
+    def setUp( self ):
+
+        self.directory = tempfile.mkdtemp()
+
+        generator = random.Random( 0 )
+
+        lines = []
+
+        for entry in range( 600 ):
+            sequence = ''.join( generator.choice( 'ACDEFGHIKLMNPQRSTVWY' ) for i in range( generator.randint( 50, 400 ) ) )
+
+            lines.append( '>hsa:%d  GENE%d; protein (EC:1.1.1.%d)' % ( entry, entry, entry % 9 ) )
+            lines.extend( sequence[ start:start + 60 ] for start in range( 0, len( sequence ), 60 ) )
+
+        self.content = ( '\n'.join( lines ) + '\n' ).encode()
+
+        self.pep_file = os.path.join( self.directory, 'example.pep' )
+
+        with open( self.pep_file, 'wb' ) as f:
+            f.write( self.content )
+
+        for extension, module in [ ( '.gz', gzip ), ( '.bz2', bz2 ), ( '.xz', lzma ) ]:
+            with module.open( self.pep_file + extension, 'wb' ) as f:
+                f.write( self.content )
+
+        bgzf_compress( self.pep_file, self.pep_file + '.bgz' )
+
+    def tearDown( self ):
+
+        shutil.rmtree( self.directory )
+
+    def test_detect_compression( self ):
+
+        self.assertEqual( detect_compression( self.pep_file ), None )
+        self.assertEqual( detect_compression( self.pep_file + '.gz' ), 'gzip' )
+        self.assertEqual( detect_compression( self.pep_file + '.bz2' ), 'bzip2' )
+        self.assertEqual( detect_compression( self.pep_file + '.xz' ), 'xz' )
+        self.assertEqual( detect_compression( self.pep_file + '.bgz' ), 'bgzf' )
+
+    def test_bgzf_is_gzip( self ):
+
+        with gzip.open( self.pep_file + '.bgz' ) as f:
+            self.assertEqual( f.read(), self.content )
+
+    def test_bgzf_random_access( self ):
+
+        with open_binary( self.pep_file + '.bgz' ) as f:
+            self.assertTrue( len( f.raw.blocks_compressed ) > 1 )
+            self.assertEqual( f.raw.size, len( self.content ) )
+
+            for offset in [ 0, 65279, 65280, 100000, len( self.content ) - 10 ]:
+                f.seek( offset )
+
+                self.assertEqual( f.read( 300 ), self.content[ offset:offset + 300 ] )
+
+    def test_pep_compressed( self ):
+
+        expected = PEP( self.pep_file ).parse_file()
+
+        for extension in [ '.gz', '.bz2', '.xz', '.bgz' ]:
+            with PEP( self.pep_file + extension ) as pep:
+                self.assertEqual( pep.parse_file(), expected )
+
+                pep.generate_entries_position( validate=True )
+
+                positions = pep.get_entries_position()
+
+                self.assertEqual( len( positions ), 600 )
+                self.assertEqual( pep.get_entry_record( positions[-1] ), expected[-1] )
+                self.assertEqual( pep.get_entry_record( positions[300] ), expected[300] )
+
+    def test_load_index_appended( self ):
+
+        appended = b'>mmu:11364  Acadm\nMAAGFG\n>mmu:11365  Acadl\nMAARLL\n'
+
+        with open( self.pep_file + '.appended', 'wb' ) as f:
+            f.write( appended )
+
+        bgzf_compress( self.pep_file + '.appended', self.pep_file + '.appended.bgz' )
+
+        with open( self.pep_file + '.appended.bgz', 'rb' ) as f:
+            appended_bgzf = f.read()
+
+        members = { '.gz': gzip.compress( appended ), '.bz2': bz2.compress( appended ), '.xz': lzma.compress( appended ), '.bgz': appended_bgzf }
+
+        for extension, member in members.items():
+            pep_file = self.pep_file + extension
+
+            with PEPReader( pep=PEP( pep_file ) ) as pepreader:
+                pepreader.load_index()
+
+            # A new member at the end: the compressed size isn't a position in the data.
+            with open( pep_file, 'ab' ) as f:
+                f.write( member )
+
+            self.assertEqual( PEPIndex( pep_file ).appended_from(), len( self.content ) )
+
+            with PEPReader( pep=PEP( pep_file ) ) as pepreader:
+                index = pepreader.load_index()
+
+                self.assertEqual( index.count, 602 )
+                self.assertEqual( pepreader.get_by_identification( 'hsa:599' )['sequence'], PEP( self.pep_file ).parse_file()[-1]['sequence'] )
+                self.assertEqual( pepreader.get_by_identification( 'mmu:11364' )['sequence'], 'MAAGFG' )
+                self.assertEqual( pepreader.get_by_identification( 'mmu:11365' )['sequence'], 'MAARLL' )
+                self.assertEqual( list( pepreader.iter_organism( 'mmu' ) ), [ pepreader.get_by_identification( 'mmu:11364' ), pepreader.get_by_identification( 'mmu:11365' ) ] )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import sys
+import os
+import unittest
+from pepreader.filters import *
+
+HEADERS = [
+    b'>rno:294324  Agpat3; 1-acylglycerol-3-phosphate O-acyltransferase 3 (EC:2.3.1.51); K13523 lysophosphatidic acid acyltransferase [EC:2.3.1.51 2.3.1.-]',
+    b'>rno:24189  Alb; albumin; K16141 serum albumin',
+    b'>HSA:10458  BAIAP2; BAI1-associated protein 2 (EC:3.1.3.16)\r\n',
+]
+
+
+class TestEntryFilter( unittest.TestCase ):
+
+    def matches( self, where=None ):
+
+        return [ where.match_header( header ) for header in HEADERS ]
+
+    def test_organisms( self ):
+
+        self.assertEqual( self.matches( EntryFilter( organisms='rno' ) ), [ True, True, False ] )
+        self.assertEqual( self.matches( EntryFilter( organisms=[ 'hsa', 'mmu' ] ) ), [ False, False, True ] )
+
+    def test_identifications( self ):
+
+        self.assertEqual( self.matches( EntryFilter( identifications=[ 'rno:24189', 'hsa:10458' ] ) ), [ False, True, True ] )
+        self.assertEqual( self.matches( EntryFilter( identifications=[ 'rno:24189' ], organisms=[ 'hsa' ] ) ), [ False, False, False ] )
+
+    def test_ec( self ):
+
+        self.assertEqual( self.matches( EntryFilter( ec=True ) ), [ True, False, True ] )
+        self.assertEqual( self.matches( EntryFilter( ec=False ) ), [ False, True, False ] )
+        self.assertEqual( self.matches( EntryFilter( ec='3.1.3.16' ) ), [ False, False, True ] )
+        self.assertEqual( self.matches( EntryFilter( ec='2.3.1.5' ) ), [ False, False, False ] )
+        self.assertEqual( self.matches( EntryFilter( ec='2.3.1.-' ) ), [ True, False, False ] )
+        self.assertEqual( self.matches( EntryFilter( ec=[ '2.-.-.-', '3.1.-.-' ] ) ), [ True, False, True ] )
+
+    def test_ec_numbers( self ):
+
+        # Only '[EC:' and '(EC:' annotations count, like in the parsed ec_numbers.
+        header = b'>hsa:11  X; thing EC:1.1.1.1 note'
+
+        self.assertEqual( EntryFilter.ec_numbers( header ), [] )
+        self.assertFalse( EntryFilter( ec=True ).match_header( header ) )
+        self.assertTrue( EntryFilter( ec=False ).match_header( header ) )
+        self.assertFalse( EntryFilter( ec='1.1.1.1' ).match_header( header ) )
+
+        self.assertEqual( EntryFilter.ec_numbers( HEADERS[0] ), [ b'2.3.1.51', b'2.3.1.-' ] )
+        self.assertEqual( EntryFilter.ec_numbers( HEADERS[2] ), [ b'3.1.3.16' ] )
+
+    def test_keywords( self ):
+
+        self.assertEqual( self.matches( EntryFilter( keywords='Albumin' ) ), [ False, True, False ] )
+        self.assertEqual( self.matches( EntryFilter( keywords=[ 'albumin', 'bai1' ] ) ), [ False, True, True ] )
+
+    def test_length( self ):
+
+        where = EntryFilter( min_length=5, max_length=8 )
+
+        self.assertTrue( where.checks_length() )
+        self.assertFalse( EntryFilter( organisms='hsa' ).checks_length() )
+
+        self.assertFalse( where.match_sequence( b'MKWV\n' ) )
+        self.assertTrue( where.match_sequence( b'MKWV\r\nTFLL\r\n' ) )
+        self.assertFalse( where.match_sequence( b'MKWV\nTFLLL\n' ) )
+
+        self.assertTrue( where.match_span( 10, 16 ) )
+        self.assertFalse( where.match_span( 10, 15 ) )
+
+        self.assertTrue( where.match( HEADERS[1], b'MKWVT\n' ) )
+        self.assertFalse( EntryFilter( organisms='hsa', min_length=5 ).match( HEADERS[1], b'MKWVT\n' ) )
+
+
+if __name__ == "__main__":
+    unittest.main()
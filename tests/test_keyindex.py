@@ -0,0 +1,67 @@
+import sys
+import os
+import unittest
+from pepreader.keyindex import *
+import shutil
+import tempfile
+
+
+class TestKeyIndex( unittest.TestCase ):
+
+    def setUp( self ):
+
+        self.directory = tempfile.mkdtemp()
+        self.pep_file = os.path.join( self.directory, 'example.pep' )
+
+        with open( self.pep_file, 'w' ) as f:
+            f.write( '>rno:294324  Agpat3 [EC:2.3.1.51]\nMGLLAF\n>hsa:10458  BAIAP2 (EC:3.1.3.16 2.3.1.-)\nMSLSRS\n' )
+
+        self.index = KeyIndex( self.pep_file, key_index_file( self.pep_file + '.idx', 'ec' ) )
+        self.mapping = { '2.3.1.51': [ 0 ], '3.1.3.16': [ 40 ], '2.3.1.-': [ 40 ], '2.3.1.5': [ 0, 40 ] }
+
+    def tearDown( self ):
+
+        self.index.close()
+        shutil.rmtree( self.directory )
+
+    def test_key_index_file( self ):
+
+        self.assertEqual( self.index.index_file, self.pep_file + '.ec.idx' )
+
+    def test_is_stale( self ):
+
+        self.assertTrue( self.index.is_stale() )
+
+        self.index.build( self.mapping )
+
+        self.assertFalse( self.index.is_stale() )
+
+        with open( self.pep_file, 'a' ) as f:
+            f.write( '>mmu:11365  Acadl\nMAARLL\n' )
+
+        self.assertTrue( self.index.is_stale() )
+
+    def test_get( self ):
+
+        self.index.build( self.mapping )
+        self.index.load()
+
+        self.assertEqual( self.index.count, 4 )
+        self.assertEqual( list( self.index.get( '2.3.1.5' ) ), [ 0, 40 ] )
+        self.assertEqual( list( self.index.get( '3.1.3.16' ) ), [ 40 ] )
+        self.assertEqual( list( self.index.get( '1.1.1.1' ) ), [] )
+        self.assertEqual( [ ( key, list( values ) ) for key, values in self.index.items() ], sorted( self.mapping.items() ) )
+
+    def test_iter_prefix( self ):
+
+        self.index.build( self.mapping )
+        self.index.load()
+
+        self.assertEqual( [ key for key, values in self.index.iter_prefix( '2.3.1.' ) ], [ '2.3.1.-', '2.3.1.5', '2.3.1.51' ] )
+        self.assertEqual( [ key for key, values in self.index.iter_prefix( '2.3.1.5' ) ], [ '2.3.1.5', '2.3.1.51' ] )
+        self.assertEqual( list( self.index.iter_prefix( '4.' ) ), [] )
+        self.assertEqual( len( list( self.index.iter_prefix( '' ) ) ), 4 )
+
+
+if __name__ == "__main__":
+    unittest.main()
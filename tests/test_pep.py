@@ -1,8 +1,26 @@
 import sys
 import os
 import unittest
+from array import array
 from pepreader.pep import *
+from pepreader.stats import *
+from pepreader.filters import *
 import re
+import tempfile
+import types
+
+PEP_CONTENT = (
+    '>rno:294324  Agpat3; 1-acylglycerol-3-phosphate O-acyltransferase 3 (EC:2.3.1.51); K13523 lysophosphatidic acid acyltransferase [EC:2.3.1.51 2.3.1.-]\n'
+    'MGLLAFLKTQFVLHLLVGFVFVVSGLVINFVQLCTLALWPVSKQLYRRLNCRLAYSLWSQ\n'
+    'LVMLLEWWSCTECTLFTDQATVERFGKEHAVIILNHNFEIDFLCGWTMCERFGVLGSSKV\n'
+    '>rno:24189  Alb; albumin; K16141 serum albumin\n'
+    'MKWVTFLLLLFISGSAFS\n'
+    '>hsa:10458  BAIAP2; BAI1-associated protein 2 (EC:3.1.3.16)\n'
+    'MSLSRSEEMHRLTENVYKTIMEQFNPSLRNFIAMGKNYEKALAGVTYAAKGYFDALVKMG\n'
+    'ELASESQGSKELGDVLFQMAEVHRQIQNQLEEMLKSFHNELLTQLEQKVELDSRYLSAAL\n'
+    'KKYQTEQRSKGDALDKCQAELKKLRKKSQGSKNPQKYSDKELQYIDAISNKQGELENYVS\n'
+)
+
 
 class TestPep( unittest.TestCase ):
 
@@ -116,6 +134,225 @@ class TestPep( unittest.TestCase ):
         self.assertFalse( keys_changed )
 
 
+    def test_iter_entries( self ):
+
+        with tempfile.NamedTemporaryFile( mode='w', suffix='.pep', delete=False ) as f:
+            f.write( PEP_CONTENT )
+
+        pep = PEP( f.name )
+
+        self.assertTrue( isinstance( pep.iter_entries(), types.GeneratorType ) )
+        self.assertEqual( list( pep.iter_entries() ), pep.parse_file() )
+        self.assertEqual( len( pep.parse_file() ), 3 )
+        self.assertEqual( pep.parse_file()[1], { 'header': '>rno:24189  Alb; albumin; K16141 serum albumin', 'sequence': 'MKWVTFLLLLFISGSAFS' } )
+
+        os.remove( f.name )
+
+    def test_get_entry_record_single_handle( self ):
+
+        with tempfile.NamedTemporaryFile( mode='w', suffix='.pep', delete=False ) as f:
+            f.write( PEP_CONTENT )
+
+        with PEP( f.name ) as pep:
+            pep.generate_entries_position()
+
+            records = [ pep.get_entry_record( position ) for position in pep.get_entries_position() ]
+            handle = pep.handle
+
+            self.assertEqual( records, pep.parse_file() )
+            self.assertEqual( pep.entry_end( 0 ), 272 )
+            self.assertEqual( pep.entry_end( 338 ), len( PEP_CONTENT ) )
+
+        self.assertTrue( handle.closed )
+        self.assertEqual( pep.handle, None )
+
+        os.remove( f.name )
+
+    def test_entries_position_crlf_and_encoding( self ):
+
+        content = '>rno:1  Prot\u00e9ine; A\r\nMKWV\r\nTFLL\r\n>rno:2  B\r\nMSLS\r\n'.encode( 'latin-1' )
+
+        with tempfile.NamedTemporaryFile( suffix='.pep', delete=False ) as f:
+            f.write( content )
+
+        with PEP( f.name, encoding='latin-1' ) as pep:
+            pep.generate_entries_position( validate=True )
+
+            self.assertEqual( list( pep.get_entries_position() ), [ 0, content.index( b'>rno:2' ) ] )
+            self.assertEqual( pep.validate_entries_position(), [] )
+            self.assertEqual( pep.get_entry_record( 0 ), { 'header': '>rno:1  Prot\u00e9ine; A', 'sequence': 'MKWVTFLL' } )
+            self.assertEqual( pep.get_entry_record( pep.get_entries_position()[1] ), { 'header': '>rno:2  B', 'sequence': 'MSLS' } )
+
+            pep.entries_position = [ 0, 5 ]
+
+            self.assertEqual( pep.validate_entries_position(), [ 5 ] )
+
+        os.remove( f.name )
+
+    def test_entries_ranges( self ):
+
+        with tempfile.NamedTemporaryFile( mode='w', suffix='.pep', delete=False ) as f:
+            f.write( PEP_CONTENT )
+
+        with PEP( f.name ) as pep:
+            self.assertEqual( pep.entries_ranges( 1 ), [ ( 0, 272 ), ( 272, 338 ), ( 338, 581 ) ] )
+            self.assertEqual( pep.entries_ranges( 300 ), [ ( 0, 338 ), ( 338, 581 ) ] )
+            self.assertEqual( pep.entry_boundary( 100 ), 272 )
+            self.assertEqual( list( pep.iter_range_entries( 0, 338 ) ), pep.parse_file()[:2] )
+
+            # Blocks smaller than the entries, and blocks that end right before or after a '\n'.
+            for block_size in ( 1, 2, 7, 64, 271, 272, 273 ):
+                self.assertEqual( list( pep.iter_range_entries( 0, 581, block_size ) ), pep.parse_file() )
+
+        with PEP( f.name ) as pep:
+            first_entry = pep.parse_file()[0]
+
+        with PEP( f.name, instrumentation=Stats() ) as pep:
+            entries = pep.iter_range_entries( 0, 581, 64 )
+
+            self.assertEqual( next( entries ), first_entry )
+            self.assertEqual( pep.stats()['counters']['bytes_read'], 320 )
+
+        os.remove( f.name )
+
+    def test_stream_stats( self ):
+
+        with tempfile.NamedTemporaryFile( mode='w', suffix='.pep', delete=False ) as f:
+            f.write( PEP_CONTENT )
+
+        where = EntryFilter( organisms=[ 'rno' ] )
+
+        stats = Stats()
+
+        with PEP( f.name, instrumentation=stats ) as pep:
+            for read in ( pep.iter_entries, lambda: pep.iter_entries( where ), lambda: pep.iter_filtered_entries( where ), pep.iter_batches, pep.iter_entries_span, pep.iter_entries_digest ):
+                stats.reset()
+
+                self.assertTrue( len( list( read() ) ) > 0 )
+
+                # One block and the empty read at the end of the file, not one read per line.
+                self.assertEqual( stats.snapshot()['counters']['reads'], 2 )
+                self.assertEqual( stats.snapshot()['counters']['bytes_read'], 581 )
+                self.assertTrue( stats.snapshot()['timers']['read'] >= 0.0 )
+
+        os.remove( f.name )
+
+    def test_entry_heads( self ):
+
+        content = PEP_CONTENT + '>hsa:1  empty\n\r\n\n>hsa:2  X\r\nMKV\r\n>hsa:3  last'
+
+        with tempfile.NamedTemporaryFile( mode='w', suffix='.pep', delete=False, newline='' ) as f:
+            f.write( content )
+
+        raw = content.encode()
+        positions = [ match.start() for match in re.finditer( b'>', raw ) ]
+        spans = [ ( start, end - start ) for start, end in zip( positions, positions[ 1: ] + [ len( raw ) ] ) ]
+
+        expected = [ ( offset, length, raw[ offset:raw.index( b'\n', offset ) ].rstrip( b'\r' ) ) for offset, length in spans[ :3 ] + spans[ 4:5 ] ]
+
+        # The first header (149 bytes) is longer than the first read.
+        with PEP( f.name, instrumentation=Stats() ) as pep:
+            self.assertEqual( pep.read_entry_head( *spans[0] ), ( expected[0][2], True ) )
+            self.assertEqual( pep.stats()['counters']['reads'], 2 )
+            self.assertEqual( pep.header_size, 165 )
+
+            self.assertEqual( pep.read_entry_head( *spans[1] ), ( expected[1][2], True ) )
+            self.assertEqual( pep.stats()['counters']['reads'], 3 )
+
+            self.assertEqual( pep.read_entry_head( *spans[3] ), ( b'>hsa:1  empty', False ) )
+            self.assertEqual( pep.read_entry_head( *spans[5] ), ( b'>hsa:3  last', False ) )
+
+            self.assertEqual( list( pep.iter_entry_heads( spans ) ), expected )
+
+        with PEP( f.name ) as pep:
+            self.assertEqual( list( pep.iter_entry_heads( spans ) ), expected )
+
+        with PEP( f.name, use_mmap=True ) as pep:
+            self.assertEqual( list( pep.iter_entry_heads( spans ) ), expected )
+
+        with PEP( f.name ) as pep:
+            self.assertEqual( list( pep.iter_entries_span( skip_empty=True ) ), [ ( offset, length, header.decode() ) for offset, length, header in expected ] )
+            self.assertEqual( len( list( pep.iter_entries_span() ) ), 6 )
+
+        os.remove( f.name )
+
+    def test_block_boundaries( self ):
+
+        with tempfile.NamedTemporaryFile( mode='w', suffix='.pep', delete=False ) as f:
+            f.write( PEP_CONTENT )
+
+        pep = PEP( f.name )
+
+        pep.generate_entries_position()
+
+        self.assertTrue( isinstance( pep.get_entries_position(), array ) )
+        self.assertEqual( list( pep.get_entries_position() ), [ 0, 272, 338 ] )
+
+        # Every block size, so the '\n>' of every header straddles two blocks at some point.
+        for block_size in range( 1, 40 ):
+            with open( f.name, 'rb' ) as pep_file:
+                self.assertEqual( list( pep.block_boundaries( pep_file, block_size ) ), [ 0, 272, 338 ] )
+
+        os.remove( f.name )
+
+    def test_iter_batches( self ):
+
+        with tempfile.NamedTemporaryFile( mode='w', suffix='.pep', delete=False ) as f:
+            f.write( PEP_CONTENT )
+
+        pep = PEP( f.name )
+
+        batches = list( pep.iter_batches( size=2 ) )
+
+        self.assertEqual( [ len( batch ) for batch in batches ], [ 2, 1 ] )
+        self.assertEqual( [ entry for batch in batches for entry in batch ], pep.parse_file() )
+
+        os.remove( f.name )
+
+    def test_long_sequence( self ):
+
+        sequence = 'MKWVTFLLLLFISGSAFS' * 2000
+        lines = [ sequence[ start:start + 60 ] for start in range( 0, len( sequence ), 60 ) ]
+
+        with tempfile.NamedTemporaryFile( mode='w', suffix='.pep', delete=False ) as f:
+            f.write( '>hsa:7273  TTN; titin\n' + '\n'.join( lines ) + '\n>hsa:1  A\nMK\n' )
+
+        with PEP( f.name ) as pep:
+            self.assertEqual( pep.parse_file()[0]['sequence'], sequence )
+            self.assertEqual( pep.get_entry_record( 0 )['sequence'], sequence )
+
+        os.remove( f.name )
+
+    def test_mmap( self ):
+
+        with tempfile.NamedTemporaryFile( mode='w', suffix='.pep', delete=False ) as f:
+            f.write( PEP_CONTENT.replace( '\n', '\r\n' ) )
+
+        pep = PEP( f.name )
+
+        with PEP( f.name, use_mmap=True ) as mapped_pep:
+            self.assertEqual( mapped_pep.parse_file(), pep.parse_file() )
+
+            pep.generate_entries_position()
+            mapped_pep.generate_entries_position( validate=True )
+
+            self.assertTrue( mapped_pep.mmap is not None )
+            self.assertEqual( mapped_pep.get_entries_position(), pep.get_entries_position() )
+            self.assertEqual( mapped_pep.get_entry_record( 277 ), pep.get_entry_record( 277 ) )
+
+            raw_entries = list( mapped_pep.iter_raw_entries() )
+
+            self.assertTrue( isinstance( raw_entries[1][1], memoryview ) )
+            self.assertEqual( raw_entries[1][1].tobytes(), b'>rno:24189  Alb; albumin; K16141 serum albumin' )
+            self.assertEqual( raw_entries[1][2].tobytes(), b'MKWVTFLLLLFISGSAFS\r\n' )
+            self.assertEqual( [ raw_entry[0] for raw_entry in raw_entries ], list( pep.get_entries_position() ) )
+
+            del raw_entries
+
+        self.assertEqual( mapped_pep.mmap, None )
+
+        os.remove( f.name )
+
     def test_get_entry_record( self ):
 
         positions = self.pep.get_entries_position()
@@ -0,0 +1,126 @@
+import sys
+import os
+import unittest
+from pepreader.pepindex import *
+import shutil
+import tempfile
+
+
+class TestPepIndex( unittest.TestCase ):
+
+    def setUp( self ):
+
+        self.directory = tempfile.mkdtemp()
+        self.pep_file = os.path.join( self.directory, 'example.pep' )
+
+        with open( self.pep_file, 'w' ) as f:
+            f.write( '>rno:294324  Agpat3\nMGLLAF\n>hsa:10458  BAIAP2\nMSLSRS\nEEMHRL\n>mmu:11364  Acadm\nMAAGFG\n' )
+
+        self.index = PEPIndex( self.pep_file )
+        self.entries = [ ( 'rno:294324', 0, 27, 11 ), ( 'hsa:10458', 27, 33, 22 ), ( 'mmu:11364', 60, 25, 2 ** 64 - 1 ) ]
+
+    def tearDown( self ):
+
+        self.index.close()
+        shutil.rmtree( self.directory )
+
+    def test_default_index_file( self ):
+
+        self.assertEqual( self.index.index_file, self.pep_file + '.idx' )
+
+    def test_is_stale( self ):
+
+        self.assertTrue( self.index.is_stale() )
+
+        self.index.build( self.entries )
+
+        self.assertFalse( self.index.is_stale() )
+
+        with open( self.pep_file, 'a' ) as f:
+            f.write( '>mmu:11365  Acadl\nMAARLL\n' )
+
+        self.assertTrue( self.index.is_stale() )
+
+    def test_is_stale_loaded( self ):
+
+        self.index.build( self.entries )
+        self.index.load()
+
+        self.assertFalse( self.index.is_stale() )
+
+        with open( self.pep_file, 'a' ) as f:
+            f.write( '>mmu:11365  Acadl\nMAARLL\n' )
+
+        self.assertTrue( self.index.is_stale() )
+
+        self.index.close()
+
+    def test_load( self ):
+
+        self.index.build( self.entries )
+        self.index.load()
+
+        self.assertEqual( self.index.count, 3 )
+        self.assertEqual( list( self.index.entries_position() ), [ 0, 27, 60 ] )
+        self.assertEqual( list( self.index.entries_length() ), [ 27, 33, 25 ] )
+        self.assertEqual( list( self.index.entries_digest() ), [ 11, 22, 2 ** 64 - 1 ] )
+        self.assertEqual( self.index.identification( 1 ), 'hsa:10458' )
+        self.assertEqual( self.index.identifications(), [ 'rno:294324', 'hsa:10458', 'mmu:11364' ] )
+        self.assertEqual( list( self.index.iter_entries() ), self.entries )
+
+    def test_build_runs( self ):
+
+        entries = [ ( identification, offset, 1, offset ) for offset, identification in enumerate( [ 'mmu:2', 'hsa:10', 'hsa:1', 'rno:5', 'hsa:2', 'aaa:1', 'mmu:1' ] ) ]
+
+        # Runs of two identifications, merged from disk.
+        self.index.RUN_SIZE = 2
+        self.index.build( entries )
+        self.index.load()
+
+        self.assertEqual( [ self.index.identification( entry ) for entry in self.index._order ], sorted( identification for identification, offset, length, digest in entries ) )
+        self.assertEqual( list( self.index.iter_entries() ), entries )
+
+        for identification, offset, length, digest in entries:
+            self.assertEqual( self.index.span( identification ), ( offset, 1 ) )
+
+        self.assertEqual( self.index.span( 'hsa:3' ), None )
+        self.assertEqual( sorted( os.listdir( self.directory ) ), [ 'example.pep', 'example.pep.idx' ] )
+
+    def test_span( self ):
+
+        self.index.build( self.entries )
+        self.index.load()
+
+        self.assertEqual( self.index.span( 'rno:294324' ), ( 0, 27 ) )
+        self.assertEqual( self.index.span( 'hsa:10458' ), ( 27, 33 ) )
+        self.assertEqual( self.index.span( 'mmu:11364' ), ( 60, 25 ) )
+        self.assertEqual( self.index.span( 'hsa:1' ), None )
+        self.assertEqual( self.index.span( 'zzz:1' ), None )
+
+    def test_entry_digest( self ):
+
+        self.assertEqual( entry_digest( b'>hsa:1  A', b'MKVMKV' ), raw_entry_digest( b'>hsa:1  A\r\nMKV\r\nMKV\r\n' ) )
+        self.assertNotEqual( entry_digest( b'>hsa:1  A', b'MKVMKV' ), entry_digest( b'>hsa:1  A', b'MKVMKA' ) )
+
+    def test_appended_from( self ):
+
+        with open( self.pep_file, 'rb' ) as f:
+            content = f.read()
+
+        self.index.build( ( identification, offset, length, raw_entry_digest( content[ offset:offset + length ] ) ) for identification, offset, length, digest in self.entries )
+
+        self.assertEqual( self.index.appended_from(), None )
+
+        with open( self.pep_file, 'a' ) as f:
+            f.write( '>mmu:11365  Acadl\nMAARLL\n' )
+
+        self.assertEqual( self.index.appended_from(), 85 )
+
+        with open( self.pep_file, 'w' ) as f:
+            f.write( content.decode().replace( 'MAAGFG', 'MAAGFA' ) + '>mmu:11365  Acadl\nMAARLL\n' )
+
+        self.assertEqual( self.index.appended_from(), None )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,9 +1,29 @@
 import sys
 import os
 import unittest
+from array import array
 from pepreader.pepreader import *
 from pepreader.pep import *
+from pepreader.records import *
+from pepreader.columns import *
+from pepreader.stats import *
+from pepreader.filters import *
 import re
+import shutil
+import tempfile
+import types
+
+PEP_CONTENT = (
+    '>rno:294324  Agpat3; 1-acylglycerol-3-phosphate O-acyltransferase 3 (EC:2.3.1.51); K13523 lysophosphatidic acid acyltransferase [EC:2.3.1.51 2.3.1.-]\n'
+    'MGLLAFLKTQFVLHLLVGFVFVVSGLVINFVQLCTLALWPVSKQLYRRLNCRLAYSLWSQ\n'
+    'LVMLLEWWSCTECTLFTDQATVERFGKEHAVIILNHNFEIDFLCGWTMCERFGVLGSSKV\n'
+    '>rno:24189  Alb; albumin; K16141 serum albumin\n'
+    'MKWVTFLLLLFISGSAFS\n'
+    '>HSA:10458  BAIAP2; BAI1-associated protein 2 (EC:3.1.3.16)\n'
+    'MSLSRSEEMHRLTENVYKTIMEQFNPSLRNFIAMGKNYEKALAGVTYAAKGYFDALVKMG\n'
+    'ELASESQGSKELGDVLFQMAEVHRQIQNQLEEMLKSFHNELLTQLEQKVELDSRYLSAAL\n'
+    'KKYQTEQRSKGDALDKCQAELKKLRKKSQGSKNPQKYSDKELQYIDAISNKQGELENYVS\n'
+)
 
 
 class test_PEPReader( unittest.TestCase ):
@@ -57,6 +77,32 @@ class test_PEPReader( unittest.TestCase ):
 
         self.assertEqual( self.pepr.ec_from_brackets( header ), [ '2.3.1.51', '2.3.1.-' ] )
 
+    def test_ec_numbers( self ):
+
+        header='>rno:294324  Agpat3; 1-acylglycerol-3-phosphate O-acyltransferase 3 (EC:2.3.1.51); K13523 lysophosphatidic acid acyltransferase / lysophosphatidylinositol acyltransferase [EC:2.3.1.51 2.3.1.-]'
+
+        self.assertEqual( self.pepr.ec_numbers( header ), [ '2.3.1.51', '2.3.1.-' ] )
+        self.assertEqual( self.pepr.ec_numbers( '>rno:24189  Alb; albumin' ), [] )
+
+    def test_parse_header( self ):
+
+        headers = [
+            '>rno:294324  Agpat3; 1-acylglycerol-3-phosphate O-acyltransferase 3 (EC:2.3.1.51); K13523 lysophosphatidic acid acyltransferase / lysophosphatidylinositol acyltransferase [EC:2.3.1.51 2.3.1.-]',
+            '>HSA:10458   BAIAP2;  BAI1-associated \\"protein\\" 2  ',
+            '>eco:b0001',
+        ]
+
+        for header in headers:
+            fields = self.pepr.parse_header( header )
+
+            self.assertEqual( fields['identification'], self.pepr.protein_identification( header ) )
+            self.assertEqual( fields['organism_code'], self.pepr.organism_code( header ) )
+            self.assertEqual( fields['full_fasta_header'], self.pepr.full_fasta_header( header ) )
+            self.assertEqual( fields['description'], self.pepr.protein_description( header ) )
+            self.assertEqual( fields['ec_from_square_brackets'], self.pepr.ec_from_square_brackets( header ) )
+            self.assertEqual( fields['ec_from_brackets'], self.pepr.ec_from_brackets( header ) )
+            self.assertEqual( fields['ec_numbers'], self.pepr.ec_numbers( header ) )
+
     def test_organism_code( self ):
 
         header='>rno:294324  Agpat3; 1-acylglycerol-3-phosphate O-acyltransferase 3; K13523 lysophosphatidic acid acyltransferase / lysophosphatidylinositol acyltransferase (EC:2.3.1.51 2.3.1.-) extra string'
@@ -72,7 +118,486 @@ class test_PEPReader( unittest.TestCase ):
 
     def test_entries_position( self ):
 
-        self.assertTrue( type( self.pepr.entries_position() ) is list )
+        self.assertTrue( type( self.pepr.entries_position() ) is array )
+
+
+class test_PEPReader_streaming( unittest.TestCase ):
+
+    def setUp( self ):
+
+        with tempfile.NamedTemporaryFile( mode='w', suffix='.pep', delete=False ) as f:
+            f.write( PEP_CONTENT )
+
+        self.pep_file = f.name
+        self.pepr = PEPReader( pep=PEP( self.pep_file ) )
+
+    def tearDown( self ):
+
+        os.remove( self.pep_file )
+
+    def test_iter_parsed_entries( self ):
+
+        self.assertTrue( isinstance( self.pepr.iter_parsed_entries(), types.GeneratorType ) )
+
+        entries = list( self.pepr.iter_parsed_entries() )
+
+        self.assertEqual( [ entry['identification'] for entry in entries ], [ 'rno:294324', 'rno:24189', 'hsa:10458' ] )
+        self.assertEqual( entries[1]['description'], 'Alb; albumin; K16141 serum albumin' )
+        self.assertEqual( entries[1]['sequence'], 'MKWVTFLLLLFISGSAFS' )
+    def test_iter_parsed_entries_lazy( self ):
+
+        entries = list( self.pepr.iter_parsed_entries() )
+
+        records = list( self.pepr.iter_parsed_entries( lazy=True ) )
+
+        self.assertTrue( all( isinstance( record, LazyRecord ) and not record.is_sequence_loaded() for record in records ) )
+        self.assertEqual( [ record.to_dict() for record in records ], entries )
+
+        self.pepr.load_index()
+
+        records = list( self.pepr.iter_parsed_entries( lazy=True ) )
+
+        self.assertEqual( [ record.to_dict() for record in records ], entries )
+
+        self.pepr.close()
+        os.remove( self.pep_file + '.idx' )
+        os.remove( self.pep_file + '.ec.idx' )
+        os.remove( self.pep_file + '.organism.idx' )
+
+    def test_iter_parsed_entries_compact( self ):
+
+        records = list( self.pepr.iter_parsed_entries( compact=True ) )
+
+        self.assertTrue( all( isinstance( record, PEPRecord ) for record in records ) )
+        self.assertEqual( [ record.to_dict() for record in records ], list( self.pepr.iter_parsed_entries() ) )
+
+    def test_to_columns( self ):
+
+        row_groups = list( self.pepr.to_columns( row_group_size=2 ) )
+
+        self.assertEqual( [ len( columns['identification'] ) for columns in row_groups ], [ 2, 1 ] )
+        self.assertEqual( row_groups[1]['ec_numbers'], [ [ '3.1.3.16' ] ] )
+        self.assertEqual( sorted( row_groups[0].keys() ), [ 'description', 'ec_numbers', 'identification', 'organism_code', 'sequence' ] )
+
+    def test_export_columns( self ):
+
+        column_file = self.pep_file + '.pepc'
+
+        self.assertEqual( self.pepr.export_columns( column_file, row_group_size=2 ), 3 )
+        self.assertEqual( ColumnReader( column_file ).read( [ 'identification' ] ), { 'identification': [ 'rno:294324', 'rno:24189', 'hsa:10458' ] } )
+
+        os.remove( column_file )
+
+    def test_get_by_identification( self ):
+
+        entry = self.pepr.get_by_identification( 'hsa:10458' )
+
+        self.assertEqual( entry['identification'], 'hsa:10458' )
+        self.assertEqual( entry['sequence'][:10], 'MSLSRSEEMH' )
+        self.assertEqual( self.pepr.get_by_identification( 'RNO:24189' )['sequence'], 'MKWVTFLLLLFISGSAFS' )
+        self.assertEqual( self.pepr.get_by_identification( 'hsa:1' ), None )
+
+    def test_get_many( self ):
+
+        entries = self.pepr.get_many( [ 'hsa:10458', 'hsa:1', 'rno:294324', 'hsa:10458' ] )
+
+        self.assertEqual( [ entry and entry['identification'] for entry in entries ], [ 'hsa:10458', None, 'rno:294324', 'hsa:10458' ] )
+        self.assertEqual( entries[0], self.pepr.parsed_entry( 338 ) )
+
+    def test_parse_parallel( self ):
+
+        entries = list( self.pepr.iter_parsed_entries() )
+
+        self.assertEqual( list( self.pepr.parse_parallel( workers=2, chunk_size=1 ) ), entries )
+        self.assertEqual( sorted( entry['identification'] for entry in self.pepr.parse_parallel( workers=2, ordered=False, chunk_size=1 ) ), sorted( entry['identification'] for entry in entries ) )
+        self.assertEqual( entries[2]['organism_code'], 'HSA' )
+        self.assertEqual( entries[2]['ec_numbers'], [ '3.1.3.16' ] )
+
+    def test_read_many( self ):
+
+        directory = tempfile.mkdtemp()
+
+        for name, content in [ ( 'rno.pep', PEP_CONTENT ), ( 'hsa.pep', PEP_CONTENT * 2 ), ( 'bad.pep', b'>hsa:1 \xff\xfe\nMKV\n' ) ]:
+            with open( os.path.join( directory, name ), 'wb' ) as f:
+                f.write( content.encode() if isinstance( content, str ) else content )
+
+        reports = []
+
+        proteins = list( PEPReader.read_many( directory, workers=2, progress=reports.append ) )
+
+        self.assertEqual( len( proteins ), 9 )
+        self.assertEqual( sorted( report['pep_file'] for report in reports ), sorted( PEPReader.pep_files( os.path.join( directory, '*.pep' ) ) ) )
+
+        errors = [ report for report in reports if report['error'] ]
+
+        self.assertEqual( len( errors ), 1 )
+        self.assertTrue( errors[0]['pep_file'].endswith( 'bad.pep' ) )
+
+        # Batches of two entries: every file comes in many batches, in file order.
+        reports = []
+
+        proteins = list( PEPReader.read_many( directory, workers=2, progress=reports.append, batch_size=2 ) )
+
+        self.assertEqual( [ protein['identification'] for pep_file, protein in proteins if pep_file.endswith( 'hsa.pep' ) ], [ entry['identification'] for entry in self.pepr.iter_parsed_entries() ] * 2 )
+        self.assertEqual( sorted( report['entries'] for report in reports ), [ 0, 3, 6 ] )
+
+        # A consumer that stops early doesn't leave the processes waiting to send their batches.
+        with open( os.path.join( directory, 'mmu.pep' ), 'w' ) as f:
+            f.write( PEP_CONTENT * 200 )
+
+        proteins = PEPReader.read_many( directory, workers=2, batch_size=1 )
+
+        self.assertEqual( next( proteins )[1]['identification'], 'rno:294324' )
+
+        proteins.close()
+
+        shutil.rmtree( directory )
+
+    def test_load_index_appended( self ):
+
+        index = self.pepr.load_index()
+        digests = list( index.entries_digest() )
+
+        with open( self.pep_file, 'a' ) as f:
+            f.write( '>mmu:11364  Acadm\nMAAGFG\n' )
+
+        self.assertEqual( index.appended_from(), 581 )
+
+        index = self.pepr.load_index()
+
+        self.assertEqual( list( index.entries_position() ), [ 0, 272, 338, 581 ] )
+        self.assertEqual( list( index.entries_digest() )[:3], digests )
+        self.assertEqual( self.pepr.get_by_identification( 'mmu:11364' )['sequence'], 'MAAGFG' )
+
+        self.pepr.close()
+        os.remove( self.pep_file + '.idx' )
+        os.remove( self.pep_file + '.ec.idx' )
+        os.remove( self.pep_file + '.organism.idx' )
+
+    def test_diff( self ):
+
+        index = self.pepr.load_index()
+
+        new_file = self.pep_file + '.new'
+
+        with open( new_file, 'w' ) as f:
+            f.write( PEP_CONTENT.replace( 'MKWVTFLLLLFISGSAFS', 'MKWVTFLLLLFISGSAFA' ).replace( '>rno:294324', '>rno:294325' ) + '>mmu:11364  Acadm\nMAAGFG\n' )
+
+        changes = sorted( PEPReader.diff( index, new_file ) )
+
+        self.assertEqual( changes, [ ( 'added', 'mmu:11364', 581 ), ( 'added', 'rno:294325', 0 ), ( 'changed', 'rno:24189', 272 ), ( 'removed', 'rno:294324', None ) ] )
+        self.assertEqual( sorted( PEPReader.diff( self.pep_file + '.idx', new_file ) ), changes )
+
+        self.pepr.close()
+        os.remove( new_file )
+        os.remove( self.pep_file + '.idx' )
+        os.remove( self.pep_file + '.ec.idx' )
+        os.remove( self.pep_file + '.organism.idx' )
+
+    def test_cache( self ):
+
+        pepr = PEPReader( pep=PEP( self.pep_file ), cache_size=1048576 )
+
+        entry = pepr.get_by_identification( 'hsa:10458' )
+
+        self.assertTrue( pepr.get_by_identification( 'hsa:10458' ) is entry )
+        self.assertTrue( pepr.parsed_entry( 338 ) is entry )
+        self.assertEqual( pepr.cache_info()['hits'], 2 )
+        self.assertEqual( pepr.cache_info()['misses'], 1 )
+
+        with open( self.pep_file, 'w' ) as f:
+            f.write( '>hsa:10458  BAIAP2\nMSL\n' + PEP_CONTENT.replace( '>HSA:10458', '>HSA:10459' ) )
+
+        self.assertEqual( pepr.get_by_identification( 'hsa:10458' )['sequence'], 'MSL' )
+        self.assertEqual( pepr.cache_info()['invalidations'], 1 )
+        self.assertEqual( PEPReader( pep=PEP( self.pep_file ) ).cache_info(), None )
+
+        pepr.close()
+
+    def test_cache_replaced_file( self ):
+
+        for use_mmap in ( False, True ):
+            with open( self.pep_file, 'w' ) as f:
+                f.write( PEP_CONTENT )
+
+            pepr = PEPReader( pep=PEP( self.pep_file, use_mmap=use_mmap ), cache_size=1048576 )
+
+            self.assertEqual( pepr.get_by_identification( 'rno:24189' )['sequence'], 'MKWVTFLLLLFISGSAFS' )
+
+            # A new file (new inode) in place of the old one, with more entries: every position moves.
+            with open( self.pep_file + '.new', 'w' ) as f:
+                f.write( '>mmu:11364  Acadm\nMAAGFG\n>mmu:11365  Acadl\nMAARLL\n' + PEP_CONTENT )
+
+            os.replace( self.pep_file + '.new', self.pep_file )
+
+            self.assertEqual( pepr.get_by_identification( 'hsa:10458' )['sequence'][:6], 'MSLSRS' )
+            self.assertEqual( pepr.get_by_identification( 'mmu:11365' )['sequence'], 'MAARLL' )
+            self.assertEqual( pepr.cache_info()['invalidations'], 1 )
+
+            pepr.load_index()
+
+            with open( self.pep_file + '.new', 'w' ) as f:
+                f.write( PEP_CONTENT + '>mmu:11366  Acad8\nMAAR\n' )
+
+            os.replace( self.pep_file + '.new', self.pep_file )
+
+            # The index is stale now: the positions come from the new file.
+            self.assertEqual( pepr.get_by_identification( 'mmu:11366' )['sequence'], 'MAAR' )
+            self.assertEqual( pepr.get_by_identification( 'rno:24189' )['sequence'], 'MKWVTFLLLLFISGSAFS' )
+
+            pepr.close()
+
+        os.remove( self.pep_file + '.idx' )
+        os.remove( self.pep_file + '.ec.idx' )
+        os.remove( self.pep_file + '.organism.idx' )
+
+    def test_index_replaced_file( self ):
+
+        for use_mmap in ( False, True ):
+            with open( self.pep_file, 'w' ) as f:
+                f.write( PEP_CONTENT )
+
+            # No cache: the index alone finds out the file changed.
+            pepr = PEPReader( pep=PEP( self.pep_file, use_mmap=use_mmap ) )
+            pepr.load_index()
+
+            self.assertEqual( pepr.get_by_identification( 'rno:24189' )['sequence'], 'MKWVTFLLLLFISGSAFS' )
+
+            # A new file (new inode) in place of the old one, with an entry before the others: every position moves.
+            with open( self.pep_file + '.new', 'w' ) as f:
+                f.write( '>mmu:11364  Acadm\nMAAGFGMAAGFGMAAGFG\n' + PEP_CONTENT )
+
+            os.replace( self.pep_file + '.new', self.pep_file )
+
+            self.assertEqual( pepr.get_by_identification( 'rno:24189' )['sequence'], 'MKWVTFLLLLFISGSAFS' )
+            self.assertEqual( pepr.get_by_identification( 'mmu:11364' )['sequence'], 'MAAGFGMAAGFGMAAGFG' )
+            self.assertEqual( pepr.index, None )
+            self.assertEqual( len( pepr.entries_position() ), 4 )
+
+            pepr.close()
+
+        os.remove( self.pep_file + '.idx' )
+        os.remove( self.pep_file + '.ec.idx' )
+        os.remove( self.pep_file + '.organism.idx' )
+
+    def test_context_manager( self ):
+
+        with PEPReader( pep=PEP( self.pep_file ) ) as pepr:
+            entry = pepr.parsed_entry( 272 )
+            pep = pepr.pep
+
+            self.assertEqual( entry['identification'], 'rno:24189' )
+            self.assertFalse( pep.handle.closed )
+
+        self.assertEqual( pep.handle, None )
+
+    def test_load_index( self ):
+
+        index = self.pepr.load_index()
+
+        self.assertTrue( os.path.exists( self.pep_file + '.idx' ) )
+        self.assertEqual( list( self.pepr.entries_position() ), [ 0, 272, 338 ] )
+        self.assertEqual( index.span( 'hsa:10458' ), ( 338, 243 ) )
+
+        index.close()
+        os.remove( self.pep_file + '.idx' )
+        os.remove( self.pep_file + '.ec.idx' )
+        os.remove( self.pep_file + '.organism.idx' )
+
+    def test_iter_organism( self ):
+
+        self.assertEqual( self.pepr.organisms(), [ 'hsa', 'rno' ] )
+        self.assertEqual( self.pepr.organism_ranges( 'rno' ), [ ( 0, 338 ) ] )
+        self.assertEqual( [ entry['identification'] for entry in self.pepr.iter_organism( 'HSA' ) ], [ 'hsa:10458' ] )
+        self.assertEqual( list( self.pepr.iter_organism( 'mmu' ) ), [] )
+
+        with open( self.pep_file, 'a' ) as f:
+            f.write( '>rno:24190  Alb2\nMKWV\n' )
+
+        self.pepr.load_index()
+
+        self.assertTrue( os.path.exists( self.pep_file + '.organism.idx' ) )
+        self.assertEqual( self.pepr.organisms(), [ 'hsa', 'rno' ] )
+        self.assertEqual( self.pepr.organism_ranges( 'rno' ), [ ( 0, 338 ), ( 581, 603 ) ] )
+        self.assertEqual( [ entry['identification'] for entry in self.pepr.iter_organism( 'rno' ) ], [ 'rno:294324', 'rno:24189', 'rno:24190' ] )
+
+        with open( self.pep_file, 'a' ) as f:
+            f.write( '>rno:24191  Alb3\nMKWA\n' )
+
+        self.pepr.load_index()
+
+        self.assertEqual( self.pepr.organism_ranges( 'rno' ), [ ( 0, 338 ), ( 581, 625 ) ] )
+
+        self.pepr.close()
+        os.remove( self.pep_file + '.idx' )
+        os.remove( self.pep_file + '.ec.idx' )
+        os.remove( self.pep_file + '.organism.idx' )
+
+    def test_validate( self ):
+
+        report = self.pepr.validate()
+
+        self.assertTrue( report['valid'] )
+        self.assertEqual( report['entries'], 3 )
+
+        report = self.pepr.validate( alphabet=b'ACDEFGHIKLMNPQRSTVWY' )
+
+        self.assertEqual( report['counts']['invalid_characters'], 0 )
+
+        report = self.pepr.validate( alphabet=b'ACDEFGHIKLMNPQRSTVW' )
+
+        self.assertEqual( [ issue['identification'] for issue in report['issues'] ], [ 'rno:294324', 'hsa:10458' ] )
+
+    def test_entries_without_sequence( self ):
+
+        with open( self.pep_file, 'w' ) as f:
+            f.write( '>hsa:1  empty\n>hsa:2  X\nMKV\n>hsa:3  blank\n\n>hsa:4  Y\r\nMKW\r\n>hsa:5  last\n' )
+
+        def identifications( entries=None ):
+            return [ entry['identification'] for entry in entries ]
+
+        expected = [ 'hsa:2', 'hsa:4' ]
+
+        self.assertEqual( [ entry['header'].split()[0] for entry in self.pepr.pep.parse_file() ], [ '>hsa:2', '>hsa:4' ] )
+        self.assertEqual( identifications( self.pepr.iter_parsed_entries() ), expected )
+        self.assertEqual( identifications( self.pepr.parse_parallel( workers=2, chunk_size=1 ) ), expected )
+        self.assertEqual( identifications( self.pepr.iter_parsed_entries( lazy=True ) ), expected )
+        self.assertEqual( identifications( self.pepr.iter_unique_sequences() ), expected )
+        self.assertEqual( identifications( self.pepr.iter_parsed_entries( where={ 'organisms': 'hsa' } ) ), expected )
+        self.assertEqual( sum( len( batch ) for batch in self.pepr.pep.iter_batches() ), 2 )
+        self.assertEqual( identifications( self.pepr.iter_organism( 'hsa' ) ), expected )
+
+        with PEPReader( pep=PEP( self.pep_file, use_mmap=True ) ) as pepr:
+            self.assertEqual( identifications( pepr.iter_parsed_entries() ), expected )
+
+        self.pepr.load_index()
+
+        self.assertEqual( identifications( self.pepr.iter_parsed_entries( lazy=True ) ), expected )
+        self.assertEqual( identifications( self.pepr.iter_parsed_entries( where={ 'organisms': 'hsa' } ) ), expected )
+
+        self.pepr.close()
+        os.remove( self.pep_file + '.idx' )
+        os.remove( self.pep_file + '.ec.idx' )
+        os.remove( self.pep_file + '.organism.idx' )
+
+    def test_iter_unique_sequences( self ):
+
+        # The albumin again in another organism, wrapped in a different line width.
+        with open( self.pep_file, 'a' ) as f:
+            f.write( '>mmu:11657  Alb; albumin\nMKWVTFLL\nLLFISGSAFS\n' )
+
+        for pepr in ( PEPReader( pep=PEP( self.pep_file ) ), PEPReader( pep=PEP( self.pep_file, use_mmap=True ) ) ):
+            for max_entries in ( 1000000, 1 ):
+                entries = list( pepr.iter_unique_sequences( max_entries=max_entries ) )
+
+                self.assertEqual( [ entry['identifications'] for entry in entries ], [ [ 'rno:294324' ], [ 'rno:24189', 'mmu:11657' ], [ 'hsa:10458' ] ] )
+                self.assertEqual( entries[1]['identification'], 'rno:24189' )
+                self.assertEqual( entries[1]['header'], '>rno:24189  Alb; albumin; K16141 serum albumin' )
+                self.assertEqual( entries[1]['sequence'], 'MKWVTFLLLLFISGSAFS' )
+
+            pepr.close()
+
+    def test_stats( self ):
+
+        self.assertEqual( self.pepr.stats(), None )
+
+        pepr = PEPReader( pep=PEP( self.pep_file, instrumentation=Stats() ) )
+
+        entries = list( pepr.iter_parsed_entries() )
+        pepr.parsed_entry( 272 )
+
+        stats = pepr.stats()
+
+        self.assertEqual( stats['counters']['entries_parsed'], 4 )
+        self.assertEqual( stats['counters']['headers_parsed'], 4 )
+        self.assertEqual( stats['counters']['sequence_bytes'], sum( len( entry['sequence'] ) for entry in entries ) + 18 )
+        self.assertEqual( stats['counters']['scans'], 1 )
+        self.assertEqual( stats['counters']['bytes_scanned'], 581 )
+        self.assertEqual( stats['counters']['entries_scanned'], 3 )
+        # The sequential read (a block, then the empty read at the end of the file) and the random access read of parsed_entry.
+        self.assertEqual( stats['counters']['reads'], 3 )
+        self.assertEqual( stats['counters']['bytes_read'], 581 + 66 )
+        self.assertEqual( sorted( stats['timers'] ), [ 'header_parse', 'read', 'scan', 'sequence_assembly' ] )
+
+        pepr.close()
+
+    def test_entries_by_ec( self ):
+
+        queries = [ '2.3.1.51', '2.3.1.-', '3.1.3.16', '3.-.-.-', '-.-.-.-', '1.1.1.1', '2.3.1.5' ]
+        expected = [ [ 0 ], [ 0 ], [ 338 ], [ 338 ], [ 0, 338 ], [], [] ]
+
+        self.assertEqual( [ self.pepr.entries_by_ec( query ) for query in queries ], expected )
+
+        self.pepr.load_index()
+
+        self.assertTrue( os.path.exists( self.pep_file + '.ec.idx' ) )
+        self.assertEqual( [ self.pepr.entries_by_ec( query ) for query in queries ], expected )
+
+        with open( self.pep_file, 'a' ) as f:
+            f.write( '>mmu:11364  Acadm [EC:1.3.8.7 2.3.1.9]\nMAAGFG\n' )
+
+        self.pepr.load_index()
+
+        self.assertEqual( self.pepr.entries_by_ec( '2.3.1.-' ), [ 0, 581 ] )
+        self.assertEqual( self.pepr.entries_by_ec( '1.3.8.7' ), [ 581 ] )
+        self.assertEqual( self.pepr.entries_by_ec( '3.1.3.16' ), [ 338 ] )
+
+        self.pepr.close()
+        os.remove( self.pep_file + '.idx' )
+        os.remove( self.pep_file + '.ec.idx' )
+        os.remove( self.pep_file + '.organism.idx' )
+
+    def test_iter_parsed_entries_where( self ):
+
+        wheres = [
+            { 'organisms': [ 'rno' ] },
+            { 'organisms': [ 'hsa' ], 'ec': True },
+            { 'ec': '2.3.1.-' },
+            { 'ec': False },
+            { 'identifications': [ 'hsa:10458', 'rno:24189' ] },
+            { 'min_length': 100 },
+            { 'max_length': 150 },
+            { 'keywords': [ 'ALBUMIN' ] },
+            { 'organisms': [ 'mmu' ] },
+        ]
+
+        expected = [
+            [ 'rno:294324', 'rno:24189' ],
+            [ 'hsa:10458' ],
+            [ 'rno:294324' ],
+            [ 'rno:24189' ],
+            [ 'rno:24189', 'hsa:10458' ],
+            [ 'rno:294324', 'hsa:10458' ],
+            [ 'rno:294324', 'rno:24189' ],
+            [ 'rno:24189' ],
+            [],
+        ]
+
+        def identifications( pepr=None, **options ):
+            return [ [ entry['identification'] for entry in pepr.iter_parsed_entries( where=where, **options ) ] for where in wheres ]
+
+        mapped = PEPReader( pep=PEP( self.pep_file, use_mmap=True ) )
+
+        self.assertEqual( identifications( self.pepr ), expected )
+        self.assertEqual( identifications( self.pepr, lazy=True ), expected )
+        self.assertEqual( identifications( mapped ), expected )
+
+        self.pepr.load_index()
+
+        self.assertEqual( identifications( self.pepr ), expected )
+        self.assertEqual( identifications( self.pepr, lazy=True ), expected )
+        self.assertEqual( identifications( self.pepr, compact=True ), expected )
+
+        entries = list( self.pepr.iter_parsed_entries( where=EntryFilter( organisms='hsa' ) ) )
+
+        self.assertEqual( entries, [ self.pepr.parsed_entry( 338 ) ] )
+
+        mapped.close()
+        self.pepr.close()
+        os.remove( self.pep_file + '.idx' )
+        os.remove( self.pep_file + '.ec.idx' )
+        os.remove( self.pep_file + '.organism.idx' )
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,80 @@
+import sys
+import os
+import unittest
+from pepreader.records import *
+from pepreader.pep import *
+import tempfile
+
+
+class TestLazyRecord( unittest.TestCase ):
+
+    def setUp( self ):
+
+        with tempfile.NamedTemporaryFile( mode='w', suffix='.pep', delete=False ) as f:
+            f.write( '>rno:24189  Alb; albumin\nMKWVTFLL\nLLFISGSAFS\n' )
+
+        self.pep_file = f.name
+        self.pep = PEP( self.pep_file )
+
+        header = { 'identification': 'rno:24189', 'full_fasta_header': '>rno:24189  Alb; albumin', 'description': 'Alb; albumin', 'organism_code': 'rno', 'ec_numbers': [] }
+
+        self.record = LazyRecord( self.pep, 0, 45, header )
+
+    def tearDown( self ):
+
+        self.pep.close()
+        os.remove( self.pep_file )
+
+    def test_sequence_is_lazy( self ):
+
+        self.assertFalse( self.record.is_sequence_loaded() )
+        self.assertEqual( self.pep.handle, None )
+
+        self.assertEqual( self.record.sequence, 'MKWVTFLLLLFISGSAFS' )
+        self.assertTrue( self.record.is_sequence_loaded() )
+
+    def test_dictionary_access( self ):
+
+        self.assertEqual( self.record['description'], 'Alb; albumin' )
+        self.assertEqual( self.record.get( 'missing' ), None )
+        self.assertTrue( 'sequence' in self.record )
+        self.assertRaises( KeyError, lambda: self.record['missing'] )
+        self.assertEqual( sorted( self.record.to_dict().keys() ), sorted( self.record.keys() ) )
+        self.assertEqual( self.record.to_dict()['sequence'], 'MKWVTFLLLLFISGSAFS' )
+
+    def test_slots( self ):
+
+        self.assertFalse( hasattr( self.record, '__dict__' ) )
+
+
+class TestPEPRecord( unittest.TestCase ):
+
+    def test_dictionary_access( self ):
+
+        record = PEPRecord( identification='rno:24189', full_fasta_header='>rno:24189  Alb', description='Alb', sequence='MKWV', organism_code='rno', ec_numbers=[] )
+
+        self.assertEqual( record['sequence'], 'MKWV' )
+        self.assertEqual( record, { 'identification': 'rno:24189', 'full_fasta_header': '>rno:24189  Alb', 'description': 'Alb', 'sequence': 'MKWV', 'organism_code': 'rno', 'ec_numbers': [] } )
+        self.assertFalse( hasattr( record, '__dict__' ) )
+
+
+class TestPEPBatch( unittest.TestCase ):
+
+    def test_batch( self ):
+
+        batch = PEPBatch()
+
+        batch.append( b'>rno:24189  Alb', b'MKWVTFLL' )
+        batch.append( b'>hsa:10458  BAIAP2', b'MSLSRS' )
+
+        self.assertEqual( len( batch ), 2 )
+        self.assertEqual( batch[1], { 'header': '>hsa:10458  BAIAP2', 'sequence': 'MSLSRS' } )
+        self.assertEqual( batch[-1], batch[1] )
+        self.assertEqual( list( batch ), [ batch[0], batch[1] ] )
+        self.assertEqual( list( batch.sequence_offsets ), [ 0, 8, 14 ] )
+        self.assertEqual( batch.nbytes(), 33 + 14 + 6 * 8 )
+        self.assertRaises( IndexError, lambda: batch[2] )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import sys
+import os
+import unittest
+from pepreader.sequenceindex import *
+import shutil
+import tempfile
+
+
+class TestSequenceIndex( unittest.TestCase ):
+
+    def setUp( self ):
+
+        self.directory = tempfile.mkdtemp()
+
+        self.entries = [
+            ( b'MGLLAF\nLKTQ\n', 0, 'rno:294324' ),
+            ( b'MKWV\r\nTFLL\r\n', 30, 'rno:24189' ),
+            ( b'MGLLAFLKTQ\n', 60, 'mmu:52858' ),
+            ( b'MSLSRS\n', 90, 'hsa:10458' ),
+            ( b'MKWVTFLL', 120, 'mmu:11657' ),
+        ]
+
+    def tearDown( self ):
+
+        shutil.rmtree( self.directory )
+
+    def test_sequence_digest( self ):
+
+        self.assertEqual( sequence_digest( b'MGLLAF\nLKTQ\n' ), sequence_digest( b'MGLL\r\nAFLKTQ' ) )
+        self.assertNotEqual( sequence_digest( b'MGLLAF' ), sequence_digest( b'MGLLAY' ) )
+        self.assertEqual( len( sequence_digest( b'MGLLAF' ) ), 16 )
+
+    def check( self, index=None ):
+
+        for sequence, offset, identification in self.entries:
+            index.add( sequence_digest( sequence ), offset, identification )
+
+        self.assertEqual( index.entries, 5 )
+        self.assertEqual( index.count(), 3 )
+
+        groups = [ entries for digest, entries in index.iter_groups() ]
+
+        self.assertEqual( groups, [ [ ( 0, 'rno:294324' ), ( 60, 'mmu:52858' ) ], [ ( 30, 'rno:24189' ), ( 120, 'mmu:11657' ) ], [ ( 90, 'hsa:10458' ) ] ] )
+
+        self.assertEqual( index.get( sequence_digest( b'MSLSRS' ) ), [ ( 90, 'hsa:10458' ) ] )
+        self.assertEqual( index.get( sequence_digest( b'MSLSRT' ) ), [] )
+
+    def test_memory( self ):
+
+        with SequenceIndex( directory=self.directory ) as index:
+            self.check( index )
+
+            self.assertEqual( index.database_file, None )
+
+    def test_spill( self ):
+
+        with SequenceIndex( max_entries=2, directory=self.directory ) as index:
+            self.check( index )
+
+            self.assertTrue( os.path.exists( index.database_file ) )
+
+        self.assertEqual( os.listdir( self.directory ), [] )
+
+
+if __name__ == "__main__":
+    unittest.main()
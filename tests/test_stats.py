@@ -0,0 +1,68 @@
+import sys
+import os
+import io
+import unittest
+import pstats
+from pepreader.stats import *
+import tempfile
+
+
+class TestStats( unittest.TestCase ):
+
+    def test_counters_and_timers( self ):
+
+        events = []
+
+        stats = Stats( callback=lambda name, value: events.append( name ) )
+
+        stats.count( 'reads' )
+        stats.count( 'bytes_read', 100 )
+        stats.count( 'bytes_read', 50 )
+        stats.add_time( 'read', 0.5 )
+
+        with stats.timer( 'read' ):
+            pass
+
+        snapshot = stats.snapshot()
+
+        self.assertEqual( snapshot['counters'], { 'reads': 1, 'bytes_read': 150 } )
+        self.assertTrue( snapshot['timers']['read'] >= 0.5 )
+        self.assertEqual( events, [ 'reads', 'bytes_read', 'bytes_read', 'read', 'read' ] )
+
+        stats.reset()
+
+        self.assertEqual( stats.snapshot(), { 'counters': {}, 'timers': {} } )
+        self.assertEqual( snapshot['counters']['reads'], 1 )
+
+    def test_counted_reader( self ):
+
+        stats = Stats()
+
+        with io.BufferedReader( CountedReader( io.BytesIO( b'>a\nMK\n' * 1000 ), stats ), buffer_size=4096 ) as stream:
+            lines = list( stream )
+
+            stream.seek( 3 )
+
+            self.assertEqual( stream.readline(), b'MK\n' )
+
+        self.assertEqual( len( lines ), 2000 )
+        self.assertEqual( stats.snapshot()['counters'], { 'reads': 4, 'bytes_read': 6000 + 4096 } )
+        self.assertTrue( 'read' in stats.snapshot()['timers'] )
+
+    def test_profile( self ):
+
+        with tempfile.NamedTemporaryFile( suffix='.prof', delete=False ) as f:
+            pass
+
+        with profile( f.name ):
+            sorted( range( 1000 ), key=lambda number: -number )
+
+        functions = [ function for filename, line, function in pstats.Stats( f.name ).stats ]
+
+        self.assertTrue( '<lambda>' in functions )
+
+        os.remove( f.name )
+
+
+if __name__ == "__main__":
+    unittest.main()
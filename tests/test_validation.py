@@ -0,0 +1,123 @@
+import sys
+import os
+import unittest
+from pepreader.validation import *
+from pepreader.pep import *
+from pepreader.stats import *
+import tempfile
+
+PEP_CONTENT = (
+    b'junk\n'
+    b'>rno:294324  Agpat3; acyltransferase \\"3\\"\n'
+    b'MGLLAF\n'
+    b'>rno:24189  Alb; albumin\n'
+    b'MKWV1FLL\r\n'
+    b'LLxF\r\n'
+    b'>RNO:294324  Agpat3 again\n'
+    b'MGLLAF\n'
+    b'>hsa:10458  BAIAP2\n'
+    b'> empty\n'
+    b'MSLS\n'
+    b'>mmu:11364  Acadm\n'
+    b'MAAGFG'
+)
+
+
+class TestValidation( unittest.TestCase ):
+
+    def setUp( self ):
+
+        with tempfile.NamedTemporaryFile( suffix='.pep', delete=False ) as f:
+            f.write( PEP_CONTENT )
+
+        self.pep_file = f.name
+        self.pep = PEP( self.pep_file )
+
+    def tearDown( self ):
+
+        self.pep.close()
+        os.remove( self.pep_file )
+
+    def test_report( self ):
+
+        report = Validator( self.pep, chunk_size=16 ).report()
+
+        self.assertFalse( report['valid'] )
+        self.assertEqual( report['entries'], 6 )
+        self.assertEqual( report['bytes'], len( PEP_CONTENT ) )
+
+        issues = [ ( issue['type'], issue['offset'], issue['identification'] ) for issue in report['issues'] ]
+
+        self.assertEqual( issues, [
+            ( 'no_header', 0, None ),
+            ( 'header_characters', 5, 'rno:294324' ),
+            ( 'invalid_characters', PEP_CONTENT.index( b'>rno:24189' ), 'rno:24189' ),
+            ( 'duplicate_identification', PEP_CONTENT.index( b'>RNO' ), 'rno:294324' ),
+            ( 'empty_sequence', PEP_CONTENT.index( b'>hsa' ), 'hsa:10458' ),
+            ( 'empty_identification', PEP_CONTENT.index( b'> empty' ), '' ),
+        ] )
+
+        self.assertEqual( report['issues'][1]['characters'], '\\"' )
+        self.assertEqual( report['issues'][2]['characters'], '1x' )
+        self.assertEqual( report['issues'][2]['position'], PEP_CONTENT.index( b'1FLL' ) )
+        self.assertEqual( report['issues'][3]['first_offset'], 5 )
+        self.assertEqual( report['counts']['invalid_characters'], 1 )
+
+        self.assertEqual( len( Validator( self.pep ).report( max_issues=2 )['issues'] ), 2 )
+
+    def test_valid( self ):
+
+        with tempfile.NamedTemporaryFile( suffix='.pep', delete=False ) as f:
+            f.write( b'>hsa:1  A\r\nMKV*\r\n>hsa:2  B\r\nMK\r\n' )
+
+        with PEP( f.name ) as pep:
+            report = Validator( pep ).report()
+
+        self.assertTrue( report['valid'] )
+        self.assertEqual( report['entries'], 2 )
+        self.assertEqual( report['issues'], [] )
+
+        os.remove( f.name )
+
+    def test_duplicates_of_clean_ranges( self ):
+
+        entries = b''.join( b'>hsa:%d  A\nMKVL\n' % number for number in range( 20000 ) )
+        duplicates = b''.join( b'>HSA:%d  again\nMKVL\n' % number for number in range( 0, 20000, 20 ) )
+
+        with tempfile.NamedTemporaryFile( suffix='.pep', delete=False ) as f:
+            f.write( entries + duplicates )
+
+        with PEP( f.name, instrumentation=Stats() ) as pep:
+            report = Validator( pep, chunk_size=65536 ).report()
+
+            # Every clean range is read again once at most, not once per duplicate.
+            self.assertLess( pep.stats()['counters']['bytes_read'], 4 * len( entries + duplicates ) )
+
+        self.assertEqual( report['counts']['duplicate_identification'], 1000 )
+        self.assertEqual( [ issue['first_offset'] for issue in report['issues'] ], [ entries.index( b'>hsa:%d ' % number ) for number in range( 0, 20000, 20 ) ] )
+
+        os.remove( f.name )
+
+    def test_repair( self ):
+
+        target_file = self.pep_file + '.repaired'
+
+        report = Validator( self.pep ).repair( target_file )
+
+        self.assertEqual( len( report['issues'] ), 6 )
+
+        with open( target_file, 'rb' ) as f:
+            repaired = f.read()
+
+        self.assertEqual( repaired, b'>rno:294324  Agpat3; acyltransferase 3\nMGLLAF\n>rno:24189  Alb; albumin\nMKWVFLL\nLLF\n>mmu:11364  Acadm\nMAAGFG\n' )
+
+        with PEP( target_file ) as pep:
+            self.assertTrue( Validator( pep ).report()['valid'] )
+
+        self.assertRaises( ValueError, Validator( self.pep ).repair, self.pep_file )
+
+        os.remove( target_file )
+
+
+if __name__ == "__main__":
+    unittest.main()